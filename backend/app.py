@@ -17,18 +17,17 @@ from flask_assets import Bundle, Environment
 from backend.tradebot import TradeBot
 
 from backend.control.control_system import ControlSystem
+from backend.backtest.results_store import METRICS
+from backend.database.sqlite.backtest_cache import get_backtest_cache
+from backend.database.sqlite.candle_store import get_candle_store
 from backend.oanda_api.oanda_api import OandaAPI
 from backend.backtest.backtest_strategy import BacktestStrategy
-from backend.indicators.macd_indicator import MACDIndicator
-from backend.indicators.stochastic_indicator import StochasticIndicator
 from backend.optimization.optimize_strategy import OptimizeStrategy
 from backend.strategies.momentum_strategy import MomentumStrategy
 from backend.strategies.ema_crossover_strategy import EMACrossoverStrategy
 from backend.strategies.sma_crossover_strategy import SMACrossoverStrategy
-from backend.utils.indicators import EMAIndicator
-from backend.utils.indicators import RSIIndicator
-from backend.utils.indicators import SMAIndicator   
-from backend.utils.indicators import BollingerBandsIndicator
+from backend.indicators.incremental import (IncrementalBollinger, IncrementalEMA, IncrementalMACD, IncrementalRSI,
+                                            IncrementalSMA, IncrementalStochastic, IndicatorStates)
 from backend.utils.utility import configure_logging
 
 app = Flask(__name__)
@@ -46,6 +45,7 @@ assets.auto_build = True
 assets.debug = True
 
 trade_bot = TradeBot()
+indicator_states = IndicatorStates()
 
 @app.route("/")
 def index():
@@ -111,6 +111,22 @@ def indicator_status():
         return jsonify({'error': 'Indicator data not found'}), 404
     return jsonify(indicator_data)
 
+@app.route('/candle_store_stats')
+def candle_store_stats():
+    return jsonify(get_candle_store().get_stats())
+
+@app.route('/analysis_stats')
+def analysis_stats():
+    return jsonify(control_system.get_stats())
+
+@app.route('/scheduler_stats')
+def scheduler_stats():
+    return jsonify(trade_bot.scheduler.get_stats() if trade_bot.scheduler is not None else {})
+
+@app.route('/backtest_cache_stats')
+def backtest_cache_stats():
+    return jsonify(get_backtest_cache().get_stats())
+
 def fetch_indicator_status(instrument):
     api = OandaAPI()
     
@@ -124,30 +140,27 @@ def fetch_indicator_status(instrument):
         logging.error(f"Error fetching historical data for {instrument}: {message}")
         return {'error': message}
     
+    # Indicator states live across requests, so each call only feeds the candles closed since the last one
+    settings = variables.SETTINGS['INDICATORS']
+    rsi_period = settings['RSI']['RSI_PERIOD']
+    sma_period = settings['SMA']['SMA_PERIOD']
+    ema_period = settings['EMA']['EMA_PERIOD']
+    macd = (settings['MACD']['MACD_FAST_PERIOD'], settings['MACD']['MACD_SLOW_PERIOD'], settings['MACD']['MACD_SIGNAL_PERIOD'])
+    bollinger = (settings['BOLLINGER_BANDS']['BOLLINGER_BANDS_PERIOD'], settings['BOLLINGER_BANDS']['BOLLINGER_BANDS_STD_DEV'])
+    stochastic = (settings['STOCHASTIC']['STOCHASTIC_K_PERIOD'], settings['STOCHASTIC']['STOCHASTIC_D_PERIOD'])
     indicators = {
-        'RSI': lambda: RSIIndicator(variables.SETTINGS['INDICATORS']['RSI']['RSI_PERIOD']).get_current_value(data),
-        'SMA': lambda: SMAIndicator(variables.SETTINGS['INDICATORS']['SMA']['SMA_PERIOD']).get_current_value(data),
-        'EMA': lambda: EMAIndicator(variables.SETTINGS['INDICATORS']['EMA']['EMA_PERIOD']).get_current_value(data),
-        'MACD': lambda: MACDIndicator(
-            variables.SETTINGS['INDICATORS']['MACD']['MACD_FAST_PERIOD'],
-            variables.SETTINGS['INDICATORS']['MACD']['MACD_SLOW_PERIOD'],
-            variables.SETTINGS['INDICATORS']['MACD']['MACD_SIGNAL_PERIOD']
-        ).get_current_value(data),
-        'BollingerBands': lambda: BollingerBandsIndicator(
-            variables.SETTINGS['INDICATORS']['BOLLINGER_BANDS']['BOLLINGER_BANDS_PERIOD'],
-            variables.SETTINGS['INDICATORS']['BOLLINGER_BANDS']['BOLLINGER_BANDS_STD_DEV']
-        ).get_current_value(data),
-        'Stochastic': lambda: StochasticIndicator(
-            api, instrument,
-            variables.SETTINGS['INDICATORS']['STOCHASTIC']['STOCHASTIC_K_PERIOD'],
-            variables.SETTINGS['INDICATORS']['STOCHASTIC']['STOCHASTIC_D_PERIOD']
-        ).get_current_value(data)
+        'RSI': (rsi_period, lambda: IncrementalRSI(rsi_period)),
+        'SMA': (sma_period, lambda: IncrementalSMA(sma_period)),
+        'EMA': (ema_period, lambda: IncrementalEMA(ema_period)),
+        'MACD': (macd, lambda: IncrementalMACD(*macd)),
+        'BollingerBands': (bollinger, lambda: IncrementalBollinger(*bollinger)),
+        'Stochastic': (stochastic, lambda: IncrementalStochastic(*stochastic))
     }
 
     status = {}
-    for name, get_value in indicators.items():
+    for name, (params, factory) in indicators.items():
         try:
-            value = get_value()
+            value = indicator_states.current((instrument, name, params), factory, data)
             status[name] = evaluate_indicator_status(name, value)
         except Exception as e:
             logging.error(f"Error fetching {name} for {instrument}: {str(e)}")
@@ -197,9 +210,10 @@ def evaluate_indicator_status(name, value):
 def execute_trades():
     try:
         instruments = request.form.getlist('instruments')
-        for instrument in instruments:
-            control_system.run_analysis(instrument)
-            if control_system.current_state == variables.STATE_GREEN:
+        if not instruments:
+            return jsonify({"status": "No instruments selected."})
+        for instrument, state in control_system.run_analysis(instruments).items():
+            if state.state == variables.STATE_GREEN:
                 # Implement trade execution logic here
                 pass
         return jsonify({"status": "Trades executed successfully."})
@@ -211,37 +225,10 @@ def execute_trades():
 def auto_trades():
     try:
         instruments = request.form.getlist('instruments')
-        for instrument in instruments:
-            data = control_system.get_historical_data(instrument, 'M')  # Monthly data
-            strategy = MomentumStrategy(data, rsi_params, stochastic_params)
-            report = strategy.backtest()
-            
-            if report['total_return'] > 0 and report['win_rate'] > 0.5:  # Example conditions
-                variables.current_state = variables.STATE_GREEN
-                logging.info(f"State set to GREEN for {instrument} based on monthly analysis.")
-                data = control_system.get_historical_data(instrument, 'D')  # Daily data
-                strategy = MomentumStrategy(data, rsi_params, stochastic_params)
-                report = strategy.backtest()
-                
-                if report['total_return'] > 0 and report['win_rate'] > 0.5:
-                    variables.current_state = variables.STATE_GREEN
-                    logging.info(f"State set to GREEN for {instrument} based on daily analysis.")
-                    data = control_system.get_historical_data(instrument, 'M1')  # Minute data
-                    strategy = MomentumStrategy(data, rsi_params, stochastic_params)
-                    report = strategy.backtest()
-                    
-                    if report['total_return'] > 0 and report['win_rate'] > 0.5:
-                        # Execute trade logic here
-                        logging.info(f"Executing trade for {instrument}")
-                    else:
-                        variables.current_state = variables.STATE_YELLOW
-                        logging.info(f"State set to YELLOW for {instrument} based on minute analysis.")
-                else:
-                    variables.current_state = variables.STATE_YELLOW
-                    logging.info(f"State set to YELLOW for {instrument} based on daily analysis.")
-            else:
-                variables.current_state = variables.STATE_RED
-                logging.info(f"State set to RED for {instrument} based on monthly analysis.")
+        if not instruments:
+            return jsonify({"status": "No instruments selected."})
+        # Monthly, daily and minute gating on one fetched series per instrument, instruments in parallel
+        control_system.run_analysis(instruments)
         
         return jsonify({"status": "Auto trades executed successfully."})
     except Exception as e:
@@ -371,7 +358,18 @@ def start_backtest():
 
 @app.route('/backtest-results', methods=['GET'])
 def get_backtest_results():
-    return jsonify(trade_bot.backtest_results)
+    # The last cycle's results of ?kind= (backtest or confirmation), or with ?top=N its best N
+    # distinct results ranked by ?metric=; ?cycle=all ranks every retained cycle instead
+    results = trade_bot.backtest_results
+    kind = request.args.get('kind', 'backtest')
+    top = request.args.get('top', type=int)
+    if top is None:
+        return jsonify(results.latest(kind))
+    metric = request.args.get('metric', 'total_return')
+    if metric not in METRICS:
+        return jsonify({"error": f"Unknown metric {metric}"}), 400
+    cycle = 'all' if request.args.get('cycle') == 'all' else results.latest_cycle(kind)
+    return jsonify(results.top(top, metric, cycle, pair=request.args.get('instrument'), strategy=request.args.get('strategy')))
 
 
 @app.route("/backtest", methods=["GET", "POST"])
@@ -1,6 +1,8 @@
 import logging 
 import pandas as pd
 import numpy as np
+from backend.backtest.event_backtest import EventBacktest
+from backend.indicators.feature_cache import features
 from backend.utils.utility import configure_logging
 
 class BacktestStrategy:
@@ -11,48 +13,49 @@ class BacktestStrategy:
         logging.info(f"Backtesting strategy with indicators: {indicators}")
 
     def generate_signals(self):
-        # Assuming generate_signals method generates buy/sell signals based on indicators
+        # Indicator series come from the shared feature cache; the signal for each indicator
+        # starts once its window is full
+        close = self.data['close'].to_numpy()
         for indicator in self.indicators:
             if indicator == 'SMA':
-                self.data['SMA'] = self.data['close'].rolling(window=14).mean()
-                self.data['Signal'] = 0
-                self.data['Signal'][14:] = np.where(self.data['close'][14:] > self.data['SMA'][14:], 1, -1)
+                self.data['SMA'] = sma = features.sma(close, 14)
+                self.set_signal(14, np.where(close[14:] > sma[14:], 1, -1))
             elif indicator == 'EMA':
-                self.data['EMA'] = self.data['close'].ewm(span=14, adjust=False).mean()
-                self.data['Signal'] = 0
-                self.data['Signal'][14:] = np.where(self.data['close'][14:] > self.data['EMA'][14:], 1, -1)
+                self.data['EMA'] = ema = features.ema(close, 14)
+                self.set_signal(14, np.where(close[14:] > ema[14:], 1, -1))
             elif indicator == 'RSI':
-                delta = self.data['close'].diff()
-                gain = (delta.where(delta > 0, 0)).rolling(window=14).mean()
-                loss = (-delta.where(delta < 0, 0)).rolling(window=14).mean()
-                RS = gain / loss
-                self.data['RSI'] = 100 - (100 / (1 + RS))
-                self.data['Signal'] = 0
-                self.data['Signal'][14:] = np.where(self.data['RSI'][14:] < 30, 1, np.where(self.data['RSI'][14:] > 70, -1, 0))
+                self.data['RSI'] = rsi = features.rsi(close, 14)
+                self.set_signal(14, np.where(rsi[14:] < 30, 1, np.where(rsi[14:] > 70, -1, 0)))
             elif indicator == 'MACD':
-                exp1 = self.data['close'].ewm(span=12, adjust=False).mean()
-                exp2 = self.data['close'].ewm(span=26, adjust=False).mean()
-                self.data['MACD'] = exp1 - exp2
-                self.data['Signal'] = 0
-                self.data['Signal'][26:] = np.where(self.data['MACD'][26:] > self.data['MACD'].ewm(span=9, adjust=False).mean(), 1, -1)
+                macd = features.macd(close, 12, 26, 9)
+                self.data['MACD'] = macd['MACD']
+                self.set_signal(26, np.where(macd['MACD'][26:] > macd['Signal'][26:], 1, -1))
             elif indicator == 'BOLLINGER_BANDS':
-                self.data['SMA'] = self.data['close'].rolling(window=20).mean()
-                self.data['STD'] = self.data['close'].rolling(window=20).std()
-                self.data['Upper_Band'] = self.data['SMA'] + (self.data['STD'] * 2)
-                self.data['Lower_Band'] = self.data['SMA'] - (self.data['STD'] * 2)
-                self.data['Signal'] = 0
-                self.data['Signal'][20:] = np.where(self.data['close'][20:] < self.data['Lower_Band'][20:], 1, np.where(self.data['close'][20:] > self.data['Upper_Band'][20:], -1, 0))
+                bands = features.bollinger_bands(close, 20, 2)
+                self.data['SMA'] = bands['Bollinger_Mid']
+                self.data['STD'] = features.rolling_std(close, 20)
+                self.data['Upper_Band'] = bands['Upper_Band']
+                self.data['Lower_Band'] = bands['Lower_Band']
+                self.set_signal(20, np.where(close[20:] < bands['Lower_Band'][20:], 1, np.where(close[20:] > bands['Upper_Band'][20:], -1, 0)))
             elif indicator == 'STOCHASTIC':
-                low_14 = self.data['low'].rolling(window=14).min()
-                high_14 = self.data['high'].rolling(window=14).max()
-                self.data['%K'] = 100 * ((self.data['close'] - low_14) / (high_14 - low_14))
-                self.data['%D'] = self.data['%K'].rolling(window=3).mean()
-                self.data['Signal'] = 0
-                self.data['Signal'][14:] = np.where(self.data['%K'][14:] > 80, -1, np.where(self.data['%K'][14:] < 20, 1, 0))
-                        
+                stochastic = features.stochastic(self.data['high'], self.data['low'], close, 14, 3)
+                self.data['%K'] = k = stochastic['%K']
+                self.data['%D'] = stochastic['%D']
+                self.set_signal(14, np.where(k[14:] > 80, -1, np.where(k[14:] < 20, 1, 0)))
 
-    def backtest(self):
+    def set_signal(self, start, values):
+        # Whole-column assignment; slicing into self.data['Signal'] would write to a copy
+        signal = np.zeros(len(self.data), dtype=np.int64)
+        signal[start:] = values
+        self.data['Signal'] = signal
+
+    def backtest(self, mode='vectorized', instrument=None):
+        # 'vectorized' is the fast screening path; 'event' fills each trade with spread, slippage and stops
         self.generate_signals()
+        if mode == 'event':
+            report = EventBacktest(self.data, self.data['Signal'], instrument).run()
+            report['data'] = self.data
+            return report
         self.data['Position'] = self.data['Signal'].shift()
         self.data['Return'] = self.data['close'].pct_change()
         self.data['Strategy_Return'] = self.data['Return'] * self.data['Position']
@@ -1,9 +1,9 @@
 import logging
 from typing import Dict
 
-import numpy as np
 import pandas as pd
 
+from backend.indicators import engine
 from backend.utils.utility import configure_logging, get_strategy_class
 
 
@@ -16,14 +16,13 @@ class CombinedStrategy:
         logging.info(f"Backtesting combined strategies with parameters: {param_sets}")
         for strategy_name, params in param_sets.items():
             if (strategy_class := get_strategy_class(strategy_name)):
-                self.strategies.append(strategy_class(self.data, **params))
+                # Each strategy gets its own copy so their 'Signal' columns do not overwrite each other
+                self.strategies.append(strategy_class(self.data.copy(), **params))
                 logging.info(f"Added strategy: {strategy_name} with parameters: {params}")
 
     def backtest(self):
-        for strategy in self.strategies:
-            self.data = strategy.generate_signals(self.data)
-        
-        self.data['Position'] = self.data.apply(self.combine_signals, axis=1)
+        signals = [self.strategy_signal(strategy) for strategy in self.strategies]
+        self.data['Position'] = self.combine_signals(signals)
         self.data['Return'] = self.data['close'].pct_change()
         self.data['Strategy_Return'] = self.data['Return'] * self.data['Position']
         total_return = self.data['Strategy_Return'].sum()
@@ -33,7 +32,13 @@ class CombinedStrategy:
 
         return self.data, total_return, num_trades, win_rate
 
-    def combine_signals(self, row):
-        combined_signal = sum(row.get(strategy.signal_column, 0) for strategy in self.strategies)
-        combined_signal += row.get(self.strategies.signal_column, 0)
-        return np.sign(combined_signal)
+    @staticmethod
+    def strategy_signal(strategy):
+        # Strategies write a 'Signal' column on their own copy of the data
+        if hasattr(strategy, 'generate_signal'):
+            return strategy.generate_signal()['Signal'].to_numpy()
+        return strategy.backtest()['data']['Signal'].to_numpy()
+
+    def combine_signals(self, signals):
+        # One vectorized pass over every bar instead of a Python call per row
+        return engine.combine_signals(signals)
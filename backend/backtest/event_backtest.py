@@ -0,0 +1,150 @@
+import logging
+
+import numpy as np
+import pandas as pd
+
+import backend.variables as variables
+from backend.utils.utility import configure_logging
+
+configure_logging("event_backtest")
+
+# Trade-by-trade simulation of a signal column with the costs and exits the vectorized backtests
+# leave out. A signal on a bar's close is filled at the next bar's open: longs buy the ask and
+# sell the bid, shorts the reverse, and market fills pay slippage. Stop loss, trailing stop and
+# take profit are checked intrabar against the bar's high and low. A stop fills at the stop or at
+# the open if the bar gapped through it, and a target fills at the target or the better open. When
+# a bar reaches both, the stop is assumed to come first. After a stop or target the position stays
+# flat until the signal changes.
+#
+# Every run of bars with the same wanted position is one trade, and trades do not depend on each
+# other, so the whole simulation is a handful of segmented NumPy passes rather than a per-bar loop.
+# Shorts are simulated as longs on negated prices.
+
+TRADE_COLUMNS = ['entry_time', 'exit_time', 'direction', 'entry_price', 'exit_price', 'return', 'reason']
+
+
+def pip_size(instrument):
+    return 0.01 if instrument and instrument.endswith('JPY') else 0.0001
+
+
+def segment_cummax(values, starts, lengths):
+    # Running maximum that restarts at each segment
+    groups = np.repeat(np.arange(len(starts)), lengths)
+    return pd.Series(values).groupby(groups).cummax().to_numpy()
+
+
+class EventBacktest:
+    def __init__(self, data, signal, instrument=None, stop_loss=None, take_profit=None, trailing_stop=None,
+                 spread=None, slippage=None):
+        # Distances are in pips; 0 turns an exit off, None takes AUTO_TRADING and EVENT_BACKTEST
+        settings = variables.EVENT_BACKTEST
+        self.data = data
+        self.signal = np.nan_to_num(np.asarray(signal, dtype=np.float64)).astype(np.int64)
+        self.instrument = instrument
+        self.pip = pip_size(instrument)
+        self.stop_loss = variables.AUTO_TRADING['STOP_LOSS'] if stop_loss is None else stop_loss
+        self.take_profit = variables.AUTO_TRADING['TAKE_PROFIT'] if take_profit is None else take_profit
+        self.trailing_stop = variables.AUTO_TRADING['TRAILING_STOP_LOSS'] if trailing_stop is None else trailing_stop
+        self.spread = settings['SPREAD'] if spread is None else spread
+        self.slippage = settings['SLIPPAGE'] if slippage is None else slippage
+
+    def run(self):
+        trades = self.trades()
+        returns = trades['return'].to_numpy()
+        total_return = np.prod(1 + returns) - 1 if len(returns) else 0.0
+        win_rate = (returns > 0).mean() if len(returns) else 0
+        logging.info(f"Event backtest over {len(self.data)} bars: {len(trades)} trades, total return {total_return:.6f}")
+        return {
+            'total_return': total_return,
+            'num_trades': len(trades),
+            'win_rate': win_rate,
+            'exits': trades['reason'].value_counts().to_dict(),
+            'trades': trades,
+        }
+
+    def trades(self):
+        bars = len(self.data)
+        if bars == 0:
+            return pd.DataFrame(columns=TRADE_COLUMNS)
+        close = self.data['close'].to_numpy(dtype=np.float64)
+        high = self.data['high'].to_numpy(dtype=np.float64) if 'high' in self.data else close
+        low = self.data['low'].to_numpy(dtype=np.float64) if 'low' in self.data else close
+        if 'open' in self.data:
+            open_ = self.data['open'].to_numpy(dtype=np.float64)
+        else:
+            open_ = np.concatenate((close[:1], close[:-1]))
+        half_spread = self.spread * self.pip / 2
+        slippage = self.slippage * self.pip
+
+        # The position wanted on each bar is the previous bar's signal; segments are its runs
+        wanted = np.zeros(bars, dtype=np.int64)
+        wanted[1:] = self.signal[:-1]
+        starts = np.flatnonzero(np.diff(wanted, prepend=0) != 0)
+        starts = np.union1d(starts, [0])
+        ends = np.append(starts[1:], bars)
+        lengths = ends - starts
+        direction = wanted[starts]
+        long = np.repeat(direction, lengths) > 0
+
+        # Long-side prices: what a long pays to enter, and the bid it can exit on
+        entry_open = np.where(long, open_ + half_spread, -(open_ - half_spread))
+        exit_open = np.where(long, open_ - half_spread, -(open_ + half_spread))
+        favourable = np.where(long, high - half_spread, -(low + half_spread))
+        adverse = np.where(long, low - half_spread, -(high + half_spread))
+
+        entry = entry_open[starts] + slippage
+        entry_per_bar = np.repeat(entry, lengths)
+        stop = np.full(bars, -np.inf)
+        fixed_stop = None
+        if self.stop_loss:
+            fixed_stop = entry_per_bar - self.stop_loss * self.pip
+            stop = fixed_stop
+        if self.trailing_stop:
+            # The trail follows the best price up to the previous bar
+            peak = segment_cummax(favourable, starts, lengths)
+            previous_peak = np.concatenate(([-np.inf], peak[:-1]))
+            previous_peak[starts] = -np.inf
+            stop = np.maximum(stop, np.maximum(entry_per_bar, previous_peak) - self.trailing_stop * self.pip)
+        target = entry_per_bar + self.take_profit * self.pip if self.take_profit else np.full(bars, np.inf)
+
+        stopped = adverse <= stop
+        reached = favourable >= target
+        first_exit = np.minimum.reduceat(np.where(stopped | reached, np.arange(bars), bars), starts)
+        exited = first_exit < ends
+
+        traded = direction != 0
+        exit_bar = np.where(exited, first_exit, ends)
+        fill = np.empty(len(starts))
+        reason = np.empty(len(starts), dtype=object)
+
+        hit = np.flatnonzero(exited & traded)
+        bar = first_exit[hit]
+        by_stop = stopped[bar]
+        stop_fill = np.minimum(exit_open[bar], stop[bar]) - slippage
+        target_fill = np.maximum(exit_open[bar], target[bar])
+        fill[hit] = np.where(by_stop, stop_fill, target_fill)
+        stop_reason = 'trailing_stop' if fixed_stop is None else np.where(stop[bar] > fixed_stop[bar], 'trailing_stop', 'stop_loss')
+        reason[hit] = np.where(by_stop, stop_reason, 'take_profit')
+
+        # The rest close on the open after the signal changes, or at the last close
+        held = np.flatnonzero(~exited & traded)
+        at_open = ends[held] < bars
+        side = direction[held] > 0
+        next_open = open_[np.minimum(ends[held], bars - 1)]
+        signal_fill = np.where(side, next_open - half_spread, -(next_open + half_spread)) - slippage
+        last_fill = np.where(side, close[-1] - half_spread, -(close[-1] + half_spread))
+        fill[held] = np.where(at_open, signal_fill, last_fill)
+        reason[held] = np.where(at_open, 'signal', 'end')
+
+        keep = np.flatnonzero(traded)
+        sign = np.where(direction[keep] > 0, 1.0, -1.0)
+        index = self.data.index
+        return pd.DataFrame({
+            'entry_time': index[starts[keep]],
+            'exit_time': index[np.minimum(exit_bar[keep], bars - 1)],
+            'direction': direction[keep],
+            'entry_price': entry[keep] * sign,
+            'exit_price': fill[keep] * sign,
+            'return': (fill[keep] - entry[keep]) / np.abs(entry[keep]),
+            'reason': reason[keep],
+        }, columns=TRADE_COLUMNS)
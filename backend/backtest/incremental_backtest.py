@@ -0,0 +1,142 @@
+import math
+
+from backend.indicators.incremental import NAN, EMAState, IncrementalIndicator, IncrementalRSI, IncrementalStochastic, RollingMean
+
+# Backtests that keep their end state - indicator windows, the last signals and positions, and the
+# running return, trade and win counts - so a new bar costs O(window) instead of a rerun over the
+# whole history. extend() on any number of new bars gives the same metrics as the strategy class's
+# backtest() over every bar seen so far; the indicator states are the live ones from
+# backend/indicators/incremental.py. Two metric styles, as in GridOptimizer:
+#   'compounded' - RSIStrategy: compounded returns one bar after the position, trades from position changes
+#   'summed'     - the moving average strategies and MomentumStrategy: summed returns, trades from bars in a position
+
+class IncrementalBacktest(IncrementalIndicator):
+    # update() takes one closed bar's columns; update_frame() feeds the rows of a frame not seen yet
+    style = 'summed'
+
+    def __init__(self):
+        super().__init__()
+        self.previous_close = NAN
+        self.signal = NAN  # Signal of the last bar; the next bar's position
+        self.position = NAN  # Position of the last bar
+        self.bars = 0
+        self.total = 1.0 if self.style == 'compounded' else 0.0  # Compounded growth factor or summed returns
+        self.compensation = 0.0  # Lost low-order bits of the summed returns
+        self.trades = 0.0
+        self.wins = 0
+
+    def bar_signal(self, *values):
+        # 1, -1 or 0 for the bar from the indicators updated with it
+        raise NotImplementedError
+
+    def extend(self, data):
+        # Feeds the bars of data newer than the last one seen and returns the metrics
+        if data is not None and not data.empty:
+            self.update_frame(data)
+        return self.result()
+
+    def update(self, *values):
+        close = values[-1]
+        bar_return = close / self.previous_close - 1 if not math.isnan(self.previous_close) else NAN
+        self.previous_close = close
+        position = self.signal  # Signal.shift()
+        if self.style == 'compounded':
+            # RSIStrategy earns the return two bars after the signal and counts trades from position changes
+            strategy = self.position * bar_return
+            strategy = 0.0 if math.isnan(strategy) else strategy
+            self.total *= 1 + strategy
+            change = position - self.position
+            self.trades += 0.0 if math.isnan(change) else abs(change)
+        else:
+            strategy = position * bar_return
+            if not math.isnan(strategy):
+                # Neumaier summation keeps the running total at the precision of a full Series.sum()
+                total = self.total + strategy
+                if abs(self.total) >= abs(strategy):
+                    self.compensation += (self.total - total) + strategy
+                else:
+                    self.compensation += (strategy - total) + self.total
+                self.total = total
+            self.trades += 0.0 if math.isnan(position) else abs(position)
+        self.wins += strategy > 0
+        self.bars += 1
+        self.position = position
+        self.signal = self.bar_signal(*values)
+        self.value = self.signal
+        return self.value
+
+    def result(self):
+        if self.style == 'compounded':
+            num_trades = self.trades / 2
+            return {
+                'total_return': self.total - 1,
+                'num_trades': num_trades,
+                'win_rate': self.wins / num_trades if num_trades != 0 else 0,
+            }
+        return {
+            'total_return': self.total + self.compensation,
+            'num_trades': self.trades,
+            'win_rate': self.wins / self.bars if self.bars else NAN,
+        }
+
+
+def rsi_signal(rsi, overbought, oversold):
+    return 1 if rsi < oversold else -1 if rsi > overbought else 0
+
+
+class RSIBacktest(IncrementalBacktest):
+    style = 'compounded'
+
+    def __init__(self, RSI_PERIOD, RSI_OVERBOUGHT, RSI_OVERSOLD):
+        super().__init__()
+        self.rsi = IncrementalRSI(int(RSI_PERIOD))
+        self.overbought = int(RSI_OVERBOUGHT)
+        self.oversold = int(RSI_OVERSOLD)
+
+    def bar_signal(self, close):
+        return rsi_signal(self.rsi.update(close), self.overbought, self.oversold)
+
+
+class CrossoverBacktest(IncrementalBacktest):
+    # SMAStrategy, EMAStrategy and the crossover strategies: long while fast is above slow
+    def __init__(self, fast, slow, average):
+        super().__init__()
+        self.fast = average(int(fast))
+        self.slow = average(int(slow))
+
+    def bar_signal(self, close):
+        fast, slow = self.fast.update(close), self.slow.update(close)
+        return 1 if fast > slow else -1 if fast < slow else 0
+
+
+class MomentumBacktest(IncrementalBacktest):
+    # MomentumStrategy: the RSI signal, overridden by %K above 80 or below 20
+    columns = ('high', 'low', 'close')
+
+    def __init__(self, rsi_params, stochastic_params):
+        super().__init__()
+        self.rsi = IncrementalRSI(int(rsi_params['RSI_PERIOD']))
+        self.overbought = int(rsi_params['RSI_OVERBOUGHT'])
+        self.oversold = int(rsi_params['RSI_OVERSOLD'])
+        self.stochastic = IncrementalStochastic(stochastic_params['k_period'], stochastic_params['d_period'])
+
+    def bar_signal(self, high, low, close):
+        signal = rsi_signal(self.rsi.update(close), self.overbought, self.oversold)
+        k = self.stochastic.update(high, low, close)
+        return 1 if k < 20 else -1 if k > 80 else signal
+
+
+INCREMENTAL_BACKTESTS = {
+    'RSI': RSIBacktest,
+    'SMA': lambda Fast_Period, Slow_Period: CrossoverBacktest(Fast_Period, Slow_Period, RollingMean),
+    'EMA': lambda Fast_Period, Slow_Period: CrossoverBacktest(Fast_Period, Slow_Period, EMAState),
+    'SMACrossover': lambda fast_period=10, slow_period=30: CrossoverBacktest(fast_period, slow_period, RollingMean),
+    'EMACrossover': lambda fast_period=10, slow_period=30: CrossoverBacktest(fast_period, slow_period, EMAState),
+    'Momentum': MomentumBacktest,
+}
+
+
+def incremental_backtest(strategy_name, **params):
+    # A fresh backtest for the strategy, or None if it has no incremental form
+    factory = INCREMENTAL_BACKTESTS.get(strategy_name)
+    return factory(**params) if factory is not None else None
@@ -0,0 +1,191 @@
+import json
+import logging
+import os
+import threading
+import time
+
+import numpy as np
+
+import backend.variables as variables
+from backend.database.sqlite.backtest_cache import params_key
+from backend.database.sqlite.schema import connect
+
+# Backtest metrics as one NumPy record array, 44 bytes per result. Pairs, strategies and parameter
+# sets are stored as indices into small interned tables, and only the three metrics are copied
+# out of each report, so its DataFrame can be freed. Rows older than the retention window are
+# dropped as new ones arrive, so memory stays flat however many cycles run.
+
+RESULT_DTYPE = np.dtype([
+    ('time', 'f8'),  # Epoch seconds the result was stored
+    ('cycle', 'i4'),
+    ('pair', 'i2'),
+    ('strategy', 'i2'),
+    ('params', 'i4'),
+    ('total_return', 'f8'),
+    ('num_trades', 'f8'),
+    ('win_rate', 'f8'),
+])
+METRICS = ('total_return', 'num_trades', 'win_rate')
+
+
+class Interned:
+    # Value <-> small integer index
+    def __init__(self):
+        self.values = []
+        self.indices = {}
+
+    def index(self, key, value=None):
+        if key not in self.indices:
+            self.indices[key] = len(self.values)
+            self.values.append(key if value is None else value)
+        return self.indices[key]
+
+
+class BacktestResultsStore:
+    def __init__(self, retention=None, max_rows=None, flush=None, db_name=None):
+        settings = variables.BACKTEST_RESULTS
+        self.retention = retention or settings['RETENTION']
+        self.max_rows = max_rows or settings['MAX_ROWS']
+        self.flush_enabled = settings['FLUSH'] if flush is None else flush
+        self.db_name = db_name or settings['DB_NAME']
+        self.rows = np.empty(min(1024, self.max_rows), dtype=RESULT_DTYPE)
+        self.size = 0
+        self.flushed = 0  # Rows at the start of the array already written to SQLite
+        self.cycle = 0
+        self.latest_cycles = {}  # kind -> id of its last cycle
+        self.pairs = Interned()
+        self.strategies = Interned()
+        self.params = Interned()
+        self.lock = threading.Lock()
+        self.conn = None
+
+    def __len__(self):
+        return self.size
+
+    def new_cycle(self, kind='backtest'):
+        # Returns the id results of one cycle are appended with; kinds keep e.g. the YELLOW trade
+        # confirmations apart from the GREEN backtesting cycles
+        with self.lock:
+            self.cycle += 1
+            self.latest_cycles[kind] = self.cycle
+            self.expire()
+            return self.cycle
+
+    def latest_cycle(self, kind='backtest'):
+        return self.latest_cycles.get(kind, -1)  # -1 matches no rows
+
+    def append(self, pair, strategy, param_set, results, cycle=None):
+        with self.lock:
+            if self.size == len(self.rows):
+                self.expire()
+                if self.size == len(self.rows):
+                    grown = np.empty(min(len(self.rows) * 2, self.max_rows), dtype=RESULT_DTYPE)
+                    grown[:self.size] = self.rows[:self.size]
+                    self.rows = grown
+            row = self.rows[self.size]
+            row['time'] = time.time()
+            row['cycle'] = self.cycle if cycle is None else cycle
+            row['pair'] = self.pairs.index(pair)
+            row['strategy'] = self.strategies.index(strategy)
+            row['params'] = self.params.index(params_key(param_set), dict(param_set))
+            for metric in METRICS:
+                row[metric] = float(results[metric])
+            self.size += 1
+
+    def expire(self):
+        # Drops rows older than the retention window. At max_rows the oldest go in one batch down to
+        # 90% of it, so the array is not shifted again on every append.
+        live = self.rows[:self.size]
+        keep_from = int(np.searchsorted(live['time'], time.time() - self.retention, side='left'))
+        if self.size >= self.max_rows:
+            keep_from = max(keep_from, self.size - int(self.max_rows * 0.9))
+        if keep_from <= 0:
+            return
+        if self.flush_enabled and keep_from > self.flushed:
+            self._flush()
+        self.rows[:self.size - keep_from] = live[keep_from:]
+        self.size -= keep_from
+        self.flushed = max(self.flushed - keep_from, 0)
+
+    def results(self, cycle=None, pair=None, strategy=None):
+        # Matching rows as a record array copy
+        with self.lock:
+            rows = self.rows[:self.size]
+            mask = np.ones(self.size, dtype=bool)
+            if cycle is not None:
+                mask &= rows['cycle'] == cycle
+            if pair is not None:
+                mask &= rows['pair'] == self.pairs.indices.get(pair, -1)
+            if strategy is not None:
+                mask &= rows['strategy'] == self.strategies.indices.get(strategy, -1)
+            return rows[mask]
+
+    def top(self, n=10, metric='total_return', cycle=None, **filters):
+        # The n best distinct (pair, strategy, params) by metric, as dicts. From the latest backtesting
+        # cycle unless a cycle id is given; cycle='all' ranks every retained cycle.
+        if cycle is None:
+            cycle = self.latest_cycle()
+        rows = self.results(cycle=None if cycle == 'all' else cycle, **filters)
+        # Results repeat between candle closes; the newest row of each combination stands for it
+        combination = (rows['pair'].astype(np.int64) << 48) | (rows['strategy'].astype(np.int64) << 32) | rows['params'].astype(np.int64)
+        _, newest = np.unique(combination[::-1], return_index=True)
+        rows = rows[::-1][newest]
+        order = np.argsort(-rows[metric], kind='stable')[:n]
+        return self.records(rows[order])
+
+    def latest(self, kind='backtest'):
+        # Every result of the last cycle of kind, as dicts
+        return self.records(self.results(cycle=self.latest_cycle(kind)))
+
+    def records(self, rows):
+        return [{
+            'pair': self.pairs.values[row['pair']],
+            'strategy': self.strategies.values[row['strategy']],
+            'params': self.params.values[row['params']],
+            **{metric: row[metric].item() for metric in METRICS},
+        } for row in rows]
+
+    def flush(self):
+        # Writes the rows not yet in SQLite
+        with self.lock:
+            self._flush()
+
+    def _flush(self):
+        rows = self.rows[self.flushed:self.size]
+        if not len(rows):
+            return
+        if self.conn is None:
+            if os.path.dirname(self.db_name):
+                os.makedirs(os.path.dirname(self.db_name), exist_ok=True)
+            self.conn = connect(self.db_name)
+            with self.conn:
+                self.conn.execute('''
+                    CREATE TABLE IF NOT EXISTS backtest_history (
+                        time REAL NOT NULL,
+                        pair TEXT NOT NULL,
+                        strategy TEXT NOT NULL,
+                        params TEXT NOT NULL,
+                        total_return REAL,
+                        num_trades REAL,
+                        win_rate REAL
+                    )
+                ''')
+        with self.conn:
+            self.conn.executemany('INSERT INTO backtest_history VALUES (?, ?, ?, ?, ?, ?, ?)', (
+                (row['time'].item(), self.pairs.values[row['pair']], self.strategies.values[row['strategy']],
+                 json.dumps(self.params.values[row['params']], sort_keys=True, default=lambda value: value.item()),
+                 *(row[metric].item() for metric in METRICS))
+                for row in rows))
+        self.flushed = self.size
+        logging.info(f"Flushed {len(rows)} backtest results to {self.db_name}")
+
+    def get_stats(self):
+        with self.lock:
+            return {
+                'rows': self.size,
+                'capacity': len(self.rows),
+                'bytes': self.rows.nbytes,
+                'cycle': self.cycle,
+                'latest_cycles': dict(self.latest_cycles),
+                'flushed': self.flushed,
+            }
@@ -1,83 +1,172 @@
 import logging
-from datetime import datetime
-import pandas as pd
+import threading
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from datetime import datetime, timezone
+from backend.indicators.feature_cache import features
 from backend.strategies.momentum_strategy import MomentumStrategy
 import backend.variables as variables
 from backend.oanda_api.oanda_api import OandaAPI
+from backend.utils.multi_timeframe import MultiTimeframeData
 from backend.utils.utility import configure_logging
 
 configure_logging("control_system")
 
+class InstrumentState:
+    # The outcome of the latest analysis of one instrument
+    def __init__(self, instrument):
+        self.instrument = instrument
+        self.state = variables.STATE_RED
+        self.level = None  # Analysis level that set the state: monthly, daily or minute
+        self.reports = {}
+        self.duration = 0.0
+        self.error = None
+        self.updated = None
+
+    def set(self, state, level):
+        self.state, self.level = state, level
+        logging.info(f"State set to {state.upper()} for {self.instrument} based on {level} analysis.")
+
+    def record(self, level, report):
+        # Keeps the metrics but not the report's DataFrame
+        self.reports[level] = {key: report[key] for key in ('total_return', 'num_trades', 'win_rate')}
+        return report
+
+    def finish(self, duration):
+        self.duration = duration
+        self.error = None
+        self.updated = datetime.now(timezone.utc)
+
+    def fail(self, error):
+        self.state, self.level, self.error = variables.STATE_RED, None, error
+        self.updated = datetime.now(timezone.utc)
+
+    def to_dict(self):
+        return {
+            'state': self.state,
+            'level': self.level,
+            'reports': {level: {key: float(value) for key, value in report.items()} for level, report in self.reports.items()},
+            'duration': self.duration,
+            'error': self.error,
+            'updated': self.updated.isoformat() if self.updated else None,
+        }
+
+
 class ControlSystem:
     
-    def __init__(self):
+    def __init__(self, max_workers=None):
+        settings = variables.CONTROL_SYSTEM
         self.api = OandaAPI()
+        self.max_workers = max_workers or settings['MAX_WORKERS']
+        self.states = {}  # instrument -> InstrumentState
+        self.lock = threading.Lock()
+        self.cycles = 0
+        self.cycle_times = deque(maxlen=settings['CYCLE_HISTORY'])
 
-    def get_historical_data(self, instrument, granularity):
-        data, message = self.api.get_historical_data(instrument, granularity, 5000)
-        if data is not None:
-            logging.info(f"Retrieved historical data for {instrument}: {data.head()}")
-            logging.debug(f"DataFrame columns for {instrument}: {data.columns}")
-
-            if 'time' not in data.columns:
-                logging.error(f"Missing 'time' column in the historical data for {instrument}.")
-                logging.error(f"Data columns: {data.columns}")
-                return None
-
-            data['time'] = pd.to_datetime(data['time'])
-            data = data.sort_values(by='time', ascending=False)
-            return data
-        else:
-            logging.error(f"Failed to retrieve data: {message}")
+    def timeframe(self, frames, granularity):
+        # The last 5000 bars of a granularity, as a copy the strategy can add columns to
+        data = frames.get(granularity)
+        if data is None or data.empty:
+            logging.error(f"No {granularity} data for {frames.instrument}.")
             return None
+        return data.tail(5000).copy()
 
-    def analyze_instrument(self, instrument):
+    def analyze_instrument(self, instrument, frames=None):
+        # Monthly, daily and minute bars all come from one MultiTimeframeData series; the outcome
+        # goes into the instrument's own InstrumentState
+        started = time.perf_counter()
+        state = self.state_for(instrument)
+        state.reports = {}
+        if frames is None:
+            frames = MultiTimeframeData.load(instrument, self.api)
         logging.info(f"Analyzing {instrument} at monthly level.")
-        monthly_data = self.get_historical_data(instrument, 'M')
+        monthly_data = self.timeframe(frames, 'M')
         if monthly_data is not None:
             strategy = MomentumStrategy(monthly_data, variables.RSI_PARAMS, variables.STOCHASTIC_PARAMS)
-            monthly_report = strategy.backtest()
+            monthly_report = state.record('monthly', strategy.backtest())
             if monthly_report['total_return'] > 0 and monthly_report['win_rate'] > 0.5:
-                variables.current_state = variables.STATE_GREEN
-                logging.info(f"State set to GREEN for {instrument} based on monthly analysis.")
+                state.set(variables.STATE_GREEN, 'monthly')
                 
                 logging.info(f"Analyzing {instrument} at daily level.")
-                daily_data = self.get_historical_data(instrument, 'D')
+                daily_data = self.timeframe(frames, 'D')
                 if daily_data is not None:
                     strategy = MomentumStrategy(daily_data, variables.RSI_PARAMS, variables.STOCHASTIC_PARAMS)
-                    daily_report = strategy.backtest()
+                    daily_report = state.record('daily', strategy.backtest())
                     if daily_report['total_return'] > 0 and daily_report['win_rate'] > 0.5:
-                        variables.current_state = variables.STATE_GREEN
-                        logging.info(f"State set to GREEN for {instrument} based on daily analysis.")
+                        state.set(variables.STATE_GREEN, 'daily')
                         
                         logging.info(f"Analyzing {instrument} at minute level.")
-                        minute_data = self.get_historical_data(instrument, 'M1')
+                        minute_data = self.timeframe(frames, 'M1')
                         if minute_data is not None:
                             strategy = MomentumStrategy(minute_data, variables.RSI_PARAMS, variables.STOCHASTIC_PARAMS)
-                            minute_report = strategy.backtest()
+                            minute_report = state.record('minute', strategy.backtest())
                             if minute_report['total_return'] > 0 and minute_report['win_rate'] > 0.5:
                                 logging.info(f"Executing trade for {instrument} based on minute analysis.")
                                 # Execute trade logic here
                             else:
-                                variables.current_state = variables.STATE_YELLOW
-                                logging.info(f"State set to YELLOW for {instrument} based on minute analysis.")
+                                state.set(variables.STATE_YELLOW, 'minute')
                         else:
-                            variables.current_state = variables.STATE_YELLOW
-                            logging.info(f"State set to YELLOW for {instrument} based on daily analysis.")
+                            state.set(variables.STATE_YELLOW, 'daily')
                     else:
-                        variables.current_state = variables.STATE_YELLOW
-                        logging.info(f"State set to YELLOW for {instrument} based on daily analysis.")
+                        state.set(variables.STATE_YELLOW, 'daily')
                 else:
-                    variables.current_state = variables.STATE_RED
-                    logging.info(f"State set to RED for {instrument} based on daily analysis.")
+                    state.set(variables.STATE_RED, 'daily')
             else:
-                variables.current_state = variables.STATE_RED
-                logging.info(f"State set to RED for {instrument} based on monthly analysis.")
+                state.set(variables.STATE_RED, 'monthly')
+        if frames.fetched:
+            logging.info(f"{instrument} needed separate requests for {frames.fetched}.")
+        state.finish(time.perf_counter() - started)
+        return state
+
+    def state_for(self, instrument):
+        with self.lock:
+            if instrument not in self.states:
+                self.states[instrument] = InstrumentState(instrument)
+            return self.states[instrument]
+
+    def run_analysis(self, instruments=None):
+        # Analyzes the instruments concurrently, at most CONTROL_SYSTEM['MAX_WORKERS'] at a time;
+        # returns their states by instrument. None means every configured instrument; an empty list does nothing.
+        instruments = variables.AUTO_TRADING["TRADE_INSTRUMENTS"] if instruments is None else list(instruments)
+        if not instruments:
+            return {}
+        started = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=max(1, min(self.max_workers, len(instruments)))) as executor:
+            futures = {executor.submit(self.analyze_instrument, instrument): instrument for instrument in instruments}
+            for future in as_completed(futures):
+                try:
+                    future.result()
+                except Exception as e:
+                    instrument = futures[future]
+                    logging.error(f"Analysis of {instrument} failed: {e}")
+                    self.state_for(instrument).fail(str(e))
+        self.record_cycle(instruments, time.perf_counter() - started)
+        features.log_stats("analysis")
+        return {instrument: self.states[instrument] for instrument in instruments}
+
+    def record_cycle(self, instruments, elapsed):
+        durations = [self.states[instrument].duration for instrument in instruments]
+        with self.lock:
+            self.cycle_times.append(elapsed)
+            self.cycles += 1
+            # The overall state is the best one any instrument reached, for code that reads one state
+            states = {self.states[instrument].state for instrument in instruments}
+            variables.current_state = next((candidate for candidate in (variables.STATE_GREEN, variables.STATE_YELLOW)
+                                            if candidate in states), variables.STATE_RED)
+        logging.info(f"Analysis cycle: {len(instruments)} instruments in {elapsed:.2f}s; slowest "
+                     f"{max(durations, default=0):.2f}s, {sum(durations):.2f}s of instrument time")
 
-    def run_analysis(self):
-        instruments = variables.AUTO_TRADING["TRADE_INSTRUMENTS"]
-        for instrument in instruments:
-            self.analyze_instrument(instrument)
+    def get_stats(self):
+        with self.lock:
+            cycle_times = list(self.cycle_times)
+            return {
+                'cycles': self.cycles,
+                'last_cycle_seconds': cycle_times[-1] if cycle_times else None,
+                'mean_cycle_seconds': sum(cycle_times) / len(cycle_times) if cycle_times else None,
+                'max_cycle_seconds': max(cycle_times, default=None),
+                'instruments': {instrument: state.to_dict() for instrument, state in self.states.items()},
+            }
 
 if __name__ == "__main__":
     control_system = ControlSystem()
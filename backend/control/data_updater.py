@@ -1,19 +1,16 @@
 import time
-from control_system import ControlSystem
 import logging
+from backend.database.sqlite.populate_data import PopulateHistory
 from backend.utils.utility import configure_logging
 
 configure_logging("upload_data")
 
 def update_data():
-    control_system = ControlSystem()
+    populator = PopulateHistory()
     while True:
         try:
-            instruments = control_system.get_instruments()
-            for instrument in instruments:
-                control_system.update_tables(instrument, 'D')
-                control_system.update_tables(instrument, 'M')
-                control_system.update_tables(instrument, 'M1')
+            # Only candles newer than each table's high-water mark are fetched and upserted
+            populator.populate_all_instruments(incremental=True)
             logging.info("Data updated successfully.")
         except Exception as e:
             logging.error(f"Error updating data: {e}")
@@ -0,0 +1,130 @@
+import argparse
+import logging
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+
+import pandas as pd
+from requests.adapters import HTTPAdapter
+
+import backend.variables as variables
+from backend.database.sqlite.candle_store import GRANULARITY_SECONDS, CandleStore
+from backend.oanda_api.oanda_api import OandaAPI
+from backend.utils.rate_limiter import RateLimiter
+from backend.utils.utility import configure_logging
+
+configure_logging("backfill")
+
+
+class Backfill:
+    def __init__(self, db_name=None, max_workers=None, requests_per_second=None, window_candles=None):
+        self.store = CandleStore(db_name=db_name)
+        self.max_workers = max_workers or variables.BACKFILL['MAX_WORKERS']
+        self.window_candles = window_candles or variables.BACKFILL['WINDOW_CANDLES']
+        self.limiter = RateLimiter(requests_per_second or variables.BACKFILL['REQUESTS_PER_SECOND'])
+        self.api = OandaAPI()
+        self.api.session.mount('https://', HTTPAdapter(pool_maxsize=self.max_workers))
+        self.api.session.mount('http://', HTTPAdapter(pool_maxsize=self.max_workers))
+        self.create_checkpoint_table()
+
+    def create_checkpoint_table(self):
+        with self.store.lock, self.store.conn:
+            self.store.conn.execute('''
+                CREATE TABLE IF NOT EXISTS backfill_checkpoints (
+                    instrument TEXT NOT NULL,
+                    granularity TEXT NOT NULL,
+                    window_start INTEGER NOT NULL,
+                    window_end INTEGER NOT NULL,  -- Epoch seconds the fetched candles are complete up to
+                    candles INTEGER,
+                    PRIMARY KEY (instrument, granularity, window_start)
+                ) WITHOUT ROWID
+            ''')
+
+    def windows(self, granularity, start, end):
+        # Windows sit on a fixed epoch grid so a resumed run finds the same boundaries
+        if granularity not in GRANULARITY_SECONDS:
+            return [(start, end)]
+        span = GRANULARITY_SECONDS[granularity] * self.window_candles
+        first = int(start.timestamp()) // span * span
+        return [
+            (max(start, pd.Timestamp(window_start, unit='s', tz='UTC')),
+             min(end, pd.Timestamp(window_start + span, unit='s', tz='UTC')))
+            for window_start in range(first, int(end.timestamp()), span)
+        ]
+
+    def completed_windows(self, instrument, granularity):
+        # window_start -> window_end of the checkpointed windows
+        with self.store.lock:
+            rows = self.store.conn.execute(
+                'SELECT window_start, window_end FROM backfill_checkpoints WHERE instrument = ? AND granularity = ?',
+                (instrument, granularity)
+            ).fetchall()
+        return dict(rows)
+
+    def fetch_window(self, instrument, granularity, date_from, date_to):
+        self.limiter.acquire()
+        # A window reaching past the last closed candle is only complete up to that candle's close
+        closed = int(time.time())
+        if granularity in GRANULARITY_SECONDS:
+            closed = closed // GRANULARITY_SECONDS[granularity] * GRANULARITY_SECONDS[granularity]
+        data, message = self.api.download_historical_data(instrument, granularity, date_from=date_from, date_to=date_to, complete_only=True)
+        return data, message, min(int(date_to.timestamp()), closed)
+
+    def run(self, instruments, granularity, start, end=None):
+        start = pd.Timestamp(start, tz='UTC') if pd.Timestamp(start).tzinfo is None else pd.Timestamp(start)
+        end = pd.Timestamp.now(tz='UTC') if end is None else pd.Timestamp(end)
+        end = end.tz_localize('UTC') if end.tzinfo is None else end
+        began = time.perf_counter()
+
+        tasks = []
+        for instrument in instruments:
+            done = self.completed_windows(instrument, granularity)
+            for date_from, date_to in self.windows(granularity, start, end):
+                # Windows checkpointed short of the requested end, like the one open when the last run ended, are fetched again
+                if done.get(int(date_from.timestamp()), -1) < int(date_to.timestamp()):
+                    tasks.append((instrument, date_from, date_to))
+        logging.info(f"Backfilling {len(tasks)} {granularity} windows for {len(instruments)} instruments from {start} to {end}")
+
+        written = failed = 0
+        with ThreadPoolExecutor(max_workers=self.max_workers) as executor:
+            futures = {
+                executor.submit(self.fetch_window, instrument, granularity, date_from, date_to): (instrument, date_from)
+                for instrument, date_from, date_to in tasks
+            }
+            # Requests run in parallel; writes stay on this thread so SQLite sees a single writer
+            for future in as_completed(futures):
+                instrument, date_from = futures[future]
+                try:
+                    data, message, window_end = future.result()
+                except Exception as e:
+                    data, message, window_end = None, str(e), None
+                if data is None:
+                    failed += 1
+                    logging.error(f"Backfill window {instrument} {granularity} {date_from} failed: {message}")
+                    continue
+                if not data.empty:
+                    self.store.write(instrument, granularity, data)
+                with self.store.lock, self.store.conn:
+                    self.store.conn.execute(
+                        'INSERT OR REPLACE INTO backfill_checkpoints (instrument, granularity, window_start, window_end, candles) VALUES (?, ?, ?, ?, ?)',
+                        (instrument, granularity, int(date_from.timestamp()), window_end, len(data))
+                    )
+                written += len(data)
+
+        elapsed = time.perf_counter() - began
+        logging.info(f"Backfill wrote {written} candles in {elapsed:.1f}s ({failed} windows failed, rerun to resume)")
+        return {'windows': len(tasks), 'failed': failed, 'candles': written, 'seconds': elapsed}
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Backfill candle history into the local candle store.")
+    parser.add_argument('--instruments', nargs='+', default=variables.AUTO_TRADING["TRADE_INSTRUMENTS"])
+    parser.add_argument('--granularity', default='M1')
+    parser.add_argument('--start', required=True)
+    parser.add_argument('--end', default=None)
+    parser.add_argument('--workers', type=int, default=None)
+    parser.add_argument('--rate', type=float, default=None, help="Requests per second across all workers")
+    parser.add_argument('--db', default=None)
+    args = parser.parse_args()
+
+    backfill = Backfill(db_name=args.db, max_workers=args.workers, requests_per_second=args.rate)
+    print(backfill.run(args.instruments, args.granularity, args.start, args.end))
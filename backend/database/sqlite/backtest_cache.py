@@ -0,0 +1,125 @@
+import json
+import logging
+import os
+import threading
+import time
+
+import pandas as pd
+
+import backend.variables as variables
+from backend.database.sqlite.schema import connect
+
+# Backtest metrics keyed by the candles they were computed on. A series is identified by its
+# instrument, granularity, last candle time and length, so until a new candle closes every
+# strategy and parameter set of a GREEN cycle is answered from here instead of being re-run.
+
+METRIC_COLUMNS = ['total_return', 'num_trades', 'win_rate']
+
+
+def params_key(param_set):
+    # Canonical JSON so the same parameters always map to the same row
+    return json.dumps(param_set, sort_keys=True, default=lambda value: value.item())
+
+
+def series_key(data):
+    # (last candle time in epoch seconds, number of candles)
+    return int(pd.Timestamp(data.index[-1]).timestamp()), len(data)
+
+
+class BacktestCache:
+    def __init__(self, db_name=None, max_age=None, max_rows=None):
+        settings = variables.BACKTEST_CACHE
+        self.db_name = db_name or settings['DB_NAME']
+        self.max_age = max_age or settings['MAX_AGE']
+        self.max_rows = max_rows or settings['MAX_ROWS']
+        if os.path.dirname(self.db_name):
+            os.makedirs(os.path.dirname(self.db_name), exist_ok=True)
+        self.conn = connect(self.db_name)
+        self.lock = threading.Lock()
+        self.stats = {'hits': 0, 'misses': 0, 'evictions': 0}
+        with self.conn:
+            self.conn.execute('''
+                CREATE TABLE IF NOT EXISTS backtest_results (
+                    instrument TEXT NOT NULL,
+                    granularity TEXT NOT NULL,
+                    last_time INTEGER NOT NULL,
+                    bars INTEGER NOT NULL,
+                    strategy TEXT NOT NULL,
+                    params TEXT NOT NULL,
+                    total_return REAL,
+                    num_trades REAL,
+                    win_rate REAL,
+                    created_at REAL NOT NULL,
+                    PRIMARY KEY (instrument, granularity, last_time, bars, strategy, params)
+                ) WITHOUT ROWID
+            ''')
+            self.conn.execute('CREATE INDEX IF NOT EXISTS backtest_results_created_at ON backtest_results (created_at)')
+        self.evict()
+
+    def get_many(self, instrument, granularity, data, strategy):
+        # Cached metrics of every parameter set already backtested on this series, by params_key
+        last_time, bars = series_key(data)
+        with self.lock:
+            rows = self.conn.execute('''
+                SELECT params, total_return, num_trades, win_rate FROM backtest_results
+                WHERE instrument = ? AND granularity = ? AND last_time = ? AND bars = ? AND strategy = ?
+            ''', (instrument, granularity, last_time, bars, strategy)).fetchall()
+        return {params: dict(zip(METRIC_COLUMNS, metrics)) for params, *metrics in rows}
+
+    def put_many(self, instrument, granularity, data, strategy, results):
+        # results is a list of (param_set, backtest results) pairs
+        last_time, bars = series_key(data)
+        now = time.time()
+        rows = [(instrument, granularity, last_time, bars, strategy, params_key(param_set),
+                 *(float(result[column]) for column in METRIC_COLUMNS), now)
+                for param_set, result in results]
+        with self.lock, self.conn:
+            self.conn.executemany('''
+                INSERT OR REPLACE INTO backtest_results
+                    (instrument, granularity, last_time, bars, strategy, params, total_return, num_trades, win_rate, created_at)
+                VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+            ''', rows)
+
+    def record(self, hits, misses):
+        with self.lock:
+            self.stats['hits'] += hits
+            self.stats['misses'] += misses
+
+    def evict(self):
+        # Drops rows older than max_age seconds, then the oldest rows beyond max_rows
+        with self.lock, self.conn:
+            evicted = self.conn.execute('DELETE FROM backtest_results WHERE created_at < ?',
+                                        (time.time() - self.max_age,)).rowcount
+            excess = self.conn.execute('SELECT COUNT(*) FROM backtest_results').fetchone()[0] - self.max_rows
+            if excess > 0:
+                # A put_many batch shares one created_at, so the key breaks ties and exactly excess rows go
+                evicted += self.conn.execute('''
+                    DELETE FROM backtest_results WHERE (instrument, granularity, last_time, bars, strategy, params) IN (
+                        SELECT instrument, granularity, last_time, bars, strategy, params FROM backtest_results
+                        ORDER BY created_at, instrument, granularity, last_time, bars, strategy, params LIMIT ?
+                    )
+                ''', (excess,)).rowcount
+            self.stats['evictions'] += evicted
+        if evicted:
+            logging.info(f"Evicted {evicted} backtest results from the cache")
+
+    def get_stats(self):
+        with self.lock:
+            stats = dict(self.stats)
+            lookups = stats['hits'] + stats['misses']
+            stats['hit_rate'] = stats['hits'] / lookups if lookups else 0.0
+            stats['cached_results'] = self.conn.execute('SELECT COUNT(*) FROM backtest_results').fetchone()[0]
+            return stats
+
+
+_backtest_cache = None
+_backtest_cache_lock = threading.Lock()
+
+
+def get_backtest_cache():
+    # One cache per process, like the candle store
+    global _backtest_cache
+    with _backtest_cache_lock:
+        if _backtest_cache is None:
+            _backtest_cache = BacktestCache()
+        return _backtest_cache
@@ -0,0 +1,177 @@
+import logging
+import os
+import threading
+from collections import OrderedDict
+from datetime import datetime, timedelta, timezone
+
+import pandas as pd
+
+import backend.variables as variables
+from backend.database.sqlite.schema import connect
+
+# Candle length in seconds for the fixed-size OANDA granularities
+GRANULARITY_SECONDS = {
+    'S5': 5, 'S10': 10, 'S15': 15, 'S30': 30,
+    'M1': 60, 'M2': 120, 'M4': 240, 'M5': 300, 'M10': 600, 'M15': 900, 'M30': 1800,
+    'H1': 3600, 'H2': 7200, 'H3': 10800, 'H4': 14400, 'H6': 21600, 'H8': 28800, 'H12': 43200,
+    'D': 86400, 'W': 604800,
+}
+
+OHLC_COLUMNS = ['open', 'high', 'low', 'close']
+CANDLE_COLUMNS = OHLC_COLUMNS + ['volume']
+
+
+def next_close_time(granularity, open_time):
+    # The candle after the one opened at open_time is the next one that can close
+    if granularity == 'M':
+        return open_time + pd.DateOffset(months=2)
+    return open_time + timedelta(seconds=2 * GRANULARITY_SECONDS[granularity])
+
+
+def to_epoch(index):
+    return ((index - pd.Timestamp(0, tz='UTC')) // pd.Timedelta(seconds=1)).astype('int64')
+
+
+def from_epoch(seconds):
+    return pd.to_datetime(seconds, unit='s', utc=True)
+
+
+class CandleStore:
+    def __init__(self, db_name=None, memory_size=None):
+        self.db_name = db_name or variables.CANDLE_STORE['DB_NAME']
+        self.memory_size = memory_size or variables.CANDLE_STORE['MEMORY_SIZE']
+        if os.path.dirname(self.db_name):
+            os.makedirs(os.path.dirname(self.db_name), exist_ok=True)
+        self.conn = connect(self.db_name)
+        self.lock = threading.RLock()
+        self.memory = OrderedDict()
+        self.complete = set()  # Keys whose memory frame holds every stored candle
+        self.stats = {
+            'hits': 0,
+            'misses': 0,
+            'memory_hits': 0,
+            'disk_hits': 0,
+            'evictions': 0,
+            'upstream_requests': 0,
+            'candles_fetched': 0,
+        }
+
+    def get(self, instrument, granularity, count, price='M'):
+        # Look in memory first, then on disk; the result may hold fewer than `count` candles
+        key = (instrument, granularity, price)
+        with self.lock:
+            frame = self.memory.get(key)
+            if frame is not None and (len(frame) >= count or key in self.complete):
+                self.memory.move_to_end(key)
+                self.stats['memory_hits'] += 1
+                return frame
+            frame = self._read(key, count)
+            if frame is None or frame.empty:
+                return None
+            self._remember(key, frame)
+            if len(frame) < count:
+                # Nothing older is stored, so later reads of any length are served from memory
+                self.complete.add(key)
+                return frame
+            self.stats['disk_hits'] += 1
+            return frame
+
+    def save(self, instrument, granularity, data, price='M', replace=False):
+        # Upsert closed candles and merge them into the in-memory series; replace drops the cached
+        # series instead, for a refetch that does not reach back to it
+        key = (instrument, granularity, price)
+        if data is None or data.empty:
+            return self.memory.get(key)
+        with self.lock:
+            self._write(key, data)
+            if replace:
+                self.complete.discard(key)
+            cached = None if replace else self.memory.get(key)
+            if cached is not None:
+                merged = pd.concat([cached, data[CANDLE_COLUMNS]])
+                merged = merged[~merged.index.duplicated(keep='last')].sort_index()
+                # Keep the in-memory series at the length callers have asked for so far, or whole
+                # while it holds everything stored
+                data = merged if key in self.complete else merged.tail(max(len(cached), len(data)))
+            self._remember(key, data[CANDLE_COLUMNS])
+            return self.memory[key]
+
+    def write(self, instrument, granularity, data, price='M'):
+        # Upsert only, for bulk loads that should not pass through the memory layer
+        key = (instrument, granularity, price)
+        with self.lock:
+            self._write(key, data)
+            # The memory frame may now be missing older candles
+            self.complete.discard(key)
+
+    def _write(self, key, data):
+        rows = zip(
+            [key[0]] * len(data), [key[1]] * len(data), [key[2]] * len(data),
+            to_epoch(data.index).tolist(),
+            data['open'].tolist(), data['high'].tolist(), data['low'].tolist(), data['close'].tolist(),
+            data['volume'].tolist()
+        )
+        with self.lock, self.conn:
+            self.conn.executemany('''
+                INSERT INTO candles (instrument, granularity, price, time, open, high, low, close, volume)
+                VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)
+                ON CONFLICT (instrument, granularity, price, time) DO UPDATE SET
+                    open = excluded.open, high = excluded.high, low = excluded.low,
+                    close = excluded.close, volume = excluded.volume
+            ''', rows)
+
+    def is_current(self, granularity, last_time, now=None):
+        # True while no candle newer than last_time can have closed yet
+        now = now or datetime.now(timezone.utc)
+        return now < next_close_time(granularity, last_time)
+
+    def record(self, hit, fetched=0):
+        with self.lock:
+            self.stats['hits' if hit else 'misses'] += 1
+            if not hit:
+                self.stats['upstream_requests'] += 1
+                self.stats['candles_fetched'] += fetched
+
+    def get_stats(self):
+        with self.lock:
+            stats = dict(self.stats)
+            lookups = stats['hits'] + stats['misses']
+            stats['hit_rate'] = stats['hits'] / lookups if lookups else 0.0
+            stats['cached_series'] = len(self.memory)
+            return stats
+
+    def _read(self, key, count):
+        cursor = self.conn.execute('''
+            SELECT time, open, high, low, close, volume FROM candles
+            WHERE instrument = ? AND granularity = ? AND price = ?
+            ORDER BY time DESC LIMIT ?
+        ''', (*key, count))
+        rows = cursor.fetchall()
+        if not rows:
+            return None
+        frame = pd.DataFrame.from_records(rows[::-1], columns=['time'] + CANDLE_COLUMNS)
+        frame['time'] = from_epoch(frame['time'])
+        frame.set_index('time', inplace=True)
+        return frame
+
+    def _remember(self, key, frame):
+        self.memory[key] = frame
+        self.memory.move_to_end(key)
+        while len(self.memory) > self.memory_size:
+            evicted, _ = self.memory.popitem(last=False)
+            self.complete.discard(evicted)
+            self.stats['evictions'] += 1
+            logging.debug(f"Evicted {evicted} from the candle store memory layer")
+
+
+_candle_store = None
+_candle_store_lock = threading.Lock()
+
+
+def get_candle_store():
+    # One store per process so every OandaAPI instance shares the same cache
+    global _candle_store
+    with _candle_store_lock:
+        if _candle_store is None:
+            _candle_store = CandleStore()
+        return _candle_store
@@ -1,47 +1,11 @@
-import sqlite3
+from backend.database.sqlite.schema import connect, migrate_legacy_tables
 
-def create_tables():
-    conn = sqlite3.connect('forex_data.db')
-    cursor = conn.cursor()
-
-    # Create tables for daily, monthly, and yearly data
-    cursor.execute('''
-        CREATE TABLE IF NOT EXISTS daily_data (
-            id INTEGER PRIMARY KEY,
-            instrument TEXT,
-            time TEXT,
-            open REAL,
-            high REAL,
-            low REAL,
-            close REAL
-        )
-    ''')
-
-    cursor.execute('''
-        CREATE TABLE IF NOT EXISTS monthly_data (
-            id INTEGER PRIMARY KEY,
-            instrument TEXT,
-            time TEXT,
-            open REAL,
-            high REAL,
-            low REAL,
-            close REAL
-        )
-    ''')
-
-    cursor.execute('''
-        CREATE TABLE IF NOT EXISTS yearly_data (
-            id INTEGER PRIMARY KEY,
-            instrument TEXT,
-            time TEXT,
-            open REAL,
-            high REAL,
-            low REAL,
-            close REAL
-        )
-    ''')
-
-    conn.commit()
+def create_tables(db_name='backend/database/sqlite/forex_data.db'):
+    # One candles table keyed by (instrument, granularity, price, epoch time) replaces
+    # the daily_data/monthly_data/yearly_data and per-instrument layouts
+    conn = connect(db_name)
+    migrate_legacy_tables(conn)
     conn.close()
 
-create_tables()
+if __name__ == "__main__":
+    create_tables()
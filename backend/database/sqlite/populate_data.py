@@ -2,92 +2,131 @@ import json
 import logging
 import os
 import sqlite3
+import sys
+import threading
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime
 
 import pandas as pd
 import requests
-from sqlalchemy import create_engine, exc  
 
 import backend.defs as defs
+import backend.variables as variables
+from backend.database.sqlite.schema import connect, migrate_legacy_tables
+from backend.oanda_api.oanda_api import rate_limiter
+from backend.utils.candle_decoder import decode_ohlc
 from backend.utils.utility import configure_logging
 
+MAX_CANDLES = 5000  # Largest count OANDA accepts per candles request
+GRANULARITIES = ['D', 'M', 'M1']
+
 class PopulateHistory:
     def __init__(self, db_name='backend/database/sqlite/forex_data.db'):
         self.db_name = db_name
-        self.conn = sqlite3.connect(db_name)
-        self.engine = create_engine(f'sqlite:///{db_name}')
+        self.conn = connect(db_name)
+        # Instruments are fetched on worker threads; the shared connection is used under this lock
+        self.lock = threading.RLock()
         self.api = OandaAPI()
         self.setup_logging()
+        self.migrate()
     
     def setup_logging(self):
         configure_logging("populate_data")
         logging.info('Logging populate_data configured successfully.')
-    
-    def create_tables(self, instrument):
+
+    def migrate(self):
         try:
-            with self.conn:
-                # Create tables for daily, monthly, and minute data for the given instrument
-                self.conn.execute(f'''
-                    CREATE TABLE IF NOT EXISTS {instrument}_daily (
-                        id INTEGER PRIMARY KEY,
-                        time TEXT,
-                        open REAL,
-                        high REAL,
-                        low REAL,
-                        close REAL
-                    )
-                ''')
-                self.conn.execute(f'''
-                    CREATE TABLE IF NOT EXISTS {instrument}_monthly (
-                        id INTEGER PRIMARY KEY,
-                        time TEXT,
-                        open REAL,
-                        high REAL,
-                        low REAL,
-                        close REAL
-                    )
-                ''')
-                self.conn.execute(f'''
-                    CREATE TABLE IF NOT EXISTS {instrument}_minute (
-                        id INTEGER PRIMARY KEY,
-                        time TEXT,
-                        open REAL,
-                        high REAL,
-                        low REAL,
-                        close REAL
-                    )
-                ''')
-            logging.info(f"Tables for {instrument} created successfully.")
+            with self.lock:
+                migrated = migrate_legacy_tables(self.conn)
+                if migrated:
+                    logging.info(f"Migrated {migrated} legacy candle rows into the candles table.")
         except Exception as e:
-            logging.error(f"Error creating tables for {instrument}: {e}")
+            logging.error(f"Error migrating legacy candle tables: {e}")
 
-    def populate_table(self, instrument, granularity, table_name):
+    def write_candles(self, instrument, granularity, data):
+        # data holds the decoded candle columns, with times already in epoch seconds
+        rows = zip(
+            data['time'].tolist(), data['open'].tolist(), data['high'].tolist(),
+            data['low'].tolist(), data['close'].tolist(), data['volume'].tolist()
+        )
+        with self.lock, self.conn:
+            self.conn.executemany('''
+                INSERT INTO candles (instrument, granularity, price, time, open, high, low, close, volume)
+                VALUES (?, ?, 'M', ?, ?, ?, ?, ?, ?)
+                ON CONFLICT (instrument, granularity, price, time) DO UPDATE SET
+                    open = excluded.open, high = excluded.high, low = excluded.low,
+                    close = excluded.close, volume = excluded.volume
+            ''', ((instrument, granularity, *row) for row in rows))
+
+    def populate_table(self, instrument, granularity):
         try:
             # Get historical data
-            data, message = self.api.get_historical_data(instrument, granularity, 5000)
+            data, message = self.api.get_historical_data(instrument, granularity, MAX_CANDLES)
             if data is not None:
-                data['time'] = pd.to_datetime(data['time'])
-                data = data.sort_values(by='time', ascending=False)
-                data.to_sql(table_name, self.engine, if_exists='replace', index=False)
-                logging.info(f"Populated {table_name} with {granularity} data for {instrument}")
-                print(f"Populated {table_name} with {granularity} data for {instrument}")
+                # The forming candle is left out, as in sync_table
+                complete = data['complete']
+                data = {name: column[complete] for name, column in data.items()}
+                # Upsert only: older candles from backfills and the candle store are kept
+                self.write_candles(instrument, granularity, data)
+                logging.info(f"Populated candles with {granularity} data for {instrument}")
+                print(f"Populated candles with {granularity} data for {instrument}")
             else:
                 logging.error(f"Failed to get historical data for {instrument}: {message}")
-        except (exc.SQLAlchemyError, Exception) as e:
-            logging.error(f"Error populating table {table_name} for {instrument}: {e}")
+        except (sqlite3.Error, Exception) as e:
+            logging.error(f"Error populating {granularity} candles for {instrument}: {e}")
+
+    def get_high_water(self, instrument, granularity):
+        # A single seek on the candles key
+        with self.lock:
+            row = self.conn.execute(
+                "SELECT MAX(time) FROM candles WHERE instrument = ? AND granularity = ? AND price = 'M'",
+                (instrument, granularity)
+            ).fetchone()
+        return row[0] if row else None
 
-    def populate_all_instruments(self):
+    def sync_table(self, instrument, granularity):
+        try:
+            high_water = self.get_high_water(instrument, granularity)
+            date_from = pd.Timestamp(high_water, unit='s', tz='UTC') if high_water is not None else None
+            inserted = 0
+            while True:
+                if date_from is None:
+                    data, message = self.api.get_historical_data(instrument, granularity, MAX_CANDLES)
+                else:
+                    data, message = self.api.get_historical_data(instrument, granularity, MAX_CANDLES, date_from=date_from)
+                if data is None:
+                    logging.error(f"Failed to get historical data for {instrument}: {message}")
+                    break
+                received = len(data['time'])
+                # Only closed candles move the high-water mark; the forming one is fetched again next run
+                complete = data['complete']
+                data = {name: column[complete] for name, column in data.items()}
+                if not len(data['time']):
+                    break
+                self.write_candles(instrument, granularity, data)
+                inserted += len(data['time'])
+                date_from = pd.Timestamp(int(data['time'].max()), unit='s', tz='UTC')
+                if high_water is None or received < MAX_CANDLES:
+                    break
+            logging.info(f"Synced {inserted} {granularity} candles for {instrument} up to {date_from}")
+        except (sqlite3.Error, Exception) as e:
+            logging.error(f"Error syncing {granularity} candles for {instrument}: {e}")
+
+    def populate_all_instruments(self, incremental=False):
         try:
             instruments = self.api.get_instruments()
             if not instruments:
                 logging.error("No instruments retrieved from API.")
                 return
 
-            for instrument in instruments:
-                self.create_tables(instrument)
-                self.populate_table(instrument, 'D', f'{instrument}_daily')
-                self.populate_table(instrument, 'M', f'{instrument}_monthly')
-                self.populate_table(instrument, 'M1', f'{instrument}_minute')
+            populate = self.sync_table if incremental else self.populate_table
+
+            def populate_instrument(instrument):
+                for granularity in GRANULARITIES:
+                    populate(instrument, granularity)
+
+            with ThreadPoolExecutor(max_workers=variables.OANDA_API['MAX_WORKERS']) as executor:
+                list(executor.map(populate_instrument, instruments))
 
             logging.info("All instruments populated successfully.")
         except Exception as e:
@@ -103,26 +142,23 @@ class OandaAPI:
             "Authorization": f"Bearer {self.api_key}"
         }
 
-    def get_historical_data(self, instrument, granularity, count):
+    def get_historical_data(self, instrument, granularity, count, date_from=None):
         endpoint = f"/instruments/{instrument}/candles"
         params = {
             "granularity": granularity,
             "count": count,
             "price": "M"
         }
+        if date_from is not None:
+            params["from"] = int(date_from.timestamp())
         try:
+            rate_limiter.acquire()
             response = requests.get(self.api_url + endpoint, headers=self.headers, params=params)
             if response.status_code == 200:    
-                data = response.json()
-                df = pd.DataFrame([{
-                    "time": candle["time"],
-                    "open": candle["mid"]["o"],
-                    "high": candle["mid"]["h"],
-                    "low": candle["mid"]["l"],
-                    "close": candle["mid"]["c"]
-                } for candle in data["candles"]])
+                # Decoded straight into columns; the rows go to SQLite without a DataFrame in between
+                data = decode_ohlc(response.json()["candles"])
                 print("PRCode: populate_data - I got historical data here!")
-                return df, "Success"
+                return data, "Success"
             else:
                 return None, response.text
         except requests.exceptions.RequestException as e:
@@ -146,4 +182,4 @@ class OandaAPI:
 
 if __name__ == "__main__":
     populator = PopulateHistory()
-    populator.populate_all_instruments()
+    populator.populate_all_instruments(incremental='--incremental' in sys.argv)
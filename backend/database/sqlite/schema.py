@@ -0,0 +1,87 @@
+import logging
+import re
+import sqlite3
+
+import pandas as pd
+
+# Suffixes of the per-instrument tables PopulateHistory used to create
+LEGACY_SUFFIXES = {
+    'daily': 'D',
+    'monthly': 'M',
+    'minute': 'M1',
+}
+
+# Shared tables from the old create_tables.py layout; 'Y' has no OANDA granularity but keeps the rows apart
+LEGACY_SHARED_TABLES = {
+    'daily_data': 'D',
+    'monthly_data': 'M',
+    'yearly_data': 'Y',
+}
+
+
+def connect(db_name):
+    conn = sqlite3.connect(db_name, check_same_thread=False)
+    create_schema(conn)
+    return conn
+
+
+def create_schema(conn):
+    # WAL lets the web app read while the updater writes; the setting is stored in the database file
+    conn.execute('PRAGMA journal_mode=WAL')
+    conn.execute('PRAGMA synchronous=NORMAL')
+    with conn:
+        # WITHOUT ROWID clusters rows on the key, so the primary key is the covering index for range scans
+        conn.execute('''
+            CREATE TABLE IF NOT EXISTS candles (
+                instrument TEXT NOT NULL,
+                granularity TEXT NOT NULL,
+                price TEXT NOT NULL DEFAULT 'M',
+                time INTEGER NOT NULL,
+                open REAL,
+                high REAL,
+                low REAL,
+                close REAL,
+                volume INTEGER,
+                PRIMARY KEY (instrument, granularity, price, time)
+            ) WITHOUT ROWID
+        ''')
+
+
+def migrate_legacy_tables(conn, keep_legacy=False):
+    # Copy rows from both older layouts into candles, converting TEXT times to epoch seconds
+    tables = [row[0] for row in conn.execute("SELECT name FROM sqlite_master WHERE type = 'table'")]
+    migrated = 0
+    for table_name in tables:
+        if table_name in LEGACY_SHARED_TABLES:
+            granularity = LEGACY_SHARED_TABLES[table_name]
+            instrument = None
+        elif (match := re.fullmatch(r'([A-Z0-9]+_[A-Z0-9]+)_(daily|monthly|minute)', table_name)):
+            instrument, granularity = match.group(1), LEGACY_SUFFIXES[match.group(2)]
+        else:
+            continue
+
+        columns = ['instrument', 'time', 'open', 'high', 'low', 'close'] if instrument is None else ['time', 'open', 'high', 'low', 'close']
+        for chunk in pd.read_sql(f'SELECT {", ".join(columns)} FROM "{table_name}"', conn, chunksize=50000):
+            chunk = chunk.dropna(subset=['time'])
+            if chunk.empty:
+                continue
+            if instrument is not None:
+                chunk['instrument'] = instrument
+            times = pd.to_datetime(chunk['time'], utc=True, format='mixed')
+            chunk['time'] = (times - pd.Timestamp(0, tz='UTC')) // pd.Timedelta(seconds=1)
+            chunk['granularity'] = granularity
+            rows = chunk[['instrument', 'granularity', 'time', 'open', 'high', 'low', 'close']].itertuples(index=False, name=None)
+            with conn:
+                conn.executemany('''
+                    INSERT INTO candles (instrument, granularity, price, time, open, high, low, close)
+                    VALUES (?, ?, 'M', ?, ?, ?, ?, ?)
+                    ON CONFLICT (instrument, granularity, price, time) DO NOTHING
+                ''', rows)
+            migrated += len(chunk)
+
+        if not keep_legacy:
+            with conn:
+                conn.execute(f'DROP TABLE "{table_name}"')
+        logging.info(f"Migrated {table_name} into candles as {granularity}")
+    return migrated
+
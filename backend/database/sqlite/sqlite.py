@@ -1,25 +1,98 @@
-import sqlite3
+import numpy as np
 import pandas as pd
 
+from backend.database.sqlite.schema import connect
+
+CANDLE_COLUMNS = ['open', 'high', 'low', 'close', 'volume']
+
+
+def to_epoch_seconds(value):
+    # Accepts epoch seconds, datetimes or date strings; naive values are taken as UTC
+    if value is None:
+        return None
+    if isinstance(value, (int, np.integer)):
+        return int(value)
+    timestamp = pd.Timestamp(value)
+    if timestamp.tzinfo is None:
+        timestamp = timestamp.tz_localize('UTC')
+    return int((timestamp - pd.Timestamp(0, tz='UTC')) // pd.Timedelta(seconds=1))
+
+
 class SQLiteDatabase:
-    def __init__(self, db_name):
-        self.conn = sqlite3.connect(db_name)
+    def __init__(self, db_name='backend/database/sqlite/forex_data.db'):
+        self.conn = connect(db_name)
 
     def store_data(self, df, table_name):
         df.to_sql(table_name, self.conn, if_exists='append', index=False)
 
     def get_data(self, table_name):
-        return pd.read_sql(f'SELECT * FROM {table_name}', self.conn)
-
-# Usage Example
-db = SQLiteDatabase()
-df = pd.DataFrame({
-    'instrument': ['EUR_USD'] * 5,
-    'time': ['2023-01-01', '2023-01-02', '2023-01-03', '2023-01-04', '2023-01-05'],
-    'open': [1.1, 1.2, 1.3, 1.4, 1.5],
-    'high': [1.2, 1.3, 1.4, 1.5, 1.6],
-    'low': [1.0, 1.1, 1.2, 1.3, 1.4],
-    'close': [1.15, 1.25, 1.35, 1.45, 1.55]
-})
-db.store_data(df, 'daily_data')
-print(db.get_data('daily_data'))
+        tables = {row[0] for row in self.conn.execute("SELECT name FROM sqlite_master WHERE type = 'table'")}
+        if table_name not in tables:
+            raise ValueError(f"Unknown table: {table_name}")
+        return pd.read_sql(f'SELECT * FROM "{table_name}"', self.conn)
+
+    def _range_query(self, instrument, granularity, start, end, columns, price):
+        columns = list(columns or CANDLE_COLUMNS[:4])
+        unknown = [column for column in columns if column not in CANDLE_COLUMNS]
+        if unknown:
+            raise ValueError(f"Unknown candle columns: {unknown}")
+        # Column names come from the whitelist above; every value is a bound parameter
+        where = 'instrument = ? AND granularity = ? AND price = ?'
+        params = [instrument, granularity, price]
+        if start is not None:
+            where += ' AND time >= ?'
+            params.append(to_epoch_seconds(start))
+        if end is not None:
+            where += ' AND time <= ?'
+            params.append(to_epoch_seconds(end))
+        return columns, where, params
+
+    def iter_range(self, instrument, granularity, start=None, end=None, columns=None, price='M', chunksize=50000):
+        # Yields (times, values) chunks: int64 epoch seconds and a float64 (rows x columns) block
+        columns, where, params = self._range_query(instrument, granularity, start, end, columns, price)
+        cursor = self.conn.execute(
+            f'SELECT time, {", ".join(columns)} FROM candles WHERE {where} ORDER BY time', params
+        )
+        while (rows := cursor.fetchmany(chunksize)):
+            block = np.array(rows, dtype=np.float64)
+            yield block[:, 0].astype(np.int64), block[:, 1:]
+
+    def count_range(self, instrument, granularity, start=None, end=None, price='M'):
+        _, where, params = self._range_query(instrument, granularity, start, end, None, price)
+        return self.conn.execute(f'SELECT COUNT(*) FROM candles WHERE {where}', params).fetchone()[0]
+
+    def get_range(self, instrument, granularity, start=None, end=None, columns=None, price='M', as_numpy=False, chunksize=50000):
+        columns = list(columns or CANDLE_COLUMNS[:4])
+        if as_numpy:
+            # Preallocate once and fill chunk by chunk so no per-row Python objects outlive a chunk
+            total = self.count_range(instrument, granularity, start, end, price)
+            arrays = {'time': np.empty(total, dtype=np.int64)}
+            arrays.update({column: np.empty(total, dtype=np.float64) for column in columns})
+            offset = 0
+            for times, values in self.iter_range(instrument, granularity, start, end, columns, price, chunksize):
+                size = min(len(times), total - offset)
+                arrays['time'][offset:offset + size] = times[:size]
+                for i, column in enumerate(columns):
+                    arrays[column][offset:offset + size] = values[:size, i]
+                offset += size
+                if offset == total:
+                    break
+            return {name: array[:offset] for name, array in arrays.items()}
+
+        frames = [
+            pd.DataFrame(values, columns=columns, index=pd.to_datetime(times, unit='s', utc=True))
+            for times, values in self.iter_range(instrument, granularity, start, end, columns, price, chunksize)
+        ]
+        if not frames:
+            return pd.DataFrame(columns=columns, index=pd.DatetimeIndex([], tz='UTC', name='time'), dtype=np.float64)
+        data = pd.concat(frames)
+        data.index.name = 'time'
+        return data
+
+
+if __name__ == "__main__":
+    # Usage Example
+    db = SQLiteDatabase()
+    print(db.get_range('EUR_USD', 'D', start='2023-01-01', end='2023-12-31'))
+    arrays = db.get_range('EUR_USD', 'M1', start='2023-01-01', columns=['close'], as_numpy=True)
+    print(f"Loaded {len(arrays['time'])} M1 closes")
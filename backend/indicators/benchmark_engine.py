@@ -0,0 +1,94 @@
+import argparse
+import time
+
+import numpy as np
+import pandas as pd
+
+from backend.indicators import engine
+from backend.indicators.macd_indicator import MACDIndicator
+from backend.indicators.stochastic_indicator import StochasticIndicator
+
+# Checks the vectorized signals against the row-wise DataFrame.apply versions they replaced
+# and reports the speedup for each one.
+
+
+def synthetic_bars(rows, seed=0):
+    rng = np.random.default_rng(seed)
+    close = 1.1 * np.exp(np.cumsum(rng.normal(0, 0.0002, rows)))
+    spread = np.abs(rng.normal(0, 0.0003, rows))
+    index = pd.date_range('2020-01-01', periods=rows, freq='min', tz='UTC', name='time')
+    return pd.DataFrame({
+        'open': np.r_[close[0], close[:-1]],
+        'high': close + spread,
+        'low': close - spread,
+        'close': close,
+    }, index=index)
+
+
+def apply_macd_signal(data):
+    return data.apply(
+        lambda row: 1 if row['MACD'] > row['Signal'] else (-1 if row['MACD'] < row['Signal'] else 0), axis=1
+    )
+
+
+def apply_stochastic_signal(data):
+    return data.apply(
+        lambda row: 1 if row['%K'] > row['%D'] and row['%K'] < 20 else
+                    (-1 if row['%K'] < row['%D'] and row['%K'] > 80 else 0), axis=1
+    )
+
+
+def apply_combined_signal(data, columns):
+    return data.apply(lambda row: np.sign(sum(row.get(column, 0) for column in columns)), axis=1)
+
+
+def timed(function, repeat):
+    best = float('inf')
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = function()
+        best = min(best, time.perf_counter() - start)
+    return best, result
+
+
+def run(rows=100_000, repeat=3):
+    data = synthetic_bars(rows)
+    macd = MACDIndicator().calculate_macd(data.copy())
+    stochastic = StochasticIndicator(data.copy(), 14, 3).calculate_stochastic()
+    signals = pd.DataFrame({
+        'MACD_Signal': engine.crossover_signal(macd['MACD'].to_numpy(), macd['Signal'].to_numpy()),
+        'Stochastic_Signal': engine.stochastic_signal(stochastic['%K'].to_numpy(), stochastic['%D'].to_numpy()),
+    }, index=data.index)
+
+    cases = {
+        'MACD': (
+            lambda: apply_macd_signal(macd),
+            lambda: MACDIndicator().generate_signal(data.copy())['MACD_Signal'],
+        ),
+        'Stochastic': (
+            lambda: apply_stochastic_signal(stochastic),
+            lambda: StochasticIndicator(None, 14, 3).generate_signal(data.copy())['Stochastic_Signal'],
+        ),
+        'Combined': (
+            lambda: apply_combined_signal(signals, list(signals.columns)),
+            lambda: pd.Series(engine.combine_signals([signals[column] for column in signals.columns]), index=data.index),
+        ),
+    }
+
+    print(f"{rows} bars, best of {repeat}")
+    for name, (legacy, vectorized) in cases.items():
+        legacy_time, expected = timed(legacy, repeat)
+        vectorized_time, actual = timed(vectorized, repeat)
+        identical = np.array_equal(expected.to_numpy(), actual.to_numpy())
+        print(f"{name:<12} apply {legacy_time * 1000:9.1f} ms  vectorized {vectorized_time * 1000:7.2f} ms  "
+              f"speedup {legacy_time / vectorized_time:7.0f}x  identical={identical}")
+        if not identical:
+            raise AssertionError(f"{name} signals differ from the DataFrame.apply version")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark the vectorized indicator signals against DataFrame.apply.")
+    parser.add_argument('--rows', type=int, default=100_000)
+    parser.add_argument('--repeat', type=int, default=3)
+    args = parser.parse_args()
+    run(args.rows, args.repeat)
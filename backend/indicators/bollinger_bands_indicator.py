@@ -1,5 +1,7 @@
 import pandas as pd
 
+from backend.indicators.feature_cache import features
+
 class BollingerBandsIndicator:
     def __init__(self, data, window=20, num_std_dev=2):
         self.data = data
@@ -7,11 +9,6 @@ class BollingerBandsIndicator:
         self.num_std_dev = num_std_dev
 
     def calculate(self):
-        rolling_mean = self.data['close'].rolling(window=self.window).mean()
-        rolling_std = self.data['close'].rolling(window=self.window).std()
-        
-        self.data['Upper_Band'] = rolling_mean + (rolling_std * self.num_std_dev)
-        self.data['Lower_Band'] = rolling_mean - (rolling_std * self.num_std_dev)
-        self.data['Bollinger_Mid'] = rolling_mean
-        
+        for name, values in features.bollinger_bands(self.data['close'], self.window, self.num_std_dev).items():
+            self.data[name] = values
         return self.data
@@ -0,0 +1,128 @@
+import numpy as np
+import pandas as pd
+
+# Indicator kernels on NumPy arrays. The moving windows reuse pandas' compiled kernels, so values
+# match the DataFrame code bit for bit; every signal is a vectorized comparison over the whole array.
+
+
+def _series(values):
+    return pd.Series(np.asarray(values, dtype=np.float64))
+
+
+def ema(values, span):
+    return _series(values).ewm(span=span, adjust=False).mean().to_numpy()
+
+
+def sma(values, window):
+    return _series(values).rolling(window=window).mean().to_numpy()
+
+
+def rolling_std(values, window):
+    return _series(values).rolling(window=window).std().to_numpy()
+
+
+def rolling_min(values, window):
+    return _series(values).rolling(window=window).min().to_numpy()
+
+
+def rolling_max(values, window):
+    return _series(values).rolling(window=window).max().to_numpy()
+
+
+def rsi(close, period):
+    # Simple moving averages of gains and losses, as RSIStrategy and RSIIndicator compute it
+    delta = _series(close).diff()
+    gain = (delta.where(delta > 0, 0)).rolling(window=period).mean()
+    loss = (-delta.where(delta < 0, 0)).rolling(window=period).mean()
+    return (100 - (100 / (1 + gain / loss))).to_numpy()
+
+
+def sma_matrix(values, windows):
+    # Rolling means for several windows from one cumulative sum; bars x windows. The sum runs on
+    # deviations from the mean so it stays small and the rounding stays near pandas' rolling mean.
+    values = np.asarray(values, dtype=np.float64)
+    missing = np.isnan(values)
+    base = values[~missing].mean() if (~missing).any() else 0.0
+    sums = np.concatenate(([0.0], np.cumsum(np.where(missing, 0.0, values - base))))
+    gaps = np.concatenate(([0], np.cumsum(missing)))
+    matrix = np.full((len(values), len(windows)), np.nan)
+    for column, window in enumerate(windows):
+        if window <= len(values):
+            mean = (sums[window:] - sums[:-window]) / window + base
+            mean[gaps[window:] - gaps[:-window] > 0] = np.nan  # Like pandas, a NaN in the window gives NaN
+            matrix[window - 1:, column] = mean
+    return matrix
+
+
+def ema_matrix(values, spans):
+    # EMAs for several spans; bars x spans. The recursion is inherently sequential, and pandas'
+    # compiled loop per span beats a NumPy block formulation of the stacked recursion.
+    values = np.asarray(values, dtype=np.float64)
+    matrix = np.empty((len(values), len(spans)))
+    for column, span in enumerate(spans):
+        matrix[:, column] = ema(values, span)
+    return matrix
+
+
+def rsi_matrix(close, periods):
+    # rsi() for several periods; the gains and losses are averaged with sma_matrix. As in rsi(),
+    # a missing delta counts as neither gain nor loss.
+    delta = np.diff(np.asarray(close, dtype=np.float64), prepend=np.nan)
+    gain = sma_matrix(np.where(delta > 0, delta, 0.0), periods)
+    loss = sma_matrix(np.where(delta < 0, -delta, 0.0), periods)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        return 100 - (100 / (1 + gain / loss))
+
+
+def macd(close, fast_period=12, slow_period=26, signal_period=9):
+    ema_short = ema(close, fast_period)
+    ema_long = ema(close, slow_period)
+    macd_line = ema_short - ema_long
+    signal = ema(macd_line, signal_period)
+    return {
+        'EMA_short': ema_short,
+        'EMA_long': ema_long,
+        'MACD': macd_line,
+        'Signal': signal,
+        'Histogram': macd_line - signal,
+    }
+
+
+def stochastic(high, low, close, k_period, d_period):
+    lowest_low = rolling_min(low, k_period)
+    highest_high = rolling_max(high, k_period)
+    k = 100 * ((np.asarray(close, dtype=np.float64) - lowest_low) / (highest_high - lowest_low))
+    return {
+        'Lowest_Low': lowest_low,
+        'Highest_High': highest_high,
+        '%K': k,
+        '%D': sma(k, d_period),
+    }
+
+
+def bollinger_bands(close, window=20, num_std_dev=2):
+    mean = sma(close, window)
+    std = rolling_std(close, window)
+    return {
+        'Upper_Band': mean + (std * num_std_dev),
+        'Lower_Band': mean - (std * num_std_dev),
+        'Bollinger_Mid': mean,
+    }
+
+
+def crossover_signal(fast, slow):
+    # 1 where fast is above slow, -1 below, 0 when equal or either side is NaN
+    return np.where(fast > slow, 1, np.where(fast < slow, -1, 0)).astype(np.int64)
+
+
+def stochastic_signal(k, d, oversold=20, overbought=80):
+    # Buy on %K above %D while oversold, sell on %K below %D while overbought
+    buy = (k > d) & (k < oversold)
+    sell = (k < d) & (k > overbought)
+    return np.where(buy, 1, np.where(sell, -1, 0)).astype(np.int64)
+
+
+def combine_signals(signals):
+    # Sign of the summed signals; missing values count as no signal
+    signals = [np.nan_to_num(np.asarray(signal, dtype=np.float64)) for signal in signals]
+    return np.sign(np.sum(signals, axis=0))
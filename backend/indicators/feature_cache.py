@@ -0,0 +1,213 @@
+import hashlib
+import logging
+import threading
+from collections import OrderedDict
+
+import numpy as np
+
+import backend.variables as variables
+from backend.indicators import engine
+
+# Indicator series shared by every strategy and indicator class. Entries are keyed by
+# (fingerprint of the input columns, indicator, params), so the same rolling window over the same
+# prices is computed once however many strategies ask for it. Cached arrays are read-only; pandas
+# copies them before any in-place write to a column built from one.
+
+
+def as_array(values):
+    return np.ascontiguousarray(values, dtype=np.float64)
+
+
+def fingerprint(values):
+    # Length and digest of the raw float64 bytes; two columns with the same prices share entries
+    return len(values), hashlib.blake2b(values.data, digest_size=16).digest()
+
+
+class FeatureCache:
+    def __init__(self, max_entries=None, log_interval=None, enabled=None):
+        settings = variables.FEATURE_CACHE
+        self.max_entries = max_entries or settings['MAX_ENTRIES']
+        self.log_interval = log_interval or settings['LOG_INTERVAL']
+        self.enabled = settings['ENABLED'] if enabled is None else enabled
+        self.entries = OrderedDict()
+        self.lock = threading.Lock()
+        self.reset_stats()
+
+    def reset_stats(self):
+        self.stats = {'hits': 0, 'misses': 0, 'evictions': 0}
+        self.by_indicator = {}
+
+    def lookup(self, name, inputs, params, compute):
+        # Returns the cached result for inputs and params, computing it on a miss
+        if not self.enabled:
+            return compute()
+        key = (tuple(fingerprint(values) for values in inputs), name, params)
+        with self.lock:
+            result = self.entries.get(key)
+            if result is not None:
+                self.entries.move_to_end(key)
+            self._count(name, result is not None)
+        if result is None:
+            # Computed outside the lock; two threads missing on the same key both compute it
+            result = compute()
+            for values in (result.values() if isinstance(result, dict) else (result,)):
+                values.flags.writeable = False
+            with self.lock:
+                self.entries[key] = result
+                while len(self.entries) > self.max_entries:
+                    self.entries.popitem(last=False)
+                    self.stats['evictions'] += 1
+        return dict(result) if isinstance(result, dict) else result
+
+    def _count(self, name, hit):
+        field = 'hits' if hit else 'misses'
+        self.stats[field] += 1
+        counts = self.by_indicator.setdefault(name, {'hits': 0, 'misses': 0})
+        counts[field] += 1
+        if (self.stats['hits'] + self.stats['misses']) % self.log_interval == 0:
+            logging.info(f"Feature cache: {self._describe()}")
+
+    def get_stats(self):
+        with self.lock:
+            stats = dict(self.stats)
+            lookups = stats['hits'] + stats['misses']
+            stats['hit_rate'] = stats['hits'] / lookups if lookups else 0.0
+            stats['cached_series'] = len(self.entries)
+            stats['by_indicator'] = {name: dict(counts) for name, counts in self.by_indicator.items()}
+            return stats
+
+    def log_stats(self, label="cycle"):
+        # Logs the hit rates since the last call, e.g. once per backtesting or analysis cycle
+        with self.lock:
+            if self.stats['hits'] + self.stats['misses']:
+                logging.info(f"Feature cache ({label}): {self._describe()}")
+            self.reset_stats()
+
+    def _describe(self):
+        lookups = self.stats['hits'] + self.stats['misses']
+        rates = ', '.join(f"{name} {counts['hits'] / (counts['hits'] + counts['misses']):.0%}"
+                          for name, counts in sorted(self.by_indicator.items()))
+        return (f"{lookups} lookups, {self.stats['hits']} hits ({self.stats['hits'] / lookups:.1%}), "
+                f"{self.stats['evictions']} evictions, {len(self.entries)} series cached; {rates}")
+
+    def share(self, name, values, periods, matrix):
+        # Files each column of a multi-period matrix as the single-period entry, e.g. ('ema', (20,)),
+        # so strategies built for one combination of a sweep find their series already computed.
+        # Only for matrices whose columns are bit-identical to the single-period kernel, or a
+        # strategy's result would depend on whether a sweep ran first.
+        if not self.enabled:
+            return
+        inputs = (fingerprint(values),)
+        with self.lock:
+            for column, period in enumerate(periods):
+                key = (inputs, name, (period,))
+                if key not in self.entries:
+                    self.entries[key] = np.ascontiguousarray(matrix[:, column])
+                    self.entries[key].flags.writeable = False
+            while len(self.entries) > self.max_entries:
+                self.entries.popitem(last=False)
+                self.stats['evictions'] += 1
+
+    def prefetch(self, strategy_class, data, param_sets):
+        # Computes every period a parameter sweep will ask for in one pass per kernel; strategies
+        # list their period parameters in sweep_periods, e.g. {'Fast_Period': 'ema'}
+        periods = {}
+        for param, kernel in getattr(strategy_class, 'sweep_periods', {}).items():
+            periods.setdefault(kernel, set()).update(int(param_set[param]) for param_set in param_sets if param in param_set)
+        for kernel, values in periods.items():
+            getattr(self, f'{kernel}_matrix')(data['close'], sorted(values))
+
+    def clear(self):
+        with self.lock:
+            self.entries.clear()
+
+    def sma(self, values, window):
+        values = as_array(values)
+        return self.lookup('sma', (values,), (window,), lambda: engine.sma(values, window))
+
+    def ema(self, values, span):
+        values = as_array(values)
+        return self.lookup('ema', (values,), (span,), lambda: engine.ema(values, span))
+
+    def rolling_std(self, values, window):
+        values = as_array(values)
+        return self.lookup('rolling_std', (values,), (window,), lambda: engine.rolling_std(values, window))
+
+    def rolling_min(self, values, window):
+        values = as_array(values)
+        return self.lookup('rolling_min', (values,), (window,), lambda: engine.rolling_min(values, window))
+
+    def rolling_max(self, values, window):
+        values = as_array(values)
+        return self.lookup('rolling_max', (values,), (window,), lambda: engine.rolling_max(values, window))
+
+    def rsi(self, close, period):
+        close = as_array(close)
+        return self.lookup('rsi', (close,), (period,), lambda: engine.rsi(close, period))
+
+    def sma_matrix(self, values, windows):
+        # bars x windows; not shared, as the cumulative sums differ from engine.sma in the last bits
+        values, windows = as_array(values), tuple(int(window) for window in windows)
+        return self.lookup('sma_matrix', (values,), windows, lambda: engine.sma_matrix(values, windows))
+
+    def ema_matrix(self, values, spans):
+        # Each column is bit-identical to engine.ema and becomes the ema entry for its span
+        values, spans = as_array(values), tuple(int(span) for span in spans)
+        matrix = self.lookup('ema_matrix', (values,), spans, lambda: engine.ema_matrix(values, spans))
+        self.share('ema', values, spans, matrix)
+        return matrix
+
+    def rsi_matrix(self, close, periods):
+        # Not shared, for the same reason as sma_matrix
+        close, periods = as_array(close), tuple(int(period) for period in periods)
+        return self.lookup('rsi_matrix', (close,), periods, lambda: engine.rsi_matrix(close, periods))
+
+    def macd(self, close, fast_period=12, slow_period=26, signal_period=9):
+        # Same columns as engine.macd; the two EMAs are shared with the EMA strategies
+        close = as_array(close)
+
+        def compute():
+            ema_short = self.ema(close, fast_period)
+            ema_long = self.ema(close, slow_period)
+            macd_line = ema_short - ema_long
+            signal = engine.ema(macd_line, signal_period)
+            return {
+                'EMA_short': ema_short,
+                'EMA_long': ema_long,
+                'MACD': macd_line,
+                'Signal': signal,
+                'Histogram': macd_line - signal,
+            }
+        return self.lookup('macd', (close,), (fast_period, slow_period, signal_period), compute)
+
+    def stochastic(self, high, low, close, k_period, d_period):
+        high, low, close = as_array(high), as_array(low), as_array(close)
+
+        def compute():
+            lowest_low = self.rolling_min(low, k_period)
+            highest_high = self.rolling_max(high, k_period)
+            k = 100 * ((close - lowest_low) / (highest_high - lowest_low))
+            return {
+                'Lowest_Low': lowest_low,
+                'Highest_High': highest_high,
+                '%K': k,
+                '%D': engine.sma(k, d_period),
+            }
+        return self.lookup('stochastic', (high, low, close), (k_period, d_period), compute)
+
+    def bollinger_bands(self, close, window=20, num_std_dev=2):
+        # The middle band and width come from the sma and rolling_std entries, so those stay shared
+        close = as_array(close)
+
+        def compute():
+            mean = self.sma(close, window)
+            std = self.rolling_std(close, window)
+            return {
+                'Upper_Band': mean + (std * num_std_dev),
+                'Lower_Band': mean - (std * num_std_dev),
+                'Bollinger_Mid': mean,
+            }
+        return self.lookup('bollinger_bands', (close,), (window, num_std_dev), compute)
+
+
+features = FeatureCache()
@@ -0,0 +1,281 @@
+import math
+import threading
+from collections import deque
+
+# Streaming indicators that keep O(1) state per bar. Each one is seeded from history once and then
+# fed only the bars that arrive afterwards. Values follow the pandas formulas used in
+# backend/utils/indicators.py to floating point tolerance; the EMA recursion matches bit for bit.
+
+NAN = float('nan')
+
+
+class IncrementalIndicator:
+    columns = ('close',)
+
+    def __init__(self):
+        self.last_time = None
+        self.value = NAN
+
+    def update(self, *values):
+        raise NotImplementedError
+
+    def update_frame(self, data):
+        # Feeds the rows newer than the last bar seen; a fresh state takes the whole frame
+        start = 0 if self.last_time is None else data.index.searchsorted(self.last_time, side='right')
+        for values in zip(*(data[column].to_numpy(dtype=float)[start:].tolist() for column in self.columns)):
+            self.update(*values)
+        if start < len(data):
+            self.last_time = data.index[-1]
+        return self
+
+    def extends(self, data):
+        # False when data no longer contains the last bar seen, e.g. after a gap longer than the history
+        if self.last_time is None:
+            return True
+        position = data.index.searchsorted(self.last_time)
+        return position < len(data) and data.index[position] == self.last_time
+
+
+class RollingMean:
+    # Running sum over a fixed window, re-summed once per window to cancel rounding drift.
+    # Like pandas, the mean is NaN while the window is short or holds a NaN.
+    def __init__(self, window):
+        self.window = window
+        self.values = deque(maxlen=window)
+        self.total = 0.0
+        self.missing = 0
+        self.updates = 0
+
+    def update(self, value):
+        if len(self.values) == self.window:
+            removed = self.values[0]
+            if math.isnan(removed):
+                self.missing -= 1
+            else:
+                self.total -= removed
+        self.values.append(value)
+        if math.isnan(value):
+            self.missing += 1
+        else:
+            self.total += value
+        self.updates += 1
+        if self.updates % self.window == 0:
+            self.total = math.fsum(value for value in self.values if not math.isnan(value))
+        return self.mean
+
+    @property
+    def mean(self):
+        if len(self.values) < self.window or self.missing:
+            return NAN
+        return self.total / self.window
+
+
+class EMAState:
+    # The recursion pandas ewm(span, adjust=False) runs, including its guard for constant series
+    def __init__(self, span):
+        self.alpha = 1.0 / (1.0 + (span - 1) / 2.0)
+        self.old_weight = 1.0 - self.alpha
+        self.value = NAN
+
+    def update(self, value):
+        if math.isnan(self.value):
+            self.value = value
+        elif not math.isnan(value) and self.value != value:
+            self.value = (self.old_weight * self.value + self.alpha * value) / (self.old_weight + self.alpha)
+        return self.value
+
+
+class IncrementalSMA(IncrementalIndicator):
+    def __init__(self, period):
+        super().__init__()
+        self.mean = RollingMean(period)
+
+    def update(self, close):
+        self.value = self.mean.update(close)
+        return self.value
+
+
+class IncrementalEMA(IncrementalIndicator):
+    def __init__(self, period):
+        super().__init__()
+        self.ema = EMAState(period)
+
+    def update(self, close):
+        self.value = self.ema.update(close)
+        return self.value
+
+
+class IncrementalRSI(IncrementalIndicator):
+    # Simple moving averages of gains and losses, like RSIIndicator; wilder=True switches to
+    # Wilder's smoothing after the first full window
+    def __init__(self, period, wilder=False):
+        super().__init__()
+        self.period = period
+        self.wilder = wilder
+        self.gains = RollingMean(period)
+        self.losses = RollingMean(period)
+        self.average_gain = self.average_loss = NAN
+        self.previous = None
+
+    def update(self, close):
+        # The first bar has no delta; pandas' where() turns it into a zero gain and loss
+        delta = 0.0 if self.previous is None else close - self.previous
+        self.previous = close
+        gain, loss = max(delta, 0.0), max(-delta, 0.0)
+        if self.wilder and not math.isnan(self.average_gain):
+            self.average_gain = (self.average_gain * (self.period - 1) + gain) / self.period
+            self.average_loss = (self.average_loss * (self.period - 1) + loss) / self.period
+        else:
+            self.average_gain = self.gains.update(gain)
+            self.average_loss = self.losses.update(loss)
+        self.value = rsi_from_averages(self.average_gain, self.average_loss)
+        return self.value
+
+
+def rsi_from_averages(average_gain, average_loss):
+    if math.isnan(average_gain) or math.isnan(average_loss):
+        return NAN
+    if average_loss == 0:
+        return NAN if average_gain == 0 else 100.0
+    return 100 - (100 / (1 + average_gain / average_loss))
+
+
+class IncrementalMACD(IncrementalIndicator):
+    def __init__(self, fast_period=12, slow_period=26, signal_period=9):
+        super().__init__()
+        self.fast = EMAState(fast_period)
+        self.slow = EMAState(slow_period)
+        self.signal_line = EMAState(signal_period)
+        self.signal = self.histogram = NAN
+
+    def update(self, close):
+        self.value = self.fast.update(close) - self.slow.update(close)
+        self.signal = self.signal_line.update(self.value)
+        self.histogram = self.value - self.signal
+        return self.value
+
+
+class MonotonicWindow:
+    # Sliding-window minimum (or maximum) with amortized O(1) updates
+    def __init__(self, window, maximum=False):
+        self.window = window
+        self.sign = -1.0 if maximum else 1.0
+        self.items = deque()  # (position, signed value), increasing in value
+        self.position = 0
+
+    def update(self, value):
+        signed = self.sign * value
+        while self.items and self.items[-1][1] >= signed:
+            self.items.pop()
+        self.items.append((self.position, signed))
+        if self.items[0][0] <= self.position - self.window:
+            self.items.popleft()
+        self.position += 1
+        if self.position < self.window:
+            return NAN
+        return self.sign * self.items[0][1]
+
+
+class IncrementalStochastic(IncrementalIndicator):
+    columns = ('high', 'low', 'close')
+
+    def __init__(self, k_period=14, d_period=3):
+        super().__init__()
+        self.lowest = MonotonicWindow(k_period)
+        self.highest = MonotonicWindow(k_period, maximum=True)
+        self.d_line = RollingMean(d_period)
+        self.d = NAN
+
+    def update(self, high, low, close):
+        lowest_low = self.lowest.update(low)
+        highest_high = self.highest.update(high)
+        price_range = highest_high - lowest_low
+        if math.isnan(price_range) or price_range == 0:
+            self.value = NAN
+        else:
+            self.value = 100 * ((close - lowest_low) / price_range)
+        self.d = self.d_line.update(self.value)
+        return self.value
+
+
+class IncrementalBollinger(IncrementalIndicator):
+    # Rolling mean and sample standard deviation from centred sums, re-summed once per window
+    def __init__(self, period=20, std_dev=2):
+        super().__init__()
+        self.period = period
+        self.std_dev = std_dev
+        self.values = deque(maxlen=period)
+        self.mean = 0.0
+        self.squares = 0.0  # Sum of squared deviations from the mean
+        self.updates = 0
+        self.upper = self.lower = self.middle = self.price = NAN
+
+    def update(self, close):
+        if len(self.values) == self.period:
+            removed = self.values[0]
+            self.values.append(close)
+            previous_mean = self.mean
+            self.mean += (close - removed) / self.period
+            self.squares += (close - removed) * (close - self.mean + removed - previous_mean)
+        else:
+            self.values.append(close)
+            delta = close - self.mean
+            self.mean += delta / len(self.values)
+            self.squares += delta * (close - self.mean)
+        self.updates += 1
+        if self.updates % self.period == 0:
+            self.mean = math.fsum(self.values) / len(self.values)
+            self.squares = math.fsum((value - self.mean) ** 2 for value in self.values)
+
+        self.price = close
+        if len(self.values) < self.period:
+            self.upper = self.lower = self.middle = NAN
+        else:
+            std = math.sqrt(max(self.squares, 0.0) / (self.period - 1))
+            self.middle = self.mean
+            self.upper = self.mean + std * self.std_dev
+            self.lower = self.mean - std * self.std_dev
+        self.value = {'upper': self.upper, 'lower': self.lower, 'price': self.price}
+        return self.value
+
+
+class IncrementalATR(IncrementalIndicator):
+    # Mean true range over the period like ATRIndicator; wilder=True uses Wilder's smoothing
+    columns = ('high', 'low', 'close')
+
+    def __init__(self, period=14, wilder=False):
+        super().__init__()
+        self.period = period
+        self.wilder = wilder
+        self.ranges = RollingMean(period)
+        self.previous_close = None
+
+    def update(self, high, low, close):
+        true_range = high - low
+        if self.previous_close is not None:
+            true_range = max(true_range, abs(high - self.previous_close), abs(low - self.previous_close))
+        self.previous_close = close
+        if self.wilder and not math.isnan(self.value):
+            self.value = (self.value * (self.period - 1) + true_range) / self.period
+        else:
+            self.value = self.ranges.update(true_range)
+        return self.value
+
+
+def catch_up(state, factory, data):
+    # Returns a state that has seen every bar of data, seeding a new one when data does not extend it
+    if state is None or not state.extends(data):
+        state = factory()
+    return state.update_frame(data)
+
+
+class IndicatorStates:
+    # Keeps one live state per key, e.g. (instrument, indicator, params), across requests
+    def __init__(self):
+        self.states = {}
+        self.lock = threading.Lock()
+
+    def current(self, key, factory, data):
+        with self.lock:
+            state = self.states[key] = catch_up(self.states.get(key), factory, data)
+            return state.value
@@ -1,5 +1,8 @@
 import pandas as pd
 
+from backend.indicators import engine
+from backend.indicators.feature_cache import features
+
 class MACDIndicator:
     def __init__(self, fast_period=12, slow_period=26, signal_period=9):
         self.fast_period = fast_period
@@ -7,25 +10,15 @@ class MACDIndicator:
         self.signal_period = signal_period
 
     def calculate_macd(self, data: pd.DataFrame) -> pd.DataFrame:
-        # Calculate the short-term EMA
-        data['EMA_short'] = data['close'].ewm(span=self.fast_period, adjust=False).mean()
-        # Calculate the long-term EMA
-        data['EMA_long'] = data['close'].ewm(span=self.slow_period, adjust=False).mean()
-        # Calculate the MACD line
-        data['MACD'] = data['EMA_short'] - data['EMA_long']
-        # Calculate the Signal line
-        data['Signal'] = data['MACD'].ewm(span=self.signal_period, adjust=False).mean()
-        # Calculate the Histogram
-        data['Histogram'] = data['MACD'] - data['Signal']
+        # EMA_short, EMA_long, MACD, Signal and Histogram columns
+        for name, values in features.macd(data['close'], self.fast_period, self.slow_period, self.signal_period).items():
+            data[name] = values
         return data
 
     def generate_signal(self, data: pd.DataFrame) -> pd.DataFrame:
         data = self.calculate_macd(data)
-        data['MACD_Signal'] = 0
         # Generate signals: 1 for buy, -1 for sell
-        data['MACD_Signal'] = data.apply(
-            lambda row: 1 if row['MACD'] > row['Signal'] else (-1 if row['MACD'] < row['Signal'] else 0), axis=1
-        )
+        data['MACD_Signal'] = engine.crossover_signal(data['MACD'].to_numpy(), data['Signal'].to_numpy())
         return data
 
     def check_green_light(self, data: pd.DataFrame) -> bool:
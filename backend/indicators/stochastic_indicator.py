@@ -1,26 +1,25 @@
 import pandas as pd
 
+from backend.indicators import engine
+from backend.indicators.feature_cache import features
+
 class StochasticIndicator:
     def __init__(self, data, k_period, d_period):
         self.data = data
         self.k_period = k_period
         self.d_period = d_period
 
-    def calculate_stochastic(self):
-        self.data['Lowest_Low'] = self.data['low'].rolling(window=self.k_period).min()
-        self.data['Highest_High'] = self.data['high'].rolling(window=self.k_period).max()
-        self.data['%K'] = 100 * ((self.data['close'] - self.data['Lowest_Low']) / (self.data['Highest_High'] - self.data['Lowest_Low']))
-        self.data['%D'] = self.data['%K'].rolling(window=self.d_period).mean()
-        return self.data
+    def calculate_stochastic(self, data: pd.DataFrame = None) -> pd.DataFrame:
+        # Works on the frame given at construction unless another one is passed
+        data = self.data if data is None else data
+        for name, values in features.stochastic(data['high'], data['low'], data['close'], self.k_period, self.d_period).items():
+            data[name] = values
+        return data
 
     def generate_signal(self, data: pd.DataFrame) -> pd.DataFrame:
         data = self.calculate_stochastic(data)
-        data['Stochastic_Signal'] = 0
         # Generate signals: 1 for buy, -1 for sell, 0 for no signal
-        data['Stochastic_Signal'] = data.apply(
-            lambda row: 1 if row['%K'] > row['%D'] and row['%K'] < 20 else
-                        (-1 if row['%K'] < row['%D'] and row['%K'] > 80 else 0), axis=1
-        )
+        data['Stochastic_Signal'] = engine.stochastic_signal(data['%K'].to_numpy(), data['%D'].to_numpy())
         return data
     
     def check_green_light(self, data: pd.DataFrame) -> bool:
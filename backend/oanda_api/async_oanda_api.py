@@ -0,0 +1,250 @@
+import asyncio
+import json
+import logging
+import queue
+import random
+import threading
+
+import aiohttp
+import pandas as pd
+
+import backend.defs as defs
+import backend.variables as variables
+from backend.database.sqlite.candle_store import get_candle_store
+from backend.oanda_api.oanda_api import MAX_CANDLES, OandaAPI, candle_params, candles_to_frame, rate_limiter
+from backend.utils.utility import configure_logging
+
+configure_logging("oanda")
+
+
+class AsyncOandaAPI:
+    # asyncio counterpart of OandaAPI with the same (result, message) return values
+
+    def __init__(self):
+        self.session = None
+        self.candle_store = get_candle_store() if variables.CANDLE_STORE['ENABLED'] else None
+        self.settings = variables.ASYNC_OANDA_API
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc_info):
+        await self.close()
+
+    async def _get_session(self):
+        # Created lazily because aiohttp sessions must belong to the running loop
+        if self.session is None or self.session.closed:
+            self.session = aiohttp.ClientSession(
+                connector=aiohttp.TCPConnector(limit=self.settings['CONNECTION_LIMIT']),
+                timeout=aiohttp.ClientTimeout(total=self.settings['REQUEST_TIMEOUT']),
+                headers={'Authorization': f'Bearer {defs.API_KEY}', 'Content-Type': 'application/json'}
+            )
+        return self.session
+
+    async def close(self):
+        if self.session is not None and not self.session.closed:
+            await self.session.close()
+
+    async def _request_with_retries(self, method, url, params=None, data=None, max_retries=None, backoff_factor=None):
+        # Returns (status, body) or None; body is parsed JSON when possible
+        max_retries = max_retries or self.settings['MAX_RETRIES']
+        backoff_factor = backoff_factor or self.settings['BACKOFF_FACTOR']
+        session = await self._get_session()
+        for attempt in range(max_retries):
+            try:
+                await rate_limiter.acquire_async()
+                async with session.request(method, url, params=params, data=data) as response:
+                    text = await response.text()
+                    if response.status in [200, 201, 202]:
+                        return response.status, json.loads(text)
+                    elif response.status != 503:
+                        return response.status, text
+                    raise aiohttp.ClientError("Service unavailable (503)")
+            except (aiohttp.ClientError, asyncio.TimeoutError) as e:
+                if attempt + 1 == max_retries:
+                    logging.warning(f"Request failed (attempt {attempt + 1}/{max_retries}): {e}.")
+                    break
+                # Full jitter keeps concurrent retries from hitting OANDA in lockstep
+                wait_time = random.uniform(0, backoff_factor * (2 ** attempt))
+                logging.warning(f"Request failed (attempt {attempt + 1}/{max_retries}): {e}. Retrying in {wait_time:.2f} seconds...")
+                await asyncio.sleep(wait_time)
+        logging.error(f"Max retries exceeded for {url}")
+        return None
+
+    async def check_account(self):
+        url = f"{defs.OANDA_URL}/accounts/{defs.ACCOUNT_ID}"
+        result = await self._request_with_retries("GET", url)
+        if result is None:
+            logging.error("No response received for check_account")
+            return None, "No response received"
+        status, body = result
+        if status != 200:
+            logging.error(f"Failed to retrieve account information: {status} {body}")
+            return None, f"Failed to retrieve account information: {status} {body}"
+        account_info = body['account']
+        return {
+            "account_id": account_info['id'],
+            "balance": account_info['balance'],
+            "open_exchanges": OandaAPI.get_open_exchanges(),
+            "margin_used": account_info['marginUsed'],
+            "margin_available": account_info['marginAvailable'],
+            "open_trades": account_info['openTradeCount'],
+            "open_positions": account_info['openPositionCount'],
+            "unrealized_pl": account_info['unrealizedPL']
+        }, "Account information retrieved successfully!"
+
+    async def get_open_trades(self):
+        url = f"{defs.OANDA_URL}/accounts/{defs.ACCOUNT_ID}/openTrades"
+        result = await self._request_with_retries("GET", url)
+        if result is None:
+            logging.error("No response received for get_open_trades")
+            return None, "No response received"
+        status, body = result
+        if status != 200:
+            logging.error(f"Failed to retrieve open trades: {status} {body}")
+            return None, f"Failed to retrieve open trades: {status} {body}"
+        return body['trades'], "Open trades retrieved successfully!"
+
+    async def get_open_positions(self):
+        url = f"{defs.OANDA_URL}/accounts/{defs.ACCOUNT_ID}/openPositions"
+        result = await self._request_with_retries("GET", url)
+        if result is None:
+            logging.error("No response received for get_open_positions")
+            return None, "No response received"
+        status, body = result
+        if status != 200:
+            logging.error(f"Failed to retrieve open positions: {status} {body}")
+            return None, f"Failed to retrieve open positions: {status} {body}"
+        return body['positions'], "Open positions retrieved successfully!"
+
+    async def download_historical_data(self, instrument, granularity='D', count=500, date_from=None, date_to=None, complete_only=False, as_arrays=False):
+        url = f"{defs.OANDA_URL}/instruments/{instrument}/candles"
+        result = await self._request_with_retries("GET", url, params=candle_params(granularity, count, date_from, date_to))
+        if result is None:
+            logging.error("No response received for get_historical_data")
+            return None, "No response received"
+        status, body = result
+        if status != 200:
+            logging.error(f"Failed to retrieve historical data: {status} {body}")
+            return None, f"Failed to retrieve historical data: {status} {body}"
+        return candles_to_frame(body.get('candles', []), date_from, complete_only, as_arrays)
+
+    async def download_latest(self, instrument, granularity, count):
+        # Same paging as OandaAPI.download_latest
+        data, message = await self.download_historical_data(instrument, granularity, min(count + 1, MAX_CANDLES), complete_only=True)
+        if data is not None and 0 < len(data) < count and count >= MAX_CANDLES:
+            older, _ = await self.download_historical_data(instrument, granularity, min(count - len(data) + 1, MAX_CANDLES), date_to=data.index[0], complete_only=True)
+            if older is not None and len(older):
+                data = pd.concat([older[older.index < data.index[0]], data])
+        return data, message
+
+    async def get_historical_data(self, instrument, granularity='D', count=500):
+        # Same candle store policy as OandaAPI.get_historical_data; SQLite work runs off the loop
+        if self.candle_store is None:
+            return await self.download_historical_data(instrument, granularity, count)
+
+        price = variables.CANDLE_STORE['PRICE']
+        replace = False
+        cached = await asyncio.to_thread(self.candle_store.get, instrument, granularity, count, price)
+        if cached is not None and len(cached) >= count:
+            if self.candle_store.is_current(granularity, cached.index[-1]):
+                self.candle_store.record(hit=True)
+                return cached.tail(count).copy(), "Historical data retrieved from candle store!"
+            data, message = await self.download_historical_data(instrument, granularity, MAX_CANDLES, date_from=cached.index[-1], complete_only=True)
+            if data is not None and len(data) >= MAX_CANDLES:
+                # Too far behind to bridge the gap; the fresh series replaces the cached one
+                data, message = await self.download_latest(instrument, granularity, count)
+                replace = True
+        else:
+            data, message = await self.download_latest(instrument, granularity, count)
+
+        self.candle_store.record(hit=False, fetched=0 if data is None else len(data))
+        if data is None:
+            return None, message
+        data = await asyncio.to_thread(self.candle_store.save, instrument, granularity, data, price, replace)
+        if data is None:
+            return None, "No closed candles found in the response"
+        return data.tail(count).copy(), "Historical data retrieved successfully!"
+
+    async def get_historical_data_many(self, instruments, granularity='D', count=500):
+        # Yields (instrument, data, message) as each request completes
+        async def fetch(instrument):
+            try:
+                return (instrument, *await self.get_historical_data(instrument, granularity, count))
+            except Exception as e:
+                logging.error(f"Error retrieving historical data for {instrument}: {e}")
+                return instrument, None, str(e)
+
+        for task in asyncio.as_completed([fetch(instrument) for instrument in instruments]):
+            yield await task
+
+    async def place_trade(self, instrument, units, side, order_type, price=None, stop_loss=None, take_profit=None, trailing_stop_loss=None):
+        url = f"{defs.OANDA_URL}/accounts/{defs.ACCOUNT_ID}/orders"
+        order = {
+            "units": str(units) if side == 'buy' else str(-units),
+            "instrument": instrument,
+            "timeInForce": "GTC",
+            "type": order_type,
+            "positionFill": "DEFAULT"
+        }
+        if price:
+            order["price"] = str(price)
+        if stop_loss:
+            order["stopLossOnFill"] = {"price": str(stop_loss)}
+        if take_profit:
+            order["takeProfitOnFill"] = {"price": str(take_profit)}
+
+        # Never retried: a POST that timed out may still have placed the order
+        result = await self._request_with_retries("POST", url, data=json.dumps({"order": order}), max_retries=1)
+        if result is None:
+            logging.error("No response received for place_trade")
+            return None, "No response received"
+        status, body = result
+        if status != 201:
+            logging.error(f"Failed to place trade: {status} {body}")
+            return None, f"Failed to place trade: {status} {body}"
+        logging.info("Trade placed successfully!")
+        return body, "Trade placed successfully!"
+
+    async def close_trade(self, trade_id):
+        url = f"{defs.OANDA_URL}/accounts/{defs.ACCOUNT_ID}/trades/{trade_id}/close"
+        result = await self._request_with_retries("PUT", url)
+        if result is None:
+            logging.error("No response received for close_trade")
+            return None, "No response received"
+        status, body = result
+        if status != 200:
+            logging.error(f"Failed to close trade: {status} {body}")
+            return None, f"Failed to close trade: {status} {body}"
+        logging.info("Trade closed successfully!")
+        return body, "Trade closed successfully!"
+
+
+def historical_data_many(instruments, granularity='D', count=500):
+    # Blocking generator over AsyncOandaAPI.get_historical_data_many for the threaded callers. The
+    # event loop runs on its own thread, so results are yielded as they arrive.
+    results = queue.Queue()
+    finished = object()
+
+    async def collect():
+        try:
+            async with AsyncOandaAPI() as api:
+                async for result in api.get_historical_data_many(instruments, granularity, count):
+                    results.put(result)
+        except Exception as e:
+            logging.error(f"Async historical data requests failed: {e}")
+        finally:
+            results.put(finished)
+
+    threading.Thread(target=asyncio.run, args=(collect(),), name="oanda-async", daemon=True).start()
+    while (result := results.get()) is not finished:
+        yield result
+
+
+if __name__ == "__main__":
+    async def main():
+        async with AsyncOandaAPI() as api:
+            async for instrument, data, message in api.get_historical_data_many(variables.AUTO_TRADING["TRADE_INSTRUMENTS"], 'H1', 500):
+                print(instrument, message, None if data is None else len(data))
+
+    asyncio.run(main())
@@ -2,25 +2,74 @@ import json
 import logging
 import os
 import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
 from datetime import datetime, timedelta, timezone
 
 import pandas as pd
 import requests
+from requests.adapters import HTTPAdapter
 
 import backend.defs as defs
+import backend.variables as variables
+from backend.database.sqlite.candle_store import get_candle_store
+from backend.utils.candle_decoder import CANDLE_COLUMNS, decode_ohlc, to_frame
+from backend.utils.rate_limiter import RateLimiter
 from backend.utils.utility import configure_logging
 
 
 configure_logging("oanda")    
 
+MAX_CANDLES = 5000  # Largest count OANDA accepts per candles request
+
+# Shared by every OandaAPI instance and thread in the process
+rate_limiter = RateLimiter(variables.OANDA_API['REQUESTS_PER_SECOND'])
+
+# Candle payload key for each OANDA price component
+PRICE_COMPONENTS = {'M': 'mid', 'B': 'bid', 'A': 'ask'}
+
+def candle_params(granularity, count, date_from=None, date_to=None, price=None):
+    # price defaults to the component the candle store files candles under
+    params = {
+        'granularity': granularity,
+        'count': count,
+        'price': price or variables.CANDLE_STORE['PRICE']
+    }
+    if date_from is not None:
+        params['from'] = date_from.strftime('%Y-%m-%dT%H:%M:%S.000000000Z')
+    if date_to is not None:
+        # OANDA rejects count when both ends of the range are given
+        if date_from is not None:
+            params.pop('count')
+        params['to'] = date_to.strftime('%Y-%m-%dT%H:%M:%S.000000000Z')
+    return params
+
+def candles_to_frame(data, date_from=None, complete_only=False, as_arrays=False, price=None):
+    # as_arrays skips the DataFrame and returns the decoded columns, with times in epoch seconds
+    columns = decode_ohlc(data, PRICE_COMPONENTS[price or variables.CANDLE_STORE['PRICE']], complete_only=complete_only)
+    if not len(columns['time']):
+        if complete_only and date_from is not None:
+            # No candle has closed since date_from
+            return (columns if as_arrays else to_frame(columns, CANDLE_COLUMNS)), "No new candles"
+        logging.error("No candles data found in the response")
+        return None, "No candles data found in the response"
+    if as_arrays:
+        return columns, "Historical data retrieved successfully!"
+    return to_frame(columns, CANDLE_COLUMNS), "Historical data retrieved successfully!"
+
 class OandaAPI:
     
     def __init__(self):
         self.session = requests.Session()
+        # Enough pooled connections for get_historical_data_many to keep every worker busy
+        adapter = HTTPAdapter(pool_maxsize=variables.OANDA_API['MAX_WORKERS'])
+        self.session.mount('https://', adapter)
+        self.session.mount('http://', adapter)
+        self.candle_store = get_candle_store() if variables.CANDLE_STORE['ENABLED'] else None
 
     def _request_with_retries(self, method, url, headers=None, params=None, data=None, max_retries=5, backoff_factor=0.3):
         for attempt in range(max_retries):
             try:
+                rate_limiter.acquire()
                 response = self.session.request(method, url, headers=headers, params=params, data=data)
                 if response.status_code in [200, 201, 202]:
                     return response
@@ -63,7 +112,8 @@ class OandaAPI:
             logging.error(f"Error checking account: {e}")
             return None, str(e)
 
-    def get_open_exchanges(self):
+    @staticmethod
+    def get_open_exchanges():
         now_utc = datetime.now(timezone.utc)
         exchanges = {
             'Sydney': {'open': 22, 'close': 6},
@@ -119,54 +169,83 @@ class OandaAPI:
 
 
     def get_historical_data(self, instrument, granularity='D', count=500):
+        if self.candle_store is None:
+            return self.download_historical_data(instrument, granularity, count)
+
+        price = variables.CANDLE_STORE['PRICE']
+        replace = False
+        cached = self.candle_store.get(instrument, granularity, count, price)
+        if cached is not None and len(cached) >= count:
+            if self.candle_store.is_current(granularity, cached.index[-1]):
+                self.candle_store.record(hit=True)
+                return cached.tail(count).copy(), "Historical data retrieved from candle store!"
+            # Only ask OANDA for the candles after the last closed one we already hold
+            data, message = self.download_historical_data(instrument, granularity, MAX_CANDLES, date_from=cached.index[-1], complete_only=True)
+            if data is not None and len(data) >= MAX_CANDLES:
+                # Too far behind to bridge the gap; the fresh series replaces the cached one
+                data, message = self.download_latest(instrument, granularity, count)
+                replace = True
+        else:
+            data, message = self.download_latest(instrument, granularity, count)
+
+        self.candle_store.record(hit=False, fetched=0 if data is None else len(data))
+        if data is None:
+            return None, message
+        data = self.candle_store.save(instrument, granularity, data, price, replace)
+        if data is None:
+            return None, "No closed candles found in the response"
+        return data.tail(count).copy(), "Historical data retrieved successfully!"
+
+    def download_latest(self, instrument, granularity, count):
+        # The newest count closed candles. The last one is usually still forming, so one extra is
+        # requested; at OANDA's 5000 cap the shortfall comes from a second page of older candles.
+        data, message = self.download_historical_data(instrument, granularity, min(count + 1, MAX_CANDLES), complete_only=True)
+        if data is not None and 0 < len(data) < count and count >= MAX_CANDLES:
+            older, _ = self.download_historical_data(instrument, granularity, min(count - len(data) + 1, MAX_CANDLES), date_to=data.index[0], complete_only=True)
+            if older is not None and len(older):
+                data = pd.concat([older[older.index < data.index[0]], data])
+        return data, message
+
+    def get_historical_data_many(self, instruments, granularity='D', count=500, max_workers=None):
+        # Yields (instrument, data, message) as each request completes
+        if not instruments:
+            return
+        if variables.ASYNC_OANDA_API['ENABLED']:
+            # One event loop keeps every request in flight without a thread each
+            from backend.oanda_api.async_oanda_api import historical_data_many
+            yield from historical_data_many(instruments, granularity, count)
+            return
+        max_workers = min(max_workers or variables.OANDA_API['MAX_WORKERS'], len(instruments))
+        with ThreadPoolExecutor(max_workers=max_workers) as executor:
+            futures = {
+                executor.submit(self.get_historical_data, instrument, granularity, count): instrument
+                for instrument in instruments
+            }
+            for future in as_completed(futures):
+                instrument = futures[future]
+                try:
+                    data, message = future.result()
+                except Exception as e:
+                    logging.error(f"Error retrieving historical data for {instrument}: {e}")
+                    data, message = None, str(e)
+                yield instrument, data, message
+
+    def download_historical_data(self, instrument, granularity='D', count=500, date_from=None, date_to=None, complete_only=False, as_arrays=False):
         url = f"{defs.OANDA_URL}/instruments/{instrument}/candles"
-        params = {
-            'granularity': granularity,
-            'count': count,
-            'price': 'M'
-        }
+        params = candle_params(granularity, count, date_from, date_to)
         response = self._request_with_retries("GET", url, headers={'Authorization': f'Bearer {defs.API_KEY}'}, params=params)
         if response is None:
             logging.error("No response received for get_historical_data")
             return None, "No response received"
         if response.status_code == 200:
-            data = response.json().get('candles', [])
             print("PRCode: oanda_api - I got historical data here!")
-            if not data:
-                logging.error("No candles data found in the response")
-                return None, "No candles data found in the response"
-            
-            df = pd.DataFrame.from_records([{
-                'time': candle['time'],
-                'open': candle['mid']['o'],
-                'high': candle['mid']['h'],
-                'low': candle['mid']['l'],
-                'close': candle['mid']['c']
-            } for candle in data if 'mid' in candle and 'time' in candle])
-            
-            if 'time' not in df.columns:
-                logging.error("No 'time' column in the historical data")
-                return None, "No 'time' column in the historical data"
-            
-            df['time'] = pd.to_datetime(df['time'])
-            df.set_index('time', inplace=True)
-            
-            df['open'] = pd.to_numeric(df['open'])
-            df['high'] = pd.to_numeric(df['high'])
-            df['low'] = pd.to_numeric(df['low'])
-            df['close'] = pd.to_numeric(df['close'])
-            
-            logging.info(f"Retrieved historical data for {instrument}: {df.head()}")
-            return df, "Historical data retrieved successfully!"
-        elif response:
+            df, message = candles_to_frame(response.json().get('candles', []), date_from, complete_only, as_arrays)
+            if df is not None:
+                logging.info(f"Retrieved {len(df['time']) if as_arrays else len(df)} {granularity} candles for {instrument}")
+            return df, message
+        else:
             logging.error(f"Got a response but failed to retrieve historical data: {response.status_code} {response.text}")
             return None, f"Failed to retrieve historical data: {response.status_code} {response.text}"
-        elif response is None:
-            logging.error(f"There was an error... failed to retrieve a response for historical data: {response.status_code} {response.text}")
-            return None, f"Failed to retrieve historical data: {response.status_code} {response.text}"
-        else:
-            logging.error("Failed to retrieve historical data: No response received")
-            return None, "No response received"
 
     def set_stop_loss(self, price):
         return {"price": str(price)}
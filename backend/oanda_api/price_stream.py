@@ -0,0 +1,232 @@
+import json
+import logging
+import math
+import threading
+from collections import deque
+from datetime import datetime, timezone
+
+import pandas as pd
+import requests
+
+import backend.defs as defs
+import backend.variables as variables
+from backend.database.sqlite.candle_store import GRANULARITY_SECONDS, OHLC_COLUMNS, from_epoch, get_candle_store
+from backend.utils.utility import configure_logging
+
+configure_logging("oanda")
+
+BAR_COLUMNS = OHLC_COLUMNS + ['volume']
+
+
+def parse_time(value):
+    # Epoch seconds from either Accept-Datetime-Format: UNIX or RFC3339 with nanoseconds
+    try:
+        return float(value)
+    except ValueError:
+        head, _, fraction = value.rstrip('Z').partition('.')
+        seconds = datetime.fromisoformat(head).replace(tzinfo=timezone.utc).timestamp()
+        return seconds + (float(f'0.{fraction}') if fraction else 0.0)
+
+
+class BarBuilder:
+    # Builds mid-price OHLC bars for one instrument; volume is the tick count, as in OANDA candles.
+    # Only bars whose whole period was seen on a live connection are emitted.
+
+    def __init__(self, granularities, history):
+        self.seconds = {granularity: GRANULARITY_SECONDS[granularity] for granularity in granularities}
+        self.open_bars = {}  # granularity -> [start, open, high, low, close, volume]
+        self.next_start = {}  # First bar start still accepted after a bar has closed
+        self.closed = {granularity: deque(maxlen=history) for granularity in granularities}
+        self.synced = False  # Set by the first timestamp seen after a (re)connect
+
+    def reset(self):
+        # On every (re)connect; the open bars missed the ticks sent while disconnected and are dropped
+        dropped = len(self.open_bars)
+        self.open_bars.clear()
+        self.synced = False
+        return dropped
+
+    def sync(self, timestamp):
+        # Bars start with the first full period after the connection is known to be up
+        for granularity, seconds in self.seconds.items():
+            first = math.ceil(timestamp / seconds) * seconds
+            self.next_start[granularity] = max(self.next_start.get(granularity, first), first)
+        self.synced = True
+
+    def update(self, timestamp, price):
+        # Adds a tick and returns the (granularity, bar) pairs it closed
+        if not self.synced:
+            self.sync(timestamp)
+        closed = []
+        for granularity, seconds in self.seconds.items():
+            start = int(timestamp) // seconds * seconds
+            if start < self.next_start.get(granularity, start):
+                continue  # A late tick for a bar that has already been emitted
+            bar = self.open_bars.get(granularity)
+            if bar is not None and start > bar[0]:
+                closed.append((granularity, self._close(granularity)))
+                bar = None
+            if bar is None:
+                self.open_bars[granularity] = [start, price, price, price, price, 1]
+            else:
+                bar[2] = max(bar[2], price)
+                bar[3] = min(bar[3], price)
+                bar[4] = price
+                bar[5] += 1
+        return closed
+
+    def advance(self, timestamp):
+        # Closes bars whose period has ended; heartbeats call this so quiet markets still emit bars
+        if not self.synced:
+            self.sync(timestamp)
+        closed = []
+        for granularity, seconds in self.seconds.items():
+            bar = self.open_bars.get(granularity)
+            if bar is not None and timestamp >= bar[0] + seconds:
+                closed.append((granularity, self._close(granularity)))
+        return closed
+
+    def frame(self, granularity):
+        bars = list(self.closed[granularity])
+        index = from_epoch([bar[0] for bar in bars])
+        data = pd.DataFrame([bar[1:] for bar in bars], columns=BAR_COLUMNS, index=index, dtype='float64')
+        data.index.name = 'time'
+        return data
+
+    def _close(self, granularity):
+        bar = tuple(self.open_bars.pop(granularity))
+        self.next_start[granularity] = bar[0] + self.seconds[granularity]
+        self.closed[granularity].append(bar)
+        return bar
+
+
+class PriceStream:
+    # Consumes OANDA's chunked pricing stream and pushes each closed bar to the subscribers
+
+    def __init__(self, instruments=None, granularities=None, url=None, history=None):
+        settings = variables.PRICE_STREAM
+        self.instruments = list(instruments or variables.AUTO_TRADING['TRADE_INSTRUMENTS'])
+        self.granularities = list(granularities or settings['GRANULARITIES'])
+        self.url = url or f"{defs.OANDA_STREAM_URL}/accounts/{defs.ACCOUNT_ID}/pricing/stream"
+        self.heartbeat_timeout = settings['HEARTBEAT_TIMEOUT']
+        self.max_reconnect_delay = settings['MAX_RECONNECT_DELAY']
+        history = history or settings['HISTORY']
+        self.builders = {instrument: BarBuilder(self.granularities, history) for instrument in self.instruments}
+        self.store = get_candle_store() if settings['WRITE_TO_STORE'] and variables.CANDLE_STORE['ENABLED'] else None
+        self.subscribers = []
+        self.session = requests.Session()
+        self.lock = threading.Lock()
+        self.stopped = threading.Event()
+        self.response = None
+        self.thread = None
+        self.stats = {'ticks': 0, 'heartbeats': 0, 'bars': 0, 'reconnects': 0, 'partial_bars': 0}
+
+    def subscribe(self, callback):
+        # callback(instrument, granularity, bar) runs on the stream thread for every closed bar
+        self.subscribers.append(callback)
+
+    def start(self):
+        if self.thread is None or not self.thread.is_alive():
+            self.stopped.clear()
+            self.thread = threading.Thread(target=self.run, name="price-stream", daemon=True)
+            self.thread.start()
+
+    def stop(self):
+        self.stopped.set()
+        if self.response is not None:
+            self.response.close()  # Unblocks the read in the stream thread
+        if self.thread is not None:
+            self.thread.join()
+
+    def run(self):
+        delay = 1
+        while not self.stopped.is_set():
+            try:
+                if self.consume():
+                    delay = 1
+            except (requests.exceptions.RequestException, ValueError, AttributeError) as e:
+                # AttributeError comes from urllib3 when stop() closes the response mid-read
+                if not self.stopped.is_set():
+                    logging.warning(f"Price stream interrupted: {e}")
+            if self.stopped.wait(delay):
+                break
+            self.stats['reconnects'] += 1
+            logging.info(f"Reconnecting to the price stream after {delay}s")
+            delay = min(delay * 2, self.max_reconnect_delay)
+
+    def consume(self):
+        # Returns True if the connection delivered data before it ended
+        params = {'instruments': ','.join(self.instruments)}
+        headers = {'Authorization': f'Bearer {defs.API_KEY}', 'Accept-Datetime-Format': 'UNIX'}
+        # The read timeout doubles as a heartbeat watchdog for a silently stalled connection
+        with self.session.get(self.url, params=params, headers=headers, stream=True, timeout=(10, self.heartbeat_timeout)) as response:
+            self.response = response
+            if response.status_code != 200:
+                logging.error(f"Failed to open the price stream: {response.status_code} {response.text}")
+                return False
+            with self.lock:
+                dropped = sum(builder.reset() for builder in self.builders.values())
+                self.stats['partial_bars'] += dropped
+            logging.info(f"Price stream connected for {len(self.instruments)} instruments; dropped {dropped} partial bars")
+            received = False
+            for line in response.iter_lines():
+                if self.stopped.is_set():
+                    break
+                if line:
+                    self.handle_message(json.loads(line))
+                    received = True
+            return received
+
+    def handle_message(self, message):
+        kind = message.get('type')
+        if kind == 'PRICE':
+            builder = self.builders.get(message.get('instrument'))
+            if builder is None or not message.get('bids') or not message.get('asks'):
+                return
+            price = (float(message['bids'][0]['price']) + float(message['asks'][0]['price'])) / 2
+            with self.lock:
+                self.stats['ticks'] += 1
+                closed = [(message['instrument'], granularity, bar) for granularity, bar in builder.update(parse_time(message['time']), price)]
+        elif kind == 'HEARTBEAT':
+            timestamp = parse_time(message['time'])
+            with self.lock:
+                self.stats['heartbeats'] += 1
+                closed = [
+                    (instrument, granularity, bar)
+                    for instrument, builder in self.builders.items()
+                    for granularity, bar in builder.advance(timestamp)
+                ]
+        else:
+            return
+        for instrument, granularity, bar in closed:
+            self.publish(instrument, granularity, bar)
+
+    def publish(self, instrument, granularity, bar):
+        self.stats['bars'] += 1
+        bar = {'time': from_epoch(bar[0]), **dict(zip(BAR_COLUMNS, bar[1:]))}
+        if self.store is not None:
+            self.store.save(instrument, granularity, pd.DataFrame([bar]).set_index('time'), variables.CANDLE_STORE['PRICE'])
+        for callback in self.subscribers:
+            try:
+                callback(instrument, granularity, bar)
+            except Exception:
+                logging.exception(f"Price stream subscriber failed on {instrument} {granularity} bar")
+
+    def get_bars(self, instrument, granularity):
+        # Closed bars built so far, laid out like OandaAPI.get_historical_data frames
+        with self.lock:
+            return self.builders[instrument].frame(granularity)
+
+    def get_stats(self):
+        with self.lock:
+            return dict(self.stats)
+
+
+if __name__ == "__main__":
+    stream = PriceStream()
+    stream.subscribe(lambda instrument, granularity, bar: print(instrument, granularity, bar))
+    stream.start()
+    try:
+        stream.thread.join()
+    except KeyboardInterrupt:
+        stream.stop()
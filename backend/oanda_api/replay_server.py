@@ -0,0 +1,167 @@
+import argparse
+import json
+import random
+import threading
+import time
+from datetime import datetime, timezone
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlparse
+
+import backend.variables as variables
+from backend.oanda_api.price_stream import parse_time
+
+# Local stand-in for OANDA's pricing stream. It replays recorded stream lines or a synthetic
+# random walk over chunked HTTP at the path PriceStream requests.
+HEARTBEAT_INTERVAL = 5  # Seconds of replay time between heartbeats, as on the live stream
+
+
+def load_messages(path):
+    # One stream message per line, e.g. captured with curl from the live pricing stream
+    messages = []
+    with open(path) as file:
+        for line in file:
+            if line.strip():
+                message = json.loads(line)
+                message['time'] = parse_time(message['time'])
+                messages.append(message)
+    return messages
+
+
+def synthetic_messages(instruments, start=None, duration=3600, ticks_per_second=4, spread=0.0001, seed=0):
+    # Random-walk PRICE messages across the instruments, ordered by time
+    rng = random.Random(seed)
+    timestamp = start if start is not None else time.time()
+    mids = {instrument: 150.0 if instrument.endswith('JPY') else 1.1 for instrument in instruments}
+    messages = []
+    for _ in range(int(duration * ticks_per_second)):
+        timestamp += rng.expovariate(ticks_per_second)
+        instrument = rng.choice(instruments)
+        mid = mids[instrument] = mids[instrument] * (1 + rng.gauss(0, 0.00005))
+        scale = 100 if instrument.endswith('JPY') else 1
+        messages.append(price_message(instrument, timestamp, mid - spread * scale / 2, mid + spread * scale / 2))
+    return messages
+
+
+def price_message(instrument, timestamp, bid, ask):
+    return {
+        'type': 'PRICE',
+        'time': timestamp,
+        'instrument': instrument,
+        'bids': [{'price': f'{bid:.5f}', 'liquidity': 10000000}],
+        'asks': [{'price': f'{ask:.5f}', 'liquidity': 10000000}],
+        'closeoutBid': f'{bid:.5f}',
+        'closeoutAsk': f'{ask:.5f}',
+        'status': 'tradeable',
+        'tradeable': True,
+    }
+
+
+def format_time(timestamp, unix):
+    if unix:
+        return f'{timestamp:.9f}'
+    seconds = int(timestamp)
+    nanoseconds = int(round((timestamp - seconds) * 1e9))
+    return f"{datetime.fromtimestamp(seconds, timezone.utc):%Y-%m-%dT%H:%M:%S}.{nanoseconds:09d}Z"
+
+
+class ReplayHandler(BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'
+
+    def log_message(self, format, *args):
+        pass
+
+    def do_GET(self):
+        url = urlparse(self.path)
+        if not url.path.endswith('/pricing/stream'):
+            self.send_error(404)
+            return
+        query = parse_qs(url.query)
+        instruments = set(','.join(query.get('instruments', [])).split(',')) - {''}
+        unix = self.headers.get('Accept-Datetime-Format', 'RFC3339').upper() == 'UNIX'
+
+        self.send_response(200)
+        self.send_header('Content-Type', 'application/octet-stream')
+        self.send_header('Transfer-Encoding', 'chunked')
+        self.end_headers()
+        try:
+            self.replay(instruments, unix)
+            self.wfile.write(b'0\r\n\r\n')
+        except (BrokenPipeError, ConnectionResetError):
+            pass  # Client went away
+
+    def replay(self, instruments, unix):
+        server = self.server
+        messages = [message for message in server.messages if message.get('type') != 'PRICE' or not instruments or message['instrument'] in instruments]
+        if not messages:
+            return
+        first = last_heartbeat = messages[0]['time']
+        began = time.monotonic()
+        for message in messages:
+            if server.stopped.is_set():
+                return
+            while message['time'] - last_heartbeat >= HEARTBEAT_INTERVAL:
+                last_heartbeat += HEARTBEAT_INTERVAL
+                self.send({'type': 'HEARTBEAT', 'time': last_heartbeat}, first, began, unix)
+            if message.get('type') == 'PRICE':
+                self.send(message, first, began, unix)
+        # A closing heartbeat past the last bar boundary lets the client close its open bars
+        self.send({'type': 'HEARTBEAT', 'time': messages[-1]['time'] + server.final_heartbeat}, first, began, unix)
+
+    def send(self, message, first, began, unix):
+        speed = self.server.speed
+        if speed > 0:
+            delay = (message['time'] - first) / speed - (time.monotonic() - began)
+            if delay > 0 and self.server.stopped.wait(delay):
+                return
+        data = json.dumps({**message, 'time': format_time(message['time'], unix)}).encode() + b'\n'
+        self.wfile.write(f'{len(data):X}\r\n'.encode() + data + b'\r\n')
+        self.wfile.flush()
+
+
+class ReplayServer(ThreadingHTTPServer):
+    daemon_threads = True
+
+    def __init__(self, messages, host='127.0.0.1', port=8770, speed=1.0, final_heartbeat=3600):
+        super().__init__((host, port), ReplayHandler)
+        self.messages = messages
+        self.speed = speed  # Replay time multiplier; 0 sends as fast as the client reads
+        self.final_heartbeat = final_heartbeat
+        self.stopped = threading.Event()
+        self.thread = None
+
+    @property
+    def url(self):
+        host, port = self.server_address[:2]
+        return f"http://{host}:{port}/v3"
+
+    def stream_url(self, account_id='replay'):
+        return f"{self.url}/accounts/{account_id}/pricing/stream"
+
+    def start(self):
+        self.thread = threading.Thread(target=self.serve_forever, name="replay-server", daemon=True)
+        self.thread.start()
+        return self
+
+    def stop(self):
+        self.stopped.set()
+        if self.thread is not None:
+            self.shutdown()
+        self.server_close()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Serve a recorded or synthetic OANDA pricing stream locally.")
+    parser.add_argument('--file', default=None, help="Recorded stream, one JSON message per line")
+    parser.add_argument('--instruments', nargs='+', default=variables.AUTO_TRADING["TRADE_INSTRUMENTS"])
+    parser.add_argument('--duration', type=float, default=3600, help="Seconds of synthetic ticks")
+    parser.add_argument('--speed', type=float, default=60.0)
+    parser.add_argument('--port', type=int, default=8770)
+    args = parser.parse_args()
+
+    messages = load_messages(args.file) if args.file else synthetic_messages(args.instruments, duration=args.duration)
+    server = ReplayServer(messages, port=args.port, speed=args.speed)
+    print(f"Replaying {len(messages)} messages at {server.stream_url()}; set OANDA_STREAM_URL_DEMO={server.url}")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        server.server_close()
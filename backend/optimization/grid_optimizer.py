@@ -0,0 +1,160 @@
+import itertools
+import logging
+
+import numpy as np
+import pandas as pd
+
+import backend.variables as variables
+from backend.indicators.feature_cache import features
+from backend.utils.utility import configure_logging
+
+configure_logging("grid_optimizer")
+
+# Backtests a whole parameter grid at once. Signals for every combination form a
+# (combinations x bars) matrix built from the multi-period indicator matrices, and the metrics of
+# every row come from one set of NumPy reductions. Each grid reproduces the metrics of the class
+# that runs it one combination at a time:
+#   'compounded' - RSIStrategy: cumulative product of the returns, trades counted from position changes
+#   'summed'     - SMAStrategy, EMAStrategy, the crossovers and BacktestStrategy: summed returns,
+#                  trades counted from bars in a position
+
+
+def rsi_signals(close, grid):
+    periods = sorted(set(grid['RSI_PERIOD']))
+    rsi = features.rsi_matrix(close, periods).T[np.searchsorted(periods, grid['RSI_PERIOD'])]
+    # Overbought is applied first and oversold second, so oversold wins where the thresholds overlap
+    signal = np.where(rsi > grid['RSI_OVERBOUGHT'][:, None], -1, 0)
+    return np.where(rsi < grid['RSI_OVERSOLD'][:, None], 1, signal)
+
+
+def crossover_signals(kernel, fast_param, slow_param):
+    def signals(close, grid):
+        periods = sorted(set(grid[fast_param]) | set(grid[slow_param]))
+        matrix = getattr(features, kernel)(close, periods).T
+        fast = matrix[np.searchsorted(periods, grid[fast_param])]
+        slow = matrix[np.searchsorted(periods, grid[slow_param])]
+        return np.where(fast > slow, 1, np.where(fast < slow, -1, 0))
+    return signals
+
+
+def bollinger_signals(close, grid):
+    # Buy below the lower band and sell above the upper one, from the first full window on
+    periods = sorted(set(grid['BOLLINGER_BANDS_PERIOD']))
+    mean = features.sma_matrix(close, periods).T
+    std = np.array([features.rolling_std(close, period) for period in periods])
+    rows = np.searchsorted(periods, grid['BOLLINGER_BANDS_PERIOD'])
+    width = std[rows] * grid['BOLLINGER_BANDS_STD_DEV'][:, None]
+    upper, lower = mean[rows] + width, mean[rows] - width
+    signal = np.where(close < lower, 1, np.where(close > upper, -1, 0))
+    signal[np.arange(len(close)) < grid['BOLLINGER_BANDS_PERIOD'][:, None]] = 0
+    return signal
+
+
+GRIDS = {
+    'RSI': (('RSI_PERIOD', 'RSI_OVERBOUGHT', 'RSI_OVERSOLD'), rsi_signals, 'compounded'),
+    'SMA': (('Fast_Period', 'Slow_Period'), crossover_signals('sma_matrix', 'Fast_Period', 'Slow_Period'), 'summed'),
+    'EMA': (('Fast_Period', 'Slow_Period'), crossover_signals('ema_matrix', 'Fast_Period', 'Slow_Period'), 'summed'),
+    'SMACrossover': (('fast_period', 'slow_period'), crossover_signals('sma_matrix', 'fast_period', 'slow_period'), 'summed'),
+    'EMACrossover': (('fast_period', 'slow_period'), crossover_signals('ema_matrix', 'fast_period', 'slow_period'), 'summed'),
+    'BOLLINGER_BANDS': (('BOLLINGER_BANDS_PERIOD', 'BOLLINGER_BANDS_STD_DEV'), bollinger_signals, 'summed'),
+}
+
+
+def shift(matrix, periods=1):
+    # Row-wise shift along the bars with NaN filling, like Series.shift
+    shifted = np.full(matrix.shape, np.nan)
+    shifted[:, periods:] = matrix[:, :-periods]
+    return shifted
+
+
+def compounded_metrics(signal, returns):
+    position = shift(signal)
+    strategy = np.nan_to_num(shift(position) * returns)
+    total_return = np.cumprod(1 + strategy, axis=1)[:, -1] - 1
+    num_trades = np.abs(np.nan_to_num(np.diff(position, axis=1))).sum(axis=1) / 2
+    wins = (strategy > 0).sum(axis=1)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        win_rate = np.where(num_trades != 0, wins / num_trades, 0.0)
+    return total_return, num_trades, win_rate
+
+
+def summed_metrics(signal, returns):
+    position = shift(signal)
+    strategy = position * returns
+    total_return = np.nan_to_num(strategy).sum(axis=1)
+    num_trades = np.nan_to_num(np.abs(position)).sum(axis=1)
+    win_rate = (strategy > 0).mean(axis=1)
+    return total_return, num_trades, win_rate
+
+
+METRICS = {'compounded': compounded_metrics, 'summed': summed_metrics}
+LAGS = {'compounded': 2, 'summed': 1}  # Bars between a signal and the return it earns
+
+
+def close_returns(close):
+    # close.pct_change() as an array
+    returns = np.empty_like(close)
+    returns[:1] = np.nan
+    returns[1:] = close[1:] / close[:-1] - 1
+    return returns
+
+
+class GridOptimizer:
+    def __init__(self, data, strategy_name, param_ranges=None, param_sets=None):
+        self.data = data
+        self.strategy_name = strategy_name
+        self.params, self.signals, self.style = GRIDS[strategy_name]
+        self.metrics = METRICS[self.style]
+        self.lag = LAGS[self.style]
+        # An explicit list of param_sets, e.g. one chunk of a larger grid, takes precedence over the ranges
+        self.param_sets = param_sets if param_sets is not None else self.expand(strategy_name, param_ranges)
+
+    @staticmethod
+    def expand(strategy_name, param_ranges=None):
+        # Same order as TradeBot.create_param_sets: the first parameter varies slowest
+        params = GRIDS[strategy_name][0]
+        ranges = param_ranges or variables.OPTIMIZATION_RANGES[strategy_name]
+        return [dict(zip(params, values)) for values in itertools.product(*(ranges[param] for param in params))]
+
+    @staticmethod
+    def supports(strategy_name):
+        return strategy_name in GRIDS
+
+    @staticmethod
+    def chunk_size(bars):
+        return max(1, variables.GRID_OPTIMIZER['MAX_CELLS'] // max(bars, 1))
+
+    def signal_matrix(self, close, param_sets):
+        # (param_sets x bars) signals over the whole of close
+        grid = {param: np.array([param_set[param] for param_set in param_sets]) for param in self.params}
+        return self.signals(close, grid)
+
+    def run(self):
+        # One row per parameter set with total_return, num_trades and win_rate
+        results = pd.DataFrame(self.param_sets, columns=list(self.params))
+        if results.empty:
+            return results.assign(total_return=[], num_trades=[], win_rate=[])
+        close = self.data['close'].to_numpy(dtype=np.float64)
+        returns = close_returns(close)
+
+        # Rows are evaluated in chunks so the signal matrices stay within GRID_OPTIMIZER['MAX_CELLS']
+        chunk = self.chunk_size(len(close))
+        metrics = []
+        for start in range(0, len(self.param_sets), chunk):
+            signal = self.signal_matrix(close, self.param_sets[start:start + chunk])
+            metrics.append(np.column_stack(self.metrics(signal, returns)))
+        metrics = np.concatenate(metrics)
+        results['total_return'] = metrics[:, 0]
+        results['num_trades'] = metrics[:, 1]
+        results['win_rate'] = metrics[:, 2]
+        return results
+
+    def optimize(self, metric='total_return'):
+        # The best parameter set and the whole results table, ranked by metric
+        results = self.run().sort_values(metric, ascending=False, kind='stable').reset_index(drop=True)
+        if results.empty:
+            return {'best_params': None, 'performance': float('-inf'), 'results': results}
+        best_params = {param: results[param].iloc[0].item() for param in self.params}
+        performance = results[metric].iloc[0].item()
+        logging.info(f"Grid search over {len(results)} {self.strategy_name} parameter sets; best {best_params} with {metric} {performance}")
+        return {'best_params': best_params, 'performance': performance, 'results': results}
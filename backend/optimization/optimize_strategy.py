@@ -1,16 +1,28 @@
 from backend.backtest.backtest_strategy import BacktestStrategy
+from backend.indicators.feature_cache import features
+from backend.optimization.search import SearchOptimizer
 
 class OptimizeStrategy:
-    def __init__(self, data, strategy_class, param_ranges):
+    def __init__(self, data, strategy_class, param_ranges, mode='grid', budget=None):
+        # param_ranges is a list of parameter sets for the exhaustive 'grid' mode, or a dict of
+        # values per parameter for the budgeted 'random', 'halving' and 'coarse_to_fine' modes
         self.data = data
         self.strategy_class = strategy_class
         self.param_ranges = param_ranges
+        self.mode = mode
+        self.budget = budget
 
     def optimize(self):
+        if self.mode != 'grid':
+            return SearchOptimizer(self.data, self.strategy_class, self.param_ranges, self.mode, self.budget).optimize()
+
         best_params = None
         best_performance = float('-inf')
         best_report = None
 
+        # Indicator series for every period in the sweep come from one matrix pass; each
+        # combination below only re-runs its threshold logic on them
+        features.prefetch(self.strategy_class, self.data, self.param_ranges)
         for param_set in self.param_ranges:
             strategy = self.strategy_class(self.data, **param_set)
             report = strategy.backtest()
@@ -0,0 +1,156 @@
+import logging
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from multiprocessing import shared_memory
+
+import numpy as np
+import pandas as pd
+
+import backend.variables as variables
+from backend.optimization.grid_optimizer import GridOptimizer
+from backend.utils.utility import configure_logging
+
+configure_logging("parallel_optimizer")
+
+# Fans (instrument, strategy, parameter chunk) tasks out to worker processes. Each instrument's
+# closes are copied once into a shared memory block that the workers map read-only, so a task only
+# pickles the block name, its length and its parameter sets.
+
+attached = {}  # Blocks this process has mapped, by name
+
+
+def share_closes(data):
+    close = data['close'].to_numpy(dtype=np.float64)
+    block = shared_memory.SharedMemory(create=True, size=max(close.nbytes, 1))
+    np.ndarray(close.shape, dtype=np.float64, buffer=block.buf)[:] = close
+    return block, len(close)
+
+
+def attach(name, length):
+    # Maps a block once per process; later tasks for the same instrument reuse the mapping
+    if name not in attached:
+        attached[name] = shared_memory.SharedMemory(name=name)
+    close = np.ndarray((length,), dtype=np.float64, buffer=attached[name].buf)
+    close.flags.writeable = False
+    return close
+
+
+def release(names):
+    for name in names:
+        if (block := attached.pop(name, None)) is not None:
+            block.close()
+
+
+def run_task(task):
+    # Worker entry point: one strategy grid chunk on one instrument
+    instrument, strategy_name, name, length, param_sets = task
+    started = time.perf_counter()
+    data = pd.DataFrame({'close': attach(name, length)}, copy=False)
+    attached_at = time.perf_counter()
+    results = GridOptimizer(data, strategy_name, param_sets=param_sets).run()
+    finished = time.perf_counter()
+    timing = {
+        'instrument': instrument,
+        'strategy': strategy_name,
+        'param_sets': len(param_sets),
+        'bars': length,
+        'pid': os.getpid(),
+        'attach_ms': (attached_at - started) * 1000,
+        'compute_ms': (finished - attached_at) * 1000,
+    }
+    return instrument, strategy_name, results, timing
+
+
+class ParallelOptimizer:
+    def __init__(self, max_workers=None, chunk_size=None):
+        settings = variables.PARALLEL_OPTIMIZER
+        self.max_workers = max_workers or settings['MAX_WORKERS'] or os.cpu_count() or 1
+        self.chunk_size = chunk_size or settings['CHUNK_SIZE']
+
+    def tasks(self, blocks, strategies):
+        tasks = []
+        for instrument, (block, length) in blocks.items():
+            for strategy_name, ranges in strategies.items():
+                param_sets = GridOptimizer.expand(strategy_name, ranges)
+                for start in range(0, len(param_sets), self.chunk_size):
+                    tasks.append((instrument, strategy_name, block.name, length, param_sets[start:start + self.chunk_size]))
+        return tasks
+
+    def run(self, datasets, strategies=None):
+        # datasets maps instrument -> candle DataFrame. Returns (results, timings): every parameter set
+        # of every instrument and strategy ranked by total_return, and one timing row per task.
+        strategies = strategies or variables.OPTIMIZATION_RANGES
+        skipped = [name for name in strategies if not GridOptimizer.supports(name)]
+        if skipped:
+            logging.info(f"No vectorized grid for {skipped}; skipping them in the parallel optimizer.")
+        strategies = {name: ranges for name, ranges in strategies.items() if GridOptimizer.supports(name)}
+
+        started = time.perf_counter()
+        blocks = {}
+        frames, timings = [], []
+        try:
+            for instrument, data in datasets.items():
+                if data is not None and not data.empty:
+                    blocks[instrument] = share_closes(data)
+            tasks = self.tasks(blocks, strategies)
+            for instrument, strategy_name, results, timing in self.execute(tasks):
+                params = results.drop(columns=['total_return', 'num_trades', 'win_rate'])
+                frames.append(pd.DataFrame({
+                    'instrument': instrument,
+                    'strategy': strategy_name,
+                    'params': params.to_dict('records'),
+                    'total_return': results['total_return'],
+                    'num_trades': results['num_trades'],
+                    'win_rate': results['win_rate'],
+                }))
+                timings.append(timing)
+        finally:
+            release(block.name for block, _ in blocks.values())
+            for block, _ in blocks.values():
+                block.close()
+                block.unlink()
+
+        results = pd.concat(frames, ignore_index=True) if frames else pd.DataFrame(
+            columns=['instrument', 'strategy', 'params', 'total_return', 'num_trades', 'win_rate'])
+        results = results.sort_values('total_return', ascending=False, kind='stable').reset_index(drop=True)
+        results.insert(0, 'rank', np.arange(1, len(results) + 1))
+        timings = pd.DataFrame(timings)
+        self.log_summary(results, timings, time.perf_counter() - started)
+        return results, timings
+
+    def execute(self, tasks):
+        # Yields task results as they complete; tasks that fail are logged and left out
+        if self.max_workers == 1 or len(tasks) <= 1:
+            for task in tasks:
+                submitted = time.perf_counter()
+                outcome = run_task(task)
+                outcome[3]['wall_ms'] = (time.perf_counter() - submitted) * 1000
+                yield outcome
+            return
+        with ProcessPoolExecutor(max_workers=min(self.max_workers, len(tasks))) as pool:
+            submitted = time.perf_counter()
+            futures = {pool.submit(run_task, task): task for task in tasks}
+            for future in as_completed(futures):
+                instrument, strategy_name = futures[future][:2]
+                try:
+                    outcome = future.result()
+                except Exception as e:
+                    logging.error(f"Optimization task for {instrument} {strategy_name} failed: {e}")
+                    continue
+                # Time from submission to collection, including waiting for a free worker
+                outcome[3]['wall_ms'] = (time.perf_counter() - submitted) * 1000
+                yield outcome
+
+    def log_summary(self, results, timings, elapsed):
+        if timings.empty:
+            logging.info("Parallel optimizer had no tasks to run.")
+            return
+        busy = (timings['attach_ms'] + timings['compute_ms']).sum() / 1000
+        logging.info(f"Parallel optimizer: {len(timings)} tasks, {len(results)} parameter sets on "
+                     f"{timings['pid'].nunique()} processes in {elapsed:.2f}s; {busy:.2f}s of task time "
+                     f"({busy / elapsed:.1f}x parallelism), attach {timings['attach_ms'].sum():.1f} ms, "
+                     f"compute {timings['compute_ms'].sum():.1f} ms")
+        if not results.empty:
+            best = results.iloc[0]
+            logging.info(f"Best: {best['instrument']} {best['strategy']} {best['params']} total_return {best['total_return']}")
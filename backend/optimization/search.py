@@ -0,0 +1,185 @@
+import logging
+import math
+
+import numpy as np
+import pandas as pd
+
+import backend.variables as variables
+from backend.optimization.grid_optimizer import GridOptimizer
+from backend.utils.utility import configure_logging
+
+configure_logging("search")
+
+# Budgeted searches over parameter spaces too large to backtest exhaustively, e.g. RSI period
+# 5-60 x overbought 50-90 x oversold 10-50. Every mode spends at most `budget` backtests over the
+# full history; a backtest on a window of the bars costs its fraction of one.
+
+
+class ParameterSpace:
+    # The product of each parameter's sorted values; points are addressed by flat index
+    def __init__(self, ranges):
+        self.params = list(ranges)
+        self.values = [sorted(set(ranges[param])) for param in self.params]
+        self.shape = tuple(len(values) for values in self.values)
+        self.size = math.prod(self.shape)
+
+    def param_sets(self, indices):
+        coordinates = np.unravel_index(np.asarray(indices, dtype=np.int64), self.shape)
+        return [{param: self.values[axis][coordinates[axis][row]] for axis, param in enumerate(self.params)}
+                for row in range(len(indices))]
+
+    def sample(self, count, rng):
+        # Distinct flat indices drawn uniformly
+        count = min(count, self.size)
+        if count * 4 >= self.size:
+            return rng.permutation(self.size)[:count]
+        indices = set()
+        while len(indices) < count:
+            indices.update(rng.integers(0, self.size, count - len(indices)).tolist())
+        return np.fromiter(indices, dtype=np.int64, count=count)
+
+    def grid(self, bounds, points):
+        # Flat indices of up to `points` evenly spaced values per axis within inclusive (low, high) bounds
+        axes = [np.unique(np.linspace(low, high, min(points, high - low + 1)).round().astype(np.int64))
+                for low, high in bounds]
+        mesh = np.meshgrid(*axes, indexing='ij')
+        return np.ravel_multi_index([axis.ravel() for axis in mesh], self.shape)
+
+
+def evaluator(strategy, metric='total_return'):
+    # Scores a list of parameter sets on a data window. Grid names, and strategy classes that name
+    # their grid, are backtested in one vectorized pass; other classes run one backtest per set.
+    grid = strategy if isinstance(strategy, str) else getattr(strategy, 'grid', None)
+    if grid is not None:
+        def evaluate(data, param_sets):
+            return GridOptimizer(data, grid, param_sets=param_sets).run()[metric].to_numpy(dtype=np.float64)
+    else:
+        def evaluate(data, param_sets):
+            return np.array([strategy(data.copy(), **param_set).backtest()[metric] for param_set in param_sets], dtype=np.float64)
+    return evaluate
+
+
+class Search:
+    def __init__(self, space, evaluate, data, budget):
+        self.space = space
+        self.evaluate = evaluate
+        self.data = data
+        self.budget = budget
+        self.evaluations = 0
+        self.cost = 0.0  # Spent budget in full-history backtests
+        self.rows = []
+
+    @property
+    def remaining(self):
+        return self.budget - self.cost
+
+    def score(self, indices, window=None, stage=0):
+        # Backtests the points on the last `window` bars (all bars by default) within the remaining budget
+        data = self.data if window is None or window >= len(self.data) else self.data.iloc[-window:]
+        bars = len(data)
+        fraction = bars / max(len(self.data), 1)
+        indices = np.asarray(indices, dtype=np.int64)[:max(int(self.remaining / fraction + 1e-9), 0)]
+        if len(indices) == 0:
+            return indices, np.empty(0)
+        param_sets = self.space.param_sets(indices)
+        scores = np.nan_to_num(self.evaluate(data, param_sets), nan=-np.inf)
+        self.evaluations += len(indices)
+        self.cost += len(indices) * fraction
+        self.rows.extend({'stage': stage, 'bars': bars, 'index': index, **param_set, 'score': score}
+                         for index, param_set, score in zip(indices.tolist(), param_sets, scores.tolist()))
+        return indices, scores
+
+    def results(self):
+        columns = ['stage', 'bars', 'index', *self.space.params, 'score']
+        return pd.DataFrame(self.rows, columns=columns)
+
+
+def exhaustive(search, **_):
+    # Every point, in budget-sized batches; stops early if the space is larger than the budget
+    for start in range(0, search.space.size, max(search.budget, 1)):
+        if search.remaining < 1:
+            break
+        search.score(np.arange(start, min(start + search.budget, search.space.size)))
+
+
+def random_search(search, rng, **_):
+    search.score(search.space.sample(search.budget, rng))
+
+
+def successive_halving(search, rng, eta=3, min_bars=500, **_):
+    # Scores many random points on the most recent bars, keeps the best 1/eta of them and rescores
+    # those on eta times as many bars, until the survivors are scored on the full history. Every
+    # round costs about the same, so the first one can afford eta ** (rounds - 1) times more points.
+    bars = len(search.data)
+    rounds = max(int(math.log(max(bars / min_bars, 1), eta)), 0) + 1
+    windows = [bars if stage == rounds - 1 else int(bars / eta ** (rounds - 1 - stage)) for stage in range(rounds)]
+    first = max(int(search.budget / sum(window / bars / eta ** stage for stage, window in enumerate(windows))), 1)
+    candidates = search.space.sample(first, rng)
+    for stage, window in enumerate(windows):
+        candidates, scores = search.score(candidates, window, stage)
+        if len(candidates) == 0:
+            break
+        survivors = max(len(candidates) // eta, 1)
+        candidates = candidates[np.argsort(-scores, kind='stable')[:survivors]]
+
+
+def coarse_to_fine(search, levels=4, **_):
+    # An evenly spaced grid over the whole space, then finer grids centred on the best point so far,
+    # each one coarse step wide on either side
+    points = max(int((search.budget / levels) ** (1 / len(search.space.shape))), 2)
+    bounds = [(0, size - 1) for size in search.space.shape]
+    seen = set()
+    best_index, best_score = None, -np.inf
+    for level in range(search.budget):
+        if search.remaining < 1:
+            break
+        indices = [index for index in search.space.grid(bounds, points).tolist() if index not in seen]
+        if not indices:
+            break
+        seen.update(indices)
+        indices, scores = search.score(indices, stage=level)
+        if len(scores) and scores.max() > best_score:
+            best_index, best_score = int(indices[np.argmax(scores)]), scores.max()
+        if best_index is None:
+            break
+        centre = np.unravel_index(best_index, search.space.shape)
+        steps = [max((high - low) // (points - 1), 1) for low, high in bounds]
+        bounds = [(max(position - step, 0), min(position + step, size - 1))
+                  for position, step, size in zip(centre, steps, search.space.shape)]
+
+
+SEARCH_MODES = {
+    'grid': exhaustive,
+    'random': random_search,
+    'halving': successive_halving,
+    'coarse_to_fine': coarse_to_fine,
+}
+
+
+class SearchOptimizer:
+    def __init__(self, data, strategy, param_ranges, mode=None, budget=None, seed=None, metric='total_return'):
+        # strategy is a GridOptimizer name such as 'RSI' or a strategy class with backtest()
+        settings = variables.SEARCH
+        self.data = data
+        self.strategy = strategy
+        self.space = ParameterSpace(param_ranges)
+        self.mode = mode or settings['MODE']
+        self.budget = budget or settings['BUDGET']
+        self.seed = settings['SEED'] if seed is None else seed
+        self.metric = metric
+
+    def optimize(self):
+        search = Search(self.space, evaluator(self.strategy, self.metric), self.data, self.budget)
+        SEARCH_MODES[self.mode](search, rng=np.random.default_rng(self.seed), eta=variables.SEARCH['ETA'],
+                                min_bars=variables.SEARCH['MIN_BARS'], levels=variables.SEARCH['LEVELS'])
+        results = search.results()
+        # Only scores on the full history compete for best
+        final = results[results['bars'] == len(self.data)]
+        if final.empty:
+            return {'best_params': None, 'performance': float('-inf'), 'results': results, 'evaluations': search.evaluations, 'cost': search.cost}
+        best = final.loc[final['score'].idxmax()]
+        best_params = self.space.param_sets([best['index']])[0]
+        logging.info(f"{self.mode} search over {self.space.size} parameter sets ran {search.evaluations} backtests costing "
+                     f"{search.cost:.0f} of {self.budget}; best {best_params} with {self.metric} {best['score']}")
+        return {'best_params': best_params, 'performance': best['score'], 'results': results,
+                'evaluations': search.evaluations, 'cost': search.cost}
@@ -0,0 +1,166 @@
+import logging
+import time
+
+import numpy as np
+import pandas as pd
+
+from backend.optimization.grid_optimizer import GridOptimizer, close_returns, shift
+from backend.optimization.optimize_strategy import OptimizeStrategy
+from backend.optimization.search import ParameterSpace
+from backend.utils.utility import configure_logging
+
+configure_logging("walk_forward")
+
+# Rolls train/test windows over a long history, picks the best parameters on each train window and
+# trades them on the following test window. For strategies with a vectorized grid the signals of
+# every parameter set are computed once over the full history, so indicators are warm at every
+# window start. Windows are then scored as slices of that one continuous backtest through prefix
+# sums, which costs O(parameter sets) per window. Other strategy classes re-run OptimizeStrategy
+# on each train window.
+
+
+def windows(bars, train_bars, test_bars, step=None, anchored=False):
+    # (train_start, train_end, test_end) bar positions; the test window starts at train_end
+    step = step or test_bars
+    spans = []
+    for train_end in range(train_bars, bars, step):
+        spans.append((0 if anchored else train_end - train_bars, train_end, min(train_end + test_bars, bars)))
+    return spans
+
+
+def bar_outcomes(signal, returns, lag):
+    # Per-bar strategy returns, position changes and positions for each row of signals
+    position = shift(signal)
+    earning = shift(signal, lag) if lag > 1 else position
+    strategy = np.nan_to_num(earning * returns)
+    changes = np.zeros(signal.shape)
+    changes[:, 1:] = np.abs(np.nan_to_num(np.diff(position, axis=1)))
+    return strategy, changes, np.nan_to_num(np.abs(position))
+
+
+def prefix(values):
+    # Cumulative sums along the bars with a leading zero column, so sum(values[a:b]) = p[b] - p[a]
+    sums = np.zeros((values.shape[0], values.shape[1] + 1))
+    np.cumsum(values, axis=1, out=sums[:, 1:])
+    return sums
+
+
+class WalkForward:
+    def __init__(self, data, strategy, param_ranges, train_bars, test_bars, step=None, anchored=False, metric='total_return'):
+        # strategy is a GridOptimizer name such as 'RSI' or a strategy class
+        self.data = data
+        self.strategy = strategy
+        self.param_ranges = param_ranges
+        self.spans = windows(len(data), train_bars, test_bars, step, anchored)
+        self.metric = metric
+        self.grid = strategy if isinstance(strategy, str) else getattr(strategy, 'grid', None)
+
+    def run(self):
+        # Returns (windows, equity): one row per window with its best parameters and train/test
+        # metrics, and the stitched out-of-sample returns and equity curve over the test bars
+        started = time.perf_counter()
+        if not self.spans:
+            logging.error(f"Walk-forward needs more than {len(self.data)} bars for its train window.")
+            return pd.DataFrame(), pd.DataFrame(columns=['window', 'return', 'equity'])
+        if self.grid is not None:
+            rows, returns, compounded = self.run_grid()
+        else:
+            rows, returns, compounded = self.run_classes()
+        positions = np.concatenate([np.arange(start, end) for _, start, end in self.spans])
+        equity = pd.DataFrame({'window': np.concatenate([np.full(end - start, window) for window, (_, start, end) in enumerate(self.spans)]),
+                               'return': returns}, index=self.data.index[positions])
+        equity['equity'] = (1 + equity['return']).cumprod() if compounded else 1 + equity['return'].cumsum()
+        windows_table = pd.DataFrame(rows)
+        logging.info(f"Walk-forward over {len(self.spans)} windows in {time.perf_counter() - started:.2f}s; "
+                     f"out-of-sample return {equity['equity'].iloc[-1] - 1:.6f}")
+        return windows_table, equity
+
+    def window_row(self, window, best_params, train_metrics, test_metrics):
+        train_start, train_end, test_end = self.spans[window]
+        index = self.data.index
+        return {
+            'window': window,
+            'train_start': index[train_start],
+            'train_end': index[train_end - 1],
+            'test_start': index[train_end],
+            'test_end': index[test_end - 1],
+            'best_params': best_params,
+            **{f'train_{name}': value for name, value in train_metrics.items()},
+            **{f'test_{name}': value for name, value in test_metrics.items()},
+        }
+
+    def window_metrics(self, sums, start, end, rows, compounded):
+        # total_return, num_trades and win_rate of rows (an index or slice) over bars [start, end)
+        strategy, changes, positions, wins = (total[rows, end] - total[rows, start] for total in sums)
+        if compounded:
+            total_return = np.expm1(strategy)
+            num_trades = changes / 2
+            with np.errstate(divide='ignore', invalid='ignore'):
+                win_rate = np.where(num_trades != 0, wins / num_trades, 0.0)
+        else:
+            total_return = strategy
+            num_trades = positions
+            win_rate = wins / (end - start)
+        return {'total_return': total_return, 'num_trades': num_trades, 'win_rate': win_rate}
+
+    def run_grid(self):
+        optimizer = GridOptimizer(self.data, self.grid, self.param_ranges)
+        compounded = optimizer.style == 'compounded'
+        close = self.data['close'].to_numpy(dtype=np.float64)
+        returns = close_returns(close)
+        param_sets = optimizer.param_sets
+        best = [(-np.inf, None)] * len(self.spans)  # (train metric, parameter set index) per window
+
+        def sums_for(signal, ranking_only=False):
+            strategy, changes, positions = bar_outcomes(signal, returns, optimizer.lag)
+            # Compounded returns add up as log growth
+            growth = prefix(np.log1p(strategy) if compounded else strategy)
+            if ranking_only and self.metric == 'total_return':
+                return (growth,), strategy
+            return (growth, prefix(changes), prefix(positions), prefix((strategy > 0).astype(np.float64))), strategy
+
+        chunk = optimizer.chunk_size(len(close))
+        for first in range(0, len(param_sets), chunk):
+            sums, _ = sums_for(optimizer.signal_matrix(close, param_sets[first:first + chunk]), ranking_only=True)
+            for window, (train_start, train_end, _) in enumerate(self.spans):
+                if len(sums) == 1:
+                    growth = sums[0][:, train_end] - sums[0][:, train_start]
+                    scores = np.expm1(growth) if compounded else growth
+                else:
+                    scores = self.window_metrics(sums, train_start, train_end, slice(None), compounded)[self.metric]
+                scores = np.nan_to_num(scores, nan=-np.inf)
+                row = int(np.argmax(scores))
+                if scores[row] > best[window][0] or best[window][1] is None:
+                    best[window] = (scores[row], first + row)
+
+        # Only the chosen parameter sets are recomputed for the full train and test metrics
+        chosen = sorted({index for _, index in best})
+        sums, strategy = sums_for(optimizer.signal_matrix(close, [param_sets[index] for index in chosen]))
+        window_rows, oos = [], []
+        for window, (_, index) in enumerate(best):
+            train_start, train_end, test_end = self.spans[window]
+            row = chosen.index(index)
+            train_metrics, test_metrics = (
+                {name: values.item() for name, values in self.window_metrics(sums, start, end, row, compounded).items()}
+                for start, end in ((train_start, train_end), (train_end, test_end)))
+            window_rows.append(self.window_row(window, param_sets[index], train_metrics, test_metrics))
+            oos.append(strategy[row, train_end:test_end])
+        return window_rows, np.concatenate(oos), compounded
+
+    def run_classes(self):
+        # No vectorized grid: optimize each train window with OptimizeStrategy and backtest the test window
+        space = ParameterSpace(self.param_ranges)
+        param_sets = space.param_sets(np.arange(space.size))
+        window_rows, oos = [], []
+        compounded = False
+        for window, (train_start, train_end, test_end) in enumerate(self.spans):
+            optimization = OptimizeStrategy(self.data.iloc[train_start:train_end].copy(), self.strategy, param_sets).optimize()
+            report = optimization['report']
+            test = self.strategy(self.data.iloc[train_end:test_end].copy(), **optimization['best_params']).backtest()
+            returns = test['data'].get('Strategy_Return', test['data'].get('Strategy'))
+            compounded = 'Cumulative_Return' in test['data']
+            window_rows.append(self.window_row(window, optimization['best_params'],
+                                               {name: report[name] for name in ('total_return', 'num_trades', 'win_rate')},
+                                               {name: test[name] for name in ('total_return', 'num_trades', 'win_rate')}))
+            oos.append(returns.fillna(0).to_numpy(dtype=np.float64))
+        return window_rows, np.concatenate(oos), compounded
@@ -1,6 +1,8 @@
 import pandas as pd
 import numpy as np
 
+from backend.indicators.feature_cache import features
+
 class BreakoutStrategy:
     def __init__(self, data, ema_params, sma_params, bb_params):
         self.data = data
@@ -9,16 +11,17 @@ class BreakoutStrategy:
         self.bb_params = bb_params
 
     def calculate_ema(self):
-        self.data['EMA'] = self.data['close'].ewm(span=self.ema_params['period'], adjust=False).mean()
+        self.data['EMA'] = features.ema(self.data['close'], self.ema_params['period'])
 
     def calculate_sma(self):
-        self.data['SMA'] = self.data['close'].rolling(window=self.sma_params['period']).mean()
+        self.data['SMA'] = features.sma(self.data['close'], self.sma_params['period'])
 
     def calculate_bb(self):
-        self.data['SMA'] = self.data['close'].rolling(window=self.bb_params['period']).mean()
-        self.data['STD'] = self.data['close'].rolling(window=self.bb_params['period']).std()
-        self.data['Upper_Band'] = self.data['SMA'] + (self.data['STD'] * self.bb_params['std_dev'])
-        self.data['Lower_Band'] = self.data['SMA'] - (self.data['STD'] * self.bb_params['std_dev'])
+        bands = features.bollinger_bands(self.data['close'], self.bb_params['period'], self.bb_params['std_dev'])
+        self.data['SMA'] = bands['Bollinger_Mid']
+        self.data['STD'] = features.rolling_std(self.data['close'], self.bb_params['period'])
+        self.data['Upper_Band'] = bands['Upper_Band']
+        self.data['Lower_Band'] = bands['Lower_Band']
 
     def generate_signals(self):
         self.calculate_ema()
@@ -1,19 +1,24 @@
 import pandas as pd
 
+from backend.indicators.feature_cache import features
+
 class EMACrossoverStrategy:
+    sweep_periods = {'fast_period': 'ema', 'slow_period': 'ema'}
+    grid = 'EMACrossover'
+
     def __init__(self, data, fast_period=10, slow_period=30):
         self.data = data
         self.fast_period = fast_period
         self.slow_period = slow_period
 
     def calculate_ema(self):
-        self.data['EMA_Fast'] = self.data['close'].ewm(span=self.fast_period, adjust=False).mean()
-        self.data['EMA_Slow'] = self.data['close'].ewm(span=self.slow_period, adjust=False).mean()
+        self.data['EMA_Fast'] = features.ema(self.data['close'], self.fast_period)
+        self.data['EMA_Slow'] = features.ema(self.data['close'], self.slow_period)
 
     def generate_signals(self):
         self.data['Signal'] = 0
-        self.data['Signal'][self.data['EMA_Fast'] > self.data['EMA_Slow']] = 1
-        self.data['Signal'][self.data['EMA_Fast'] < self.data['EMA_Slow']] = -1
+        self.data.loc[self.data['EMA_Fast'] > self.data['EMA_Slow'], 'Signal'] = 1
+        self.data.loc[self.data['EMA_Fast'] < self.data['EMA_Slow'], 'Signal'] = -1
 
     def backtest(self):
         self.calculate_ema()
@@ -1,14 +1,19 @@
 import pandas as pd
 
+from backend.indicators.feature_cache import features
+
 class EMAStrategy:
+    sweep_periods = {'Fast_Period': 'ema', 'Slow_Period': 'ema'}  # Period parameters FeatureCache.prefetch computes in one pass
+    grid = 'EMA'
+
     def __init__(self, data, Fast_Period, Slow_Period):
         self.data = data
         self.Fast_Period = Fast_Period
         self.Slow_Period = Slow_Period
 
     def calculate_ema(self):
-        self.data['EMA_Fast'] = self.data['close'].ewm(span=self.Fast_Period, adjust=False).mean()
-        self.data['EMA_Slow'] = self.data['close'].ewm(span=self.Slow_Period, adjust=False).mean()
+        self.data['EMA_Fast'] = features.ema(self.data['close'], self.Fast_Period)
+        self.data['EMA_Slow'] = features.ema(self.data['close'], self.Slow_Period)
         return self.data
 
     def generate_signal(self):
@@ -1,6 +1,10 @@
 import pandas as pd
 
+from backend.indicators.feature_cache import features
+
 class MACDStrategy:
+    sweep_periods = {'fast_period': 'ema', 'slow_period': 'ema'}
+
     def __init__(self, data, fast_period=12, slow_period=26, signal_period=9):
         self.data = data
         self.fast_period = fast_period
@@ -8,11 +12,12 @@ class MACDStrategy:
         self.signal_period = signal_period
 
     def calculate_macd(self):
-        self.data['EMA_fast'] = self.data['close'].ewm(span=self.fast_period, adjust=False).mean()
-        self.data['EMA_slow'] = self.data['close'].ewm(span=self.slow_period, adjust=False).mean()
-        self.data['MACD'] = self.data['EMA_fast'] - self.data['EMA_slow']
-        self.data['Signal'] = self.data['MACD'].ewm(span=self.signal_period, adjust=False).mean()
-        self.data['Histogram'] = self.data['MACD'] - self.data['Signal']
+        macd = features.macd(self.data['close'], self.fast_period, self.slow_period, self.signal_period)
+        self.data['EMA_fast'] = macd['EMA_short']
+        self.data['EMA_slow'] = macd['EMA_long']
+        self.data['MACD'] = macd['MACD']
+        self.data['Signal'] = macd['Signal']
+        self.data['Histogram'] = macd['Histogram']
 
     def generate_signals(self):
         self.data['Signal'] = 0
@@ -1,6 +1,10 @@
 import pandas as pd
 
+from backend.indicators.feature_cache import features
+
 class RSIStrategy:
+    grid = 'RSI'  # GridOptimizer grid that reproduces this class's backtest
+
     def __init__(self, data, RSI_PERIOD, RSI_OVERBOUGHT, RSI_OVERSOLD):
         self.data = data
         self.RSI_PERIOD = int(RSI_PERIOD)
@@ -8,11 +12,7 @@ class RSIStrategy:
         self.RSI_OVERSOLD = int(RSI_OVERSOLD)
 
     def calculate_rsi(self):
-        delta = self.data['close'].diff()
-        gain = (delta.where(delta > 0, 0)).rolling(window=self.RSI_PERIOD).mean()
-        loss = (-delta.where(delta < 0, 0)).rolling(window=self.RSI_PERIOD).mean()
-        rs = gain / loss
-        self.data['RSI'] = 100 - (100 / (1 + rs))
+        self.data['RSI'] = features.rsi(self.data['close'], self.RSI_PERIOD)
         return self.data
 
     def generate_signal(self):
@@ -1,19 +1,23 @@
 import pandas as pd
 
+from backend.indicators.feature_cache import features
+
 class SMACrossoverStrategy:
+    grid = 'SMACrossover'
+
     def __init__(self, data, fast_period=10, slow_period=30):
         self.data = data
         self.fast_period = fast_period
         self.slow_period = slow_period
 
     def calculate_sma(self):
-        self.data['SMA_Fast'] = self.data['close'].rolling(window=self.fast_period).mean()
-        self.data['SMA_Slow'] = self.data['close'].rolling(window=self.slow_period).mean()
+        self.data['SMA_Fast'] = features.sma(self.data['close'], self.fast_period)
+        self.data['SMA_Slow'] = features.sma(self.data['close'], self.slow_period)
 
     def generate_signals(self):
         self.data['Signal'] = 0
-        self.data['Signal'][self.data['SMA_Fast'] > self.data['SMA_Slow']] = 1
-        self.data['Signal'][self.data['SMA_Fast'] < self.data['SMA_Slow']] = -1
+        self.data.loc[self.data['SMA_Fast'] > self.data['SMA_Slow'], 'Signal'] = 1
+        self.data.loc[self.data['SMA_Fast'] < self.data['SMA_Slow'], 'Signal'] = -1
 
     def backtest(self):
         self.calculate_sma()
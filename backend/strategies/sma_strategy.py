@@ -1,14 +1,18 @@
 import pandas as pd
 
+from backend.indicators.feature_cache import features
+
 class SMAStrategy:
+    grid = 'SMA'
+
     def __init__(self, data, Fast_Period, Slow_Period):
         self.data = data
         self.Fast_Period = Fast_Period
         self.Slow_Period = Slow_Period
 
     def calculate_sma(self):
-        self.data['SMA_Fast'] = self.data['close'].rolling(window=self.Fast_Period).mean()
-        self.data['SMA_Slow'] = self.data['close'].rolling(window=self.Slow_Period).mean()
+        self.data['SMA_Fast'] = features.sma(self.data['close'], self.Fast_Period)
+        self.data['SMA_Slow'] = features.sma(self.data['close'], self.Slow_Period)
         return self.data
 
     def generate_signal(self):
@@ -1,22 +1,28 @@
 import logging
-import time
-from threading import Thread
+from threading import Lock, Thread
 
 from backend import variables
 from backend.utils import historical
 from backend.backtest.backtest_strategy import BacktestStrategy
+from backend.backtest.event_backtest import EventBacktest
+from backend.backtest.incremental_backtest import incremental_backtest
+from backend.backtest.results_store import BacktestResultsStore
 from backend.control.control_system import ControlSystem
+from backend.database.sqlite.backtest_cache import get_backtest_cache, params_key, series_key
 from backend.indicators.macd_indicator import MACDIndicator
 from backend.indicators.stochastic_indicator import StochasticIndicator
 from backend.indicators.bollinger_bands_indicator import BollingerBandsIndicator
+from backend.indicators.feature_cache import features
 from backend.oanda_api.oanda_api import OandaAPI
-from backend.optimization.optimize_strategy import OptimizeStrategy
+from backend.oanda_api.price_stream import PriceStream
+from backend.optimization.parallel_optimizer import ParallelOptimizer
 from backend.strategies.ema_crossover_strategy import EMACrossoverStrategy
 from backend.strategies.ema_strategy import EMAStrategy
 from backend.strategies.momentum_strategy import MomentumStrategy
 from backend.strategies.rsi_strategy import RSIStrategy
 from backend.strategies.sma_crossover_strategy import SMACrossoverStrategy
 from backend.strategies.sma_strategy import SMAStrategy
+from backend.utils.scheduler import Scheduler
 from backend.utils.utility import configure_logging
 
 from flask import Flask, jsonify
@@ -29,42 +35,72 @@ class TradeBot:
         self.control_system = ControlSystem()
         self.running = False
         self.state = None
-        self.backtest_results = []
+        self.backtest_results = BacktestResultsStore()
+        self.optimization_results = None
+        self.optimized_series = None  # (last candle time, candles) per pair behind optimization_results
+        self.live_backtests = {}  # (pair, strategy, params_key) -> IncrementalBacktest extended on each closed bar
+        self.backtest_cache = get_backtest_cache() if variables.BACKTEST_CACHE['ENABLED'] else None
         self.thread = None
+        self.scheduler = None
+        self.actions_lock = Lock()
+        self.price_stream = None
+        if variables.PRICE_STREAM['ENABLED']:
+            self.price_stream = PriceStream()
+            self.price_stream.subscribe(self.on_closed_bar)
 
     def start(self):
         if not self.running:
             self.running = True
+            if self.price_stream is not None:
+                self.price_stream.start()
             if self.thread is None or not self.thread.is_alive():
+                self.scheduler = Scheduler()
                 self.thread = Thread(target=self.run)
                 self.thread.start()
             
     def set_state(self, state):
         self.state = state
-        self.execute_state_actions()
+        # On the scheduler, so a cycle already running is not started a second time
+        if self.scheduler is None or not self.scheduler.trigger(state):
+            self.execute_state_actions()
 
-    def execute_state_actions(self, sec):
-        self.sec = sec
+    def execute_state_actions(self):
+        # One cycle at a time, whichever thread asks; a request while one runs is skipped
+        if not self.actions_lock.acquire(blocking=False):
+            logging.warning(f"Skipping the {self.state} actions: a state cycle is still running")
+            return
+        try:
+            self.run_actions()
+        finally:
+            self.actions_lock.release()
+
+    def run_actions(self):
         if self.state == 'RED':
             self.enable_manual_trading()
             self.check_account_info()
             self.autofill_database()
-            self.sec = 180  # Run every three minutes
         elif self.state == 'GREEN':
             self.download_historical_data()
             self.perform_backtesting()
             self.optimize_parameters()
             self.enable_auto_trading()
             self.integrate_money_management()
-            self.sec = 120  # Run every two minutes
         elif self.state == 'YELLOW':
             self.confirm_momentum_strategy()
             self.standby_for_entry()
-            self.sec = 30  # Run every half of  minute
+
+    def run_state_job(self, state):
+        # Scheduled once per candle close of the state's granularity; only the current state's job acts
+        if self.state == state:
+            self.execute_state_actions()
 
     def stop(self):
         if self.running:
             self.running = False
+            if self.price_stream is not None:
+                self.price_stream.stop()
+            if self.scheduler is not None:
+                self.scheduler.stop()
             self.thread.join()
 
     def run(self):
@@ -72,9 +108,46 @@ class TradeBot:
             logging.info("State machine is off. Exiting.")
             return
 
-        while self.running:
-            self.execute_state_actions(self.sec)
-            time.sleep(self.sec)  # Run every interval minute(s)
+        # Each state's actions fire shortly after the close of its candle granularity
+        for state, granularity in variables.SCHEDULER['STATE_GRANULARITIES'].items():
+            self.scheduler.add(state, lambda state=state: self.run_state_job(state), granularity)
+        self.scheduler.run()
+
+    def on_closed_bar(self, instrument, granularity, bar):
+        # Called from the price stream thread as soon as a bar closes, instead of waiting for the next poll
+        if granularity != variables.AUTO_TRADING["TRADING_GRANULARITY"]:
+            return
+        logging.info(f"Closed {granularity} bar for {instrument} at {bar['time']}: close {bar['close']}")
+        self.update_live_backtests(instrument, granularity, bar)
+        if self.state == 'YELLOW':
+            self.standby_for_entry()
+
+    def update_live_backtests(self, instrument, granularity, bar):
+        # Extends the backtest of each strategy's best optimized parameters by the closed bar only;
+        # a backtest is seeded from the stored candles the first time its parameters come up
+        if self.optimization_results is None or self.optimization_results.empty:
+            return
+        best = self.optimization_results[self.optimization_results['instrument'] == instrument].drop_duplicates('strategy')
+        current = {(instrument, strategy_name, params_key(param_set)) for strategy_name, param_set in zip(best['strategy'], best['params'])}
+        # Backtests of parameters that are no longer the best are dropped rather than kept extending
+        for key in [key for key in self.live_backtests if key[0] == instrument and key not in current]:
+            del self.live_backtests[key]
+        for strategy_name, param_set in zip(best['strategy'], best['params']):
+            key = (instrument, strategy_name, params_key(param_set))
+            live = self.live_backtests.get(key)
+            if live is None:
+                if (live := incremental_backtest(strategy_name, **param_set)) is None:
+                    continue
+                data, message = self.api.get_historical_data(instrument, granularity, variables.AUTO_TRADING["TRADING_COUNT"])
+                if data is None:
+                    logging.error(f"Failed to seed the live {strategy_name} backtest for {instrument}: {message}")
+                    continue
+                live.extend(data)
+                self.live_backtests[key] = live
+            if live.last_time is None or bar['time'] > live.last_time:
+                live.update(*(bar[column] for column in live.columns))
+                live.last_time = bar['time']
+            logging.info(f"Live {strategy_name} backtest for {instrument} with {param_set}: {live.result()}")
 
     def enable_manual_trading(self):
         logging.info("Manual trading enabled.")
@@ -95,47 +168,74 @@ class TradeBot:
             logging.error("Failed to autofill the database.")
 
     def download_historical_data(self):
-        for pair in variables.AUTO_TRADING["TRADE_INSTRUMENTS"]:
-            logging.info(f"Analyzing {pair} at {variables.AUTO_TRADING['TRADING_GRANULARITY']} level.")
-            granularity = variables.AUTO_TRADING["TRADING_GRANULARITY"]
-            count = variables.AUTO_TRADING["TRADING_COUNT"]
-            data, message = self.api.get_historical_data(pair, granularity, count)
+        granularity = variables.AUTO_TRADING["TRADING_GRANULARITY"]
+        count = variables.AUTO_TRADING["TRADING_COUNT"]
+        logging.info(f"Analyzing {len(variables.AUTO_TRADING['TRADE_INSTRUMENTS'])} instruments at {granularity} level.")
+        for pair, data, message in self.api.get_historical_data_many(variables.AUTO_TRADING["TRADE_INSTRUMENTS"], granularity, count):
             if data is not None and not data.empty:
                 logging.info(f"Successfully retrieved historical data for {pair}.")
             else:
                 logging.error(f"Failed to get historical data again for {pair}: {message}")
+        if self.api.candle_store is not None:
+            logging.info(f"Candle store stats: {self.api.candle_store.get_stats()}")
 
     def perform_backtesting(self):
-        self.backtest_results = []  # Clear previous results
-        for pair in variables.AUTO_TRADING["TRADE_INSTRUMENTS"]:
-            granularity = variables.AUTO_TRADING["TRADING_GRANULARITY"]
-            count = variables.AUTO_TRADING["TRADING_COUNT"]
-            data, message = self.api.get_historical_data(pair, granularity, count)
+        cycle = self.backtest_results.new_cycle()
+        granularity = variables.AUTO_TRADING["TRADING_GRANULARITY"]
+        count = variables.AUTO_TRADING["TRADING_COUNT"]
+        for pair, data, message in self.api.get_historical_data_many(variables.AUTO_TRADING["TRADE_INSTRUMENTS"], granularity, count):
             if data is not None:
                 for strategy_name, params in variables.OPTIMIZATION_RANGES.items():
                     if strategy_class := self.get_strategy_class(strategy_name):
                         param_sets = self.create_param_sets(params)
-                        for param_set in param_sets:
-                            strategy = strategy_class(data, **param_set)
-                            results = strategy.backtest()
-                            self.store_backtest_results(pair, strategy_name, param_set, results)
+                        for param_set, results in self.backtest_param_sets(pair, granularity, data, strategy_name, strategy_class, param_sets):
+                            self.store_backtest_results(pair, strategy_name, param_set, results, cycle)
+                for best in self.backtest_results.top(1, pair=pair, cycle=cycle):
+                    logging.info(f"Best backtest for {pair}: {best['strategy']} with {best['params']}, total return "
+                                 f"{best['total_return']}, {best['num_trades']} trades, win rate {best['win_rate']}")
+                features.log_stats(f"backtesting {pair}")
             else:
                 logging.error(f"Failed to perform backtesting for {pair}: {message}")
+        if self.backtest_cache is not None:
+            self.backtest_cache.evict()
+            logging.info(f"Backtest cache stats: {self.backtest_cache.get_stats()}")
+        if self.backtest_results.flush_enabled:
+            self.backtest_results.flush()
+        logging.info(f"Backtest results stats: {self.backtest_results.get_stats()}")
+
+    def backtest_param_sets(self, pair, granularity, data, strategy_name, strategy_class, param_sets):
+        # (param_set, results) for every set; only sets not yet backtested on these candles are run
+        cached = {}
+        if self.backtest_cache is not None and not data.empty:
+            cached = self.backtest_cache.get_many(pair, granularity, data, strategy_name)
+        missing = [param_set for param_set in param_sets if params_key(param_set) not in cached]
+        computed = []
+        if missing:
+            features.prefetch(strategy_class, data, missing)
+            computed = [(param_set, strategy_class(data, **param_set).backtest()) for param_set in missing]
+            if self.backtest_cache is not None and not data.empty:
+                self.backtest_cache.put_many(pair, granularity, data, strategy_name, computed)
+        if self.backtest_cache is not None:
+            self.backtest_cache.record(hits=len(param_sets) - len(missing), misses=len(missing))
+        computed = {params_key(param_set): results for param_set, results in computed}
+        return [(param_set, cached.get(params_key(param_set)) or computed[params_key(param_set)]) for param_set in param_sets]
 
     def optimize_parameters(self):
-        for pair in variables.AUTO_TRADING["TRADE_INSTRUMENTS"]:
-            granularity = variables.AUTO_TRADING["TRADING_GRANULARITY"]
-            count = variables.AUTO_TRADING["TRADING_COUNT"]
-            data, message = self.api.get_historical_data(pair, granularity, count)
+        granularity = variables.AUTO_TRADING["TRADING_GRANULARITY"]
+        count = variables.AUTO_TRADING["TRADING_COUNT"]
+        datasets = {}
+        for pair, data, message in self.api.get_historical_data_many(variables.AUTO_TRADING["TRADE_INSTRUMENTS"], granularity, count):
             if data is not None:
-                for strategy_name, params in variables.OPTIMIZATION_RANGES.items():
-                    if strategy_class := self.get_strategy_class(strategy_name):
-                        param_sets = self.create_param_sets(params)
-                        optimizer = OptimizeStrategy(data, strategy_class, param_sets)
-                        optimization_results = optimizer.optimize()
-                        logging.info(f"Optimized parameters for {pair} using {strategy_name}.")
+                datasets[pair] = data
             else:
                 logging.error(f"Failed to optimize parameters for {pair}: {message}")
+        series = {pair: series_key(data) for pair, data in datasets.items() if not data.empty}
+        if self.optimization_results is not None and series == self.optimized_series:
+            logging.info("No new candles since the last optimization; keeping its results.")
+            return
+        # Every instrument and strategy grid runs on the process pool; the results table is ranked across all of them
+        self.optimization_results, timings = ParallelOptimizer().run(datasets, variables.OPTIMIZATION_RANGES)
+        self.optimized_series = series
 
     def enable_auto_trading(self):
         logging.info("Auto trading enabled.")
@@ -166,26 +266,23 @@ class TradeBot:
 
         strategy = MomentumStrategy(data, rsi_params, stochastic_params)
         results = strategy.backtest()
-        self.store_backtest_results(pair, 'Momentum', param_set, results)
+        # A cycle of its own, so the confirmation does not join the last GREEN backtesting cycle
+        self.store_backtest_results(pair, 'Momentum', param_set, results, self.backtest_results.new_cycle('confirmation'))
 
-        # Implement trading logic based on backtest results
+        # The vectorized backtest screens; a positive result is confirmed with spread, slippage and stops
+        if results['total_return'] > 0:
+            results = EventBacktest(results['data'], results['data']['Combined_Signal'], pair).run()
         if results['total_return'] > 0:
-            logging.info(f"Positive return for {pair}: Execute trade")
+            logging.info(f"Positive return for {pair} after costs and stops ({results['exits']}): Execute trade")
         else:
             logging.info(f"No positive return for {pair}: Do not trade")
 
-    def store_backtest_results(self, pair, strategy_name, param_set, results):
-        total_return, num_trades, win_rate = results['total_return'], results['num_trades'], results['win_rate']
-        self.backtest_results.append({
-            'pair': pair,
-            'strategy': strategy_name,
-            'params': param_set,
-            'total_return': total_return,
-            'num_trades': num_trades,
-            'win_rate': win_rate
-        })
-        logging.info(f"Backtest results for {pair} using {strategy_name} with parameters {param_set}:")
-        logging.info(f"Total Return: {total_return}, Number of Trades: {num_trades}, Win Rate: {win_rate}")
+    def store_backtest_results(self, pair, strategy_name, param_set, results, cycle=None):
+        # Only the metrics are kept, so the report's DataFrame is not held past this call
+        self.backtest_results.append(pair, strategy_name, param_set, results, cycle)
+        logging.debug(f"Backtest results for {pair} using {strategy_name} with parameters {param_set}: "
+                      f"Total Return: {results['total_return']}, Number of Trades: {results['num_trades']}, "
+                      f"Win Rate: {results['win_rate']}")
 
     def get_strategy_class(self, strategy_name):
         strategy_classes = {
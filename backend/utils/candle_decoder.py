@@ -0,0 +1,74 @@
+import numpy as np
+import pandas as pd
+
+# Turns OANDA candle payloads straight into NumPy columns. Prices arrive as decimal strings, which
+# numpy converts in bulk; times are parsed from the fixed RFC3339 layout with integer arithmetic.
+PRICE_FIELDS = {'o': 'open', 'h': 'high', 'l': 'low', 'c': 'close'}
+OHLC_COLUMNS = list(PRICE_FIELDS.values())
+CANDLE_COLUMNS = OHLC_COLUMNS + ['volume']
+
+
+def _days_from_civil(year, month, day):
+    # Days since 1970-01-01 for proleptic Gregorian dates, vectorized
+    year = year - (month <= 2)
+    era = year // 400
+    year_of_era = year - era * 400
+    day_of_year = (153 * ((month + 9) % 12) + 2) // 5 + day - 1
+    day_of_era = year_of_era * 365 + year_of_era // 4 - year_of_era // 100 + day_of_year
+    return era * 146097 + day_of_era - 719468
+
+
+def parse_times(values):
+    # Epoch seconds from OANDA times in RFC3339 ('2024-01-02T03:04:05.000000000Z') or UNIX format.
+    # Candle times fall on whole seconds, so the fraction is dropped.
+    strings = np.asarray(values, dtype='S')
+    if len(strings) == 0:
+        return np.empty(0, dtype=np.int64)
+    chars = strings.view(np.uint8).reshape(len(strings), strings.dtype.itemsize)
+    if chars.shape[1] < 19 or not ((chars[:, 4] == ord('-')) & (chars[:, 10] == ord('T'))).all():
+        return np.floor(strings.astype(np.float64)).astype(np.int64)
+    if chars.shape[1] > 19 and not np.isin(chars[:, 19], (ord('.'), ord('Z'), 0)).all():
+        # An explicit UTC offset; not something OANDA sends, so take the slow path
+        return ((pd.to_datetime(strings.astype(str), utc=True) - pd.Timestamp(0, tz='UTC')) // pd.Timedelta(seconds=1)).to_numpy(np.int64)
+
+    digits = chars[:, :19].astype(np.int64) - ord('0')
+    year = digits[:, 0] * 1000 + digits[:, 1] * 100 + digits[:, 2] * 10 + digits[:, 3]
+    month = digits[:, 5] * 10 + digits[:, 6]
+    day = digits[:, 8] * 10 + digits[:, 9]
+    seconds = (digits[:, 11] * 10 + digits[:, 12]) * 3600 + (digits[:, 14] * 10 + digits[:, 15]) * 60 + digits[:, 17] * 10 + digits[:, 18]
+    return _days_from_civil(year, month, day) * 86400 + seconds
+
+
+def decode_candles(candles, prices=('mid',), complete_only=False):
+    # Returns {'time', 'complete', 'volume', '<price>_<o|h|l|c>'} columns for the candles list of a response
+    if complete_only:
+        candles = [candle for candle in candles if candle.get('complete', True)]
+    columns = {
+        'time': parse_times([candle['time'] for candle in candles]),
+        'complete': np.fromiter((candle.get('complete', True) for candle in candles), dtype=bool, count=len(candles)),
+        'volume': np.fromiter((candle.get('volume', 0) for candle in candles), dtype=np.int64, count=len(candles)),
+    }
+    for price in prices:
+        quotes = [candle[price] for candle in candles]
+        for field in PRICE_FIELDS:
+            columns[f'{price}_{field}'] = np.array([quote[field] for quote in quotes], dtype=np.float64)
+    return columns
+
+
+def decode_ohlc(candles, price='mid', complete_only=False):
+    # Single-price columns named like the OandaAPI frames: time, open, high, low, close, volume, complete
+    candles = [candle for candle in candles if price in candle and 'time' in candle]
+    columns = decode_candles(candles, (price,), complete_only)
+    return {
+        'time': columns['time'],
+        **{name: columns[f'{price}_{field}'] for field, name in PRICE_FIELDS.items()},
+        'volume': columns['volume'],
+        'complete': columns['complete'],
+    }
+
+
+def to_frame(columns, names=None):
+    # DataFrame on a UTC DatetimeIndex named time, the layout OandaAPI.get_historical_data returns
+    names = names or [name for name in columns if name != 'time']
+    index = pd.DatetimeIndex(pd.to_datetime(columns['time'], unit='s', utc=True), name='time')
+    return pd.DataFrame({name: columns[name] for name in names}, index=index)
@@ -0,0 +1,90 @@
+import json
+import os
+import struct
+
+import numpy as np
+import pandas as pd
+
+# File layout: MAGIC, uint64 header length, JSON header, then one 64-byte aligned block per column.
+# Times are int64 epoch seconds and prices float64, all little-endian, so a reader can np.memmap
+# each column straight out of the page cache.
+MAGIC = b'OBOTCOL1'
+ALIGNMENT = 64
+PRICE_COLUMNS = ['open', 'high', 'low', 'close']
+EXTENSION = '.ohlc'
+
+
+def _aligned(offset):
+    return (offset + ALIGNMENT - 1) // ALIGNMENT * ALIGNMENT
+
+
+def write_history(path, times, columns, **meta):
+    times = np.ascontiguousarray(times, dtype='<i8')
+    arrays = {'time': times}
+    for name, values in columns.items():
+        values = np.ascontiguousarray(values, dtype='<f8')
+        if len(values) != len(times):
+            raise ValueError(f"Column {name} has {len(values)} rows, expected {len(times)}")
+        arrays[name] = values
+
+    # The header length depends on the offsets it holds, so lay out columns after a padded header
+    layout = []
+    header = {'version': 1, 'rows': len(times), 'columns': layout, **meta}
+    prefix = len(MAGIC) + 8
+    data_start = _aligned(prefix + len(json.dumps(header)) + 64 * (len(arrays) + 1))
+    offset = data_start
+    for name, array in arrays.items():
+        layout.append({'name': name, 'dtype': array.dtype.str, 'offset': offset})
+        offset = _aligned(offset + array.nbytes)
+    encoded = json.dumps(header).encode()
+    if prefix + len(encoded) > data_start:
+        raise ValueError("History header does not fit in the reserved space")
+
+    # Write to a temporary file and swap it in so open memmaps keep seeing the old file
+    os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+    temp_path = f'{path}.tmp'
+    with open(temp_path, 'wb') as file:
+        file.write(MAGIC)
+        file.write(struct.pack('<Q', len(encoded)))
+        file.write(encoded)
+        for column, array in zip(layout, arrays.values()):
+            file.seek(column['offset'])
+            file.write(array.tobytes())
+        file.truncate(offset)
+    os.replace(temp_path, path)
+
+
+def read_header(path):
+    with open(path, 'rb') as file:
+        if file.read(len(MAGIC)) != MAGIC:
+            raise ValueError(f"{path} is not a columnar history file")
+        (length,) = struct.unpack('<Q', file.read(8))
+        return json.loads(file.read(length))
+
+
+def load_history(path):
+    # Returns the header and a read-only memmap per column; nothing is read until it is touched
+    header = read_header(path)
+    rows = header['rows']
+    columns = {}
+    for column in header['columns']:
+        if rows == 0:
+            columns[column['name']] = np.empty(0, dtype=column['dtype'])
+            continue
+        columns[column['name']] = np.memmap(path, dtype=column['dtype'], mode='r', offset=column['offset'], shape=(rows,))
+    return header, columns
+
+
+def write_frame(path, data, **meta):
+    # data is indexed by a UTC DatetimeIndex as returned by OandaAPI.get_historical_data
+    times = (data.index - pd.Timestamp(0, tz='UTC')) // pd.Timedelta(seconds=1)
+    columns = {name: data[name].to_numpy(dtype=np.float64) for name in PRICE_COLUMNS if name in data.columns}
+    write_history(path, np.asarray(times, dtype=np.int64), columns, **meta)
+
+
+def load_frame(path):
+    header, columns = load_history(path)
+    index = pd.to_datetime(np.asarray(columns.pop('time')), unit='s', utc=True)
+    data = pd.DataFrame({name: np.asarray(values) for name, values in columns.items()}, index=index)
+    data.index.name = 'time'
+    return data
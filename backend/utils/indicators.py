@@ -1,16 +1,25 @@
 import numpy as np
 import pandas as pd
 
+from backend.indicators.incremental import (IncrementalBollinger, IncrementalEMA, IncrementalMACD, IncrementalRSI,
+                                            IncrementalSMA, catch_up)
+from backend.indicators.feature_cache import features
+
+def signal_from(data, start, values):
+    # Signal column that is 0 before start; assigned whole because a slice of data['Signal'] is a copy
+    signal = np.zeros(len(data), dtype=np.int64)
+    signal[start:] = values
+    return signal
+
 class SMACrossoverStrategy:
     def __init__(self, fast_period, slow_period):
         self.fast_period = fast_period
         self.slow_period = slow_period
 
     def apply(self, data: pd.DataFrame) -> pd.DataFrame:
-        data['Fast_SMA'] = data['close'].rolling(window=self.fast_period).mean()
-        data['Slow_SMA'] = data['close'].rolling(window=self.slow_period).mean()
-        data['Signal'] = 0
-        data['Signal'][self.slow_period:] = np.where(data['Fast_SMA'][self.slow_period:] > data['Slow_SMA'][self.slow_period:], 1, -1)
+        data['Fast_SMA'] = fast = features.sma(data['close'], self.fast_period)
+        data['Slow_SMA'] = slow = features.sma(data['close'], self.slow_period)
+        data['Signal'] = signal_from(data, self.slow_period, np.where(fast[self.slow_period:] > slow[self.slow_period:], 1, -1))
         data['Position'] = data['Signal'].diff()
         return data
 
@@ -20,101 +29,114 @@ class EMACrossoverStrategy:
         self.slow_period = slow_period
 
     def apply(self, data: pd.DataFrame) -> pd.DataFrame:
-        data['Fast_EMA'] = data['close'].ewm(span=self.fast_period, adjust=False).mean()
-        data['Slow_EMA'] = data['close'].ewm(span=self.slow_period, adjust=False).mean()
-        data['Signal'] = 0
-        data['Signal'][self.slow_period:] = np.where(data['Fast_EMA'][self.slow_period:] > data['Slow_EMA'][self.slow_period:], 1, -1)
+        data['Fast_EMA'] = fast = features.ema(data['close'], self.fast_period)
+        data['Slow_EMA'] = slow = features.ema(data['close'], self.slow_period)
+        data['Signal'] = signal_from(data, self.slow_period, np.where(fast[self.slow_period:] > slow[self.slow_period:], 1, -1))
         data['Position'] = data['Signal'].diff()
         return data
 
 class SMAIndicator:
     def __init__(self, period):
         self.period = period
+        self.state = None
 
     def apply(self, data: pd.DataFrame) -> pd.DataFrame:
-        data['SMA'] = data['close'].rolling(window=self.period).mean()
-        data['Signal'] = 0
-        data['Signal'][self.period:] = np.where(data['close'][self.period:] > data['SMA'][self.period:], 1, -1)
+        close = data['close'].to_numpy()
+        data['SMA'] = sma = features.sma(close, self.period)
+        data['Signal'] = signal_from(data, self.period, np.where(close[self.period:] > sma[self.period:], 1, -1))
         data['Position'] = data['Signal'].diff()
         return data
 
+    def incremental(self):
+        return IncrementalSMA(self.period)
+
     def get_current_value(self, data: pd.DataFrame) -> float:
-        self.apply(data)
-        return data['SMA'].iloc[-1]
+        # Seeded from data on the first call; later calls only feed the bars added since
+        self.state = catch_up(self.state, self.incremental, data)
+        return self.state.value
 
 class EMAIndicator:
     def __init__(self, period):
         self.period = period
+        self.state = None
 
     def apply(self, data: pd.DataFrame) -> pd.DataFrame:
-        data['EMA'] = data['close'].ewm(span=self.period, adjust=False).mean()
-        data['Signal'] = 0
-        data['Signal'][self.period:] = np.where(data['close'][self.period:] > data['EMA'][self.period:], 1, -1)
+        close = data['close'].to_numpy()
+        data['EMA'] = ema = features.ema(close, self.period)
+        data['Signal'] = signal_from(data, self.period, np.where(close[self.period:] > ema[self.period:], 1, -1))
         data['Position'] = data['Signal'].diff()
         return data
 
+    def incremental(self):
+        return IncrementalEMA(self.period)
+
     def get_current_value(self, data: pd.DataFrame) -> float:
-        self.apply(data)
-        return data['EMA'].iloc[-1]
+        self.state = catch_up(self.state, self.incremental, data)
+        return self.state.value
 
 class RSIIndicator:
     def __init__(self, period):
         self.period = period
+        self.state = None
 
     def apply(self, data: pd.DataFrame) -> pd.DataFrame:
-        delta = data['close'].diff()
-        gain = (delta.where(delta > 0, 0)).rolling(window=self.period).mean()
-        loss = (-delta.where(delta < 0, 0)).rolling(window=self.period).mean()
-        rs = gain / loss
-        data['RSI'] = 100 - (100 / (1 + rs))
-        data['Signal'] = 0
-        data['Signal'][self.period:] = np.where(data['RSI'][self.period:] > 70, -1, np.where(data['RSI'][self.period:] < 30, 1, 0))
+        data['RSI'] = rsi = features.rsi(data['close'], self.period)
+        data['Signal'] = signal_from(data, self.period, np.where(rsi[self.period:] > 70, -1, np.where(rsi[self.period:] < 30, 1, 0)))
         data['Position'] = data['Signal'].diff()
         return data
 
+    def incremental(self):
+        return IncrementalRSI(self.period)
+
     def get_current_value(self, data: pd.DataFrame) -> float:
-        self.apply(data)
-        return data['RSI'].iloc[-1]
+        self.state = catch_up(self.state, self.incremental, data)
+        return self.state.value
 
 class MACDIndicator:
     def __init__(self, fast_period, slow_period, signal_period):
         self.fast_period = fast_period
         self.slow_period = slow_period
         self.signal_period = signal_period
+        self.state = None
 
     def apply(self, data: pd.DataFrame) -> pd.DataFrame:
-        data['Fast_EMA'] = data['close'].ewm(span=self.fast_period, adjust=False).mean()
-        data['Slow_EMA'] = data['close'].ewm(span=self.slow_period, adjust=False).mean()
-        data['MACD'] = data['Fast_EMA'] - data['Slow_EMA']
-        data['Signal_Line'] = data['MACD'].ewm(span=self.signal_period, adjust=False).mean()
-        data['Signal'] = 0
-        data['Signal'][self.signal_period:] = np.where(data['MACD'][self.signal_period:] > data['Signal_Line'][self.signal_period:], 1, -1)
+        macd = features.macd(data['close'], self.fast_period, self.slow_period, self.signal_period)
+        data['Fast_EMA'] = macd['EMA_short']
+        data['Slow_EMA'] = macd['EMA_long']
+        data['MACD'] = macd['MACD']
+        data['Signal_Line'] = macd['Signal']
+        data['Signal'] = signal_from(data, self.signal_period, np.where(macd['MACD'][self.signal_period:] > macd['Signal'][self.signal_period:], 1, -1))
         data['Position'] = data['Signal'].diff()
         return data
 
+    def incremental(self):
+        return IncrementalMACD(self.fast_period, self.slow_period, self.signal_period)
+
     def get_current_value(self, data: pd.DataFrame) -> float:
-        self.apply(data)
-        return data['MACD'].iloc[-1]
+        self.state = catch_up(self.state, self.incremental, data)
+        return self.state.value
 
 class BollingerBandsIndicator:
     def __init__(self, period, std_dev):
         self.period = period
         self.std_dev = std_dev
+        self.state = None
 
     def apply(self, data: pd.DataFrame) -> pd.DataFrame:
-        data['SMA'] = data['close'].rolling(window=self.period).mean()
-        data['STD'] = data['close'].rolling(window=self.period).std()
-        data['Upper_Band'] = data['SMA'] + (data['STD'] * self.std_dev)
-        data['Lower_Band'] = data['SMA'] - (data['STD'] * self.std_dev)
-        data['Signal'] = 0
-        data['Signal'][self.period:] = np.where(data['close'][self.period:] > data['Upper_Band'][self.period:], -1, np.where(data['close'][self.period:] < data['Lower_Band'][self.period:], 1, 0))
+        close = data['close'].to_numpy()
+        bands = features.bollinger_bands(close, self.period, self.std_dev)
+        upper, lower = bands['Upper_Band'][self.period:], bands['Lower_Band'][self.period:]
+        data['SMA'] = bands['Bollinger_Mid']
+        data['STD'] = features.rolling_std(close, self.period)
+        data['Upper_Band'] = bands['Upper_Band']
+        data['Lower_Band'] = bands['Lower_Band']
+        data['Signal'] = signal_from(data, self.period, np.where(close[self.period:] > upper, -1, np.where(close[self.period:] < lower, 1, 0)))
         data['Position'] = data['Signal'].diff()
         return data
 
+    def incremental(self):
+        return IncrementalBollinger(self.period, self.std_dev)
+
     def get_current_value(self, data: pd.DataFrame) -> dict:
-        self.apply(data)
-        return {
-            'upper': data['Upper_Band'].iloc[-1],
-            'lower': data['Lower_Band'].iloc[-1],
-            'price': data['close'].iloc[-1]
-        }
+        self.state = catch_up(self.state, self.incremental, data)
+        return self.state.value
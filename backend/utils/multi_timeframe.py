@@ -0,0 +1,109 @@
+import logging
+import threading
+
+import pandas as pd
+
+import backend.variables as variables
+from backend.database.sqlite.candle_store import GRANULARITY_SECONDS
+from backend.oanda_api.oanda_api import MAX_CANDLES
+from backend.utils.utility import configure_logging
+
+configure_logging("multi_timeframe")
+
+# One fine-grained candle series per instrument with every coarser granularity resampled from it.
+# The series is fetched and sorted once; D, W and M bars follow OANDA's alignment (days start at
+# 17:00 New York time), and each granularity is resampled once and cached.
+
+AGGREGATES = {'open': 'first', 'high': 'max', 'low': 'min', 'close': 'last', 'volume': 'sum'}
+CALENDAR_RULES = {'D': '1D', 'W': 'W-SAT', 'M': 'MS'}  # Weeks open on Friday at 17:00, Saturday after the shift
+
+
+def bar_rule(granularity):
+    if granularity in CALENDAR_RULES:
+        return CALENDAR_RULES[granularity]
+    return pd.Timedelta(seconds=GRANULARITY_SECONDS[granularity])
+
+
+class MultiTimeframeData:
+    def __init__(self, instrument, data, base=None, api=None):
+        # data is the base series with a UTC time index or 'time' column. With an api, granularities
+        # the base series is too short for are fetched directly instead.
+        settings = variables.MULTI_TIMEFRAME
+        self.instrument = instrument
+        self.base = base or settings['BASE']
+        self.api = api
+        self.fetched = []  # Granularities that needed their own request
+        if data is not None and 'time' in data.columns:
+            data = data.set_index('time')
+        if data is not None and not data.index.is_monotonic_increasing:
+            data = data.sort_index()
+        self.data = data
+        self.frames = {self.base: data}
+        self.lock = threading.Lock()
+
+    @classmethod
+    def load(cls, instrument, api, base=None, count=None):
+        # One read of the base series, from the candle store when it holds more than one OANDA request
+        settings = variables.MULTI_TIMEFRAME
+        base = base or settings['BASE']
+        count = count or settings['BASE_COUNT']
+        data, message = None, "Candle store disabled"
+        if api.candle_store is not None and count > MAX_CANDLES:
+            data = api.candle_store.get(instrument, base, count, variables.CANDLE_STORE['PRICE'])
+            message = "Read from the candle store"
+            if data is not None and not data.empty and not api.candle_store.is_current(base, data.index[-1]):
+                # get_historical_data only requests the closed candles after the stored ones
+                recent, message = api.get_historical_data(instrument, base, MAX_CANDLES)
+                if recent is not None:
+                    data = pd.concat([data, recent])
+                    data = data[~data.index.duplicated(keep='last')].sort_index().tail(count)
+        if data is None or len(data) < min(count, MAX_CANDLES):
+            data, message = api.get_historical_data(instrument, base, min(count, MAX_CANDLES))
+        if data is None:
+            logging.error(f"Failed to load {base} candles for {instrument}: {message}")
+        return cls(instrument, data, base, api)
+
+    def get(self, granularity):
+        # Bars of granularity resampled from the base series; cached per granularity
+        with self.lock:
+            if granularity not in self.frames:
+                self.frames[granularity] = self.resample(granularity)
+                if self.api is not None and granularity != self.base:
+                    self.frames[granularity] = self.fallback(granularity, self.frames[granularity])
+            return self.frames[granularity]
+
+    def fallback(self, granularity, bars):
+        minimum = variables.MULTI_TIMEFRAME['MIN_BARS']
+        if bars is not None and len(bars) >= minimum:
+            return bars
+        logging.info(f"{0 if bars is None else len(bars)} {granularity} bars from {self.base} candles for "
+                     f"{self.instrument}; fetching {granularity} candles instead.")
+        data, message = self.api.get_historical_data(self.instrument, granularity, MAX_CANDLES)
+        if data is None:
+            logging.error(f"Failed to fetch {granularity} candles for {self.instrument}: {message}")
+            return bars
+        self.fetched.append(granularity)
+        return data
+
+    def resample(self, granularity):
+        if self.data is None or self.data.empty:
+            return self.data
+        if granularity not in CALENDAR_RULES and GRANULARITY_SECONDS[granularity] < GRANULARITY_SECONDS.get(self.base, 0):
+            raise ValueError(f"Cannot derive {granularity} bars from {self.base} candles")
+        aggregates = {column: how for column, how in AGGREGATES.items() if column in self.data}
+        rule = bar_rule(granularity)
+        frame, shift = self.data, pd.Timedelta(0)
+        if granularity in CALENDAR_RULES:
+            # Shift New York time so the 17:00 daily open falls on midnight; the labels are shifted back
+            settings = variables.MULTI_TIMEFRAME
+            shift = pd.Timedelta(hours=24 - settings['DAILY_ALIGNMENT'])
+            frame = frame.set_axis(frame.index.tz_convert(settings['ALIGNMENT_TIMEZONE']) + shift)
+        bars = frame.resample(rule, label='left', closed='left').agg(aggregates)
+        bars = bars[bars['close'].notna()]
+        # The last bar is still forming unless the base series reaches its end
+        base_end = self.data.index[-1] + pd.Timedelta(seconds=GRANULARITY_SECONDS.get(self.base, 0))
+        if len(bars) and bars.index[-1] + pd.tseries.frequencies.to_offset(rule) - shift > base_end:
+            bars = bars.iloc[:-1]
+        bars.index = (bars.index - shift).tz_convert('UTC')
+        bars.index.name = self.data.index.name
+        return bars
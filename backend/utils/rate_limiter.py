@@ -0,0 +1,33 @@
+import asyncio
+import threading
+import time
+
+
+class RateLimiter:
+    # Token bucket shared by every thread that talks to the same API
+    def __init__(self, rate, burst=None):
+        self.rate = float(rate)
+        self.capacity = float(burst or max(1, rate))
+        self.tokens = self.capacity
+        self.updated = time.monotonic()
+        self.lock = threading.Lock()
+
+    def _reserve(self):
+        # Takes a token and returns how long the caller has to wait before using it
+        with self.lock:
+            now = time.monotonic()
+            self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+            self.updated = now
+            self.tokens -= 1
+            return 0.0 if self.tokens >= 0 else -self.tokens / self.rate
+
+    def acquire(self):
+        wait = self._reserve()
+        if wait > 0:
+            time.sleep(wait)
+
+    async def acquire_async(self):
+        # Same bucket as acquire, but waits without blocking the event loop
+        wait = self._reserve()
+        if wait > 0:
+            await asyncio.sleep(wait)
@@ -0,0 +1,179 @@
+import bisect
+import logging
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import pandas as pd
+
+import backend.variables as variables
+from backend.database.sqlite.candle_store import GRANULARITY_SECONDS
+from backend.utils.utility import configure_logging
+
+configure_logging("scheduler")
+
+# Fires jobs a short delay after candle closes instead of sleeping a fixed interval after each
+# run. The scheduler thread sleeps until the next due job, so nothing runs between closes. A job
+# still running at its next boundary skips that boundary rather than queueing another run.
+
+HISTOGRAM_BOUNDS_MS = (10, 50, 100, 250, 500, 1000, 5000, 30000, 120000)  # Upper bounds; the last bucket is open
+
+
+def next_boundary(granularity, now):
+    # Epoch seconds of the first candle close after now. Candles up to H1 sit on the UTC hour grid;
+    # longer ones start from the daily alignment in New York time, like OANDA's.
+    period = GRANULARITY_SECONDS[granularity]
+    if period > 86400:
+        raise ValueError(f"No schedule for {granularity} candles")
+    if period <= 3600:
+        return (now // period + 1) * period
+    settings = variables.MULTI_TIMEFRAME
+    local = pd.Timestamp(now, unit='s', tz='UTC').tz_convert(settings['ALIGNMENT_TIMEZONE'])
+    anchor = local.replace(hour=settings['DAILY_ALIGNMENT'], minute=0, second=0, microsecond=0, nanosecond=0)
+    if anchor > local:
+        anchor -= pd.DateOffset(days=1)
+    # The grid restarts at the next local anchor, which is 23 or 25 hours away across a DST change
+    next_anchor = (anchor + pd.DateOffset(days=1)).timestamp()
+    if period == 86400:
+        return next_anchor
+    elapsed = (local - anchor).total_seconds()
+    return min(anchor.timestamp() + (elapsed // period + 1) * period, next_anchor)
+
+
+class Histogram:
+    def __init__(self, bounds=HISTOGRAM_BOUNDS_MS):
+        self.bounds = bounds
+        self.counts = [0] * (len(bounds) + 1)
+        self.total = 0.0
+        self.maximum = 0.0
+
+    def add(self, value):
+        self.counts[bisect.bisect_left(self.bounds, value)] += 1
+        self.total += value
+        self.maximum = max(self.maximum, value)
+
+    def to_dict(self):
+        samples = sum(self.counts)
+        labels = [f"<={bound}" for bound in self.bounds] + [f">{self.bounds[-1]}"]
+        return {
+            'buckets': dict(zip(labels, self.counts)),
+            'mean': self.total / samples if samples else None,
+            'max': self.maximum if samples else None,
+        }
+
+
+class Job:
+    def __init__(self, name, callback, granularity, delay):
+        self.name = name
+        self.callback = callback
+        self.granularity = granularity
+        self.delay = delay
+        self.due = None  # Epoch seconds of the next run
+        self.running = False
+        self.runs = 0
+        self.skipped = 0
+        self.failures = 0
+        self.lateness = Histogram()  # ms from the due time to the start
+        self.duration = Histogram()  # ms
+
+    def schedule(self, now):
+        self.due = next_boundary(self.granularity, now - self.delay) + self.delay
+
+    def to_dict(self):
+        return {
+            'granularity': self.granularity,
+            'delay': self.delay,
+            'next_run': pd.Timestamp(self.due, unit='s', tz='UTC').isoformat() if self.due else None,
+            'runs': self.runs,
+            'skipped': self.skipped,
+            'failures': self.failures,
+            'lateness_ms': self.lateness.to_dict(),
+            'duration_ms': self.duration.to_dict(),
+        }
+
+
+class Scheduler:
+    def __init__(self, max_workers=None):
+        settings = variables.SCHEDULER
+        self.max_workers = max_workers or settings['MAX_WORKERS']
+        self.jobs = {}
+        self.lock = threading.Lock()
+        self.wake = threading.Event()
+        self.stopped = threading.Event()
+        self.thread = None
+
+    def add(self, name, callback, granularity, delay=None):
+        # Runs callback delay seconds after every close of granularity
+        job = Job(name, callback, granularity, variables.SCHEDULER['DELAY'] if delay is None else delay)
+        with self.lock:
+            job.schedule(time.time())
+            self.jobs[name] = job
+        self.wake.set()
+        return job
+
+    def trigger(self, name):
+        # Runs a job now, between its boundaries; like a boundary, it is skipped if the job is still running
+        with self.lock:
+            job = self.jobs.get(name)
+            if job is None or self.stopped.is_set():
+                return False
+            job.due = time.time()
+        self.wake.set()
+        return True
+
+    def start(self):
+        if self.thread is None or not self.thread.is_alive():
+            self.stopped.clear()
+            self.thread = threading.Thread(target=self.run, name="scheduler", daemon=True)
+            self.thread.start()
+
+    def stop(self):
+        self.stopped.set()
+        self.wake.set()
+        if self.thread is not None and self.thread is not threading.current_thread():
+            self.thread.join()
+
+    def run(self):
+        # Blocks until stop(); jobs run on the pool so a slow one does not delay the others
+        with ThreadPoolExecutor(max_workers=self.max_workers, thread_name_prefix="job") as pool:
+            while not self.stopped.is_set():
+                with self.lock:
+                    now = time.time()
+                    for job in self.jobs.values():
+                        if job.due <= now:
+                            self.fire(pool, job, now)
+                    timeout = min((job.due for job in self.jobs.values()), default=now + 60) - time.time()
+                self.wake.wait(max(timeout, 0))
+                self.wake.clear()
+
+    def fire(self, pool, job, now):
+        due = job.due
+        job.schedule(now)
+        # Boundaries passed while the scheduler was held up are skipped, not caught up
+        missed = int((now - due) // GRANULARITY_SECONDS[job.granularity])
+        if job.running:
+            job.skipped += 1 + missed
+            logging.warning(f"Skipping {job.name} at {pd.Timestamp(due, unit='s', tz='UTC')}: the previous run is still going")
+            return
+        job.skipped += missed
+        job.running = True
+        pool.submit(self.execute, job, due)
+
+    def execute(self, job, due):
+        started = time.time()
+        try:
+            job.callback()
+        except Exception:
+            job.failures += 1
+            logging.exception(f"Scheduled job {job.name} failed")
+        finally:
+            finished = time.time()
+            with self.lock:
+                job.runs += 1
+                job.lateness.add((started - due) * 1000)
+                job.duration.add((finished - started) * 1000)
+                job.running = False
+
+    def get_stats(self):
+        with self.lock:
+            return {name: job.to_dict() for name, job in self.jobs.items()}
@@ -24,5 +24,21 @@ def transition_state(new_state):
     if new_state in [variables.STATE_RED, variables.STATE_YELLOW, variables.STATE_GREEN]:
         current_state = new_state
 
+def get_strategy_class(strategy_name):
+    # Imported here because the strategy modules import this one for configure_logging
+    from backend.strategies.ema_crossover_strategy import EMACrossoverStrategy
+    from backend.strategies.ema_strategy import EMAStrategy
+    from backend.strategies.rsi_strategy import RSIStrategy
+    from backend.strategies.sma_crossover_strategy import SMACrossoverStrategy
+    from backend.strategies.sma_strategy import SMAStrategy
+    strategy_classes = {
+        'RSI': RSIStrategy,
+        'SMA': SMAStrategy,
+        'EMA': EMAStrategy,
+        'SMACrossover': SMACrossoverStrategy,
+        'EMACrossover': EMACrossoverStrategy
+    }
+    return strategy_classes.get(strategy_name)
+
 def configure_logging(log_type="app"):
     log_manager.configure_logging(log_type)
@@ -135,3 +135,109 @@ AUTO_TRADING = {
         }
     },
 }
+
+# MomentumStrategy parameters for the monthly, daily and minute analysis in ControlSystem
+RSI_PARAMS = {'RSI_PERIOD': 14, 'RSI_OVERBOUGHT': 70, 'RSI_OVERSOLD': 30}
+STOCHASTIC_PARAMS = {'k_period': 14, 'd_period': 3}
+
+OANDA_API = {
+    "MAX_WORKERS": 8,  # Concurrent requests in get_historical_data_many
+    "REQUESTS_PER_SECOND": 100,  # Shared across all threads; OANDA allows 120
+}
+
+CANDLE_STORE = {
+    "ENABLED": True,
+    "DB_NAME": 'backend/database/sqlite/forex_data.db',
+    "MEMORY_SIZE": 64,  # Number of (instrument, granularity, price) series kept in memory
+    "PRICE": 'M',
+}
+
+BACKFILL = {
+    "MAX_WORKERS": 8,
+    "REQUESTS_PER_SECOND": 20,  # OANDA allows up to 120 REST requests per second per connection
+    "WINDOW_CANDLES": 5000,
+}
+
+ASYNC_OANDA_API = {
+    "ENABLED": True,  # OandaAPI.get_historical_data_many runs its requests on the async client
+    "CONNECTION_LIMIT": 100,  # Pooled connections kept open by the async client
+    "REQUEST_TIMEOUT": 10,  # Seconds per request attempt
+    "MAX_RETRIES": 5,
+    "BACKOFF_FACTOR": 0.3,
+}
+
+PRICE_STREAM = {
+    "ENABLED": False,  # Needs OANDA_STREAM_URL_DEMO, e.g. https://stream-fxpractice.oanda.com/v3
+    "GRANULARITIES": ['M1', 'M5', 'H1'],
+    "HISTORY": 500,  # Closed bars kept in memory per instrument and granularity
+    "HEARTBEAT_TIMEOUT": 20,  # OANDA sends a heartbeat every 5 seconds
+    "MAX_RECONNECT_DELAY": 60,
+    "WRITE_TO_STORE": False,  # Write closed bars to the candle store so REST polls are served locally
+}
+
+FEATURE_CACHE = {
+    "ENABLED": True,
+    "MAX_ENTRIES": 512,  # Indicator series kept in memory, least recently used dropped first
+    "LOG_INTERVAL": 1000,  # Log the hit rate every this many lookups
+}
+
+GRID_OPTIMIZER = {
+    "MAX_CELLS": 4_000_000,  # Bars x parameter sets evaluated per chunk; 32 MB per float matrix
+}
+
+PARALLEL_OPTIMIZER = {
+    "MAX_WORKERS": None,  # Worker processes; None uses every core
+    "CHUNK_SIZE": 64,  # Parameter sets per task
+}
+
+SEARCH = {
+    "MODE": 'random',  # 'grid', 'random', 'halving' or 'coarse_to_fine'
+    "BUDGET": 500,  # Backtests per search
+    "SEED": None,
+    "ETA": 3,  # Successive halving keeps 1/ETA of the candidates per round and triples their bars
+    "MIN_BARS": 500,  # Shortest window successive halving scores on
+    "LEVELS": 4,  # Coarse-to-fine splits its budget over about this many grids
+}
+
+BACKTEST_CACHE = {
+    "ENABLED": True,
+    "DB_NAME": 'backend/database/sqlite/forex_data.db',
+    "MAX_AGE": 7 * 24 * 3600,  # Seconds a cached backtest is kept
+    "MAX_ROWS": 200_000,  # Oldest results are dropped beyond this many
+}
+
+BACKTEST_RESULTS = {
+    "RETENTION": 24 * 3600,  # Seconds a backtest result is kept in memory
+    "MAX_ROWS": 100_000,  # Oldest results are dropped beyond this many
+    "FLUSH": False,  # Write results to SQLite before they are dropped
+    "DB_NAME": 'backend/database/sqlite/forex_data.db',
+}
+
+EVENT_BACKTEST = {
+    "SPREAD": 1.0,  # Bid/ask spread in pips around the mid candles
+    "SLIPPAGE": 0.2,  # Pips lost on market and stop fills
+}
+
+MULTI_TIMEFRAME = {
+    "BASE": 'M1',  # Granularity every coarser timeframe is resampled from
+    "BASE_COUNT": 1_000_000,  # About three years of M1 candles, read from the candle store once backfilled
+    "MIN_BARS": 30,  # Fewer resampled bars than this fall back to fetching the granularity itself
+    "DAILY_ALIGNMENT": 17,  # Hour daily candles open at, as OANDA's dailyAlignment
+    "ALIGNMENT_TIMEZONE": 'America/New_York',
+}
+
+CONTROL_SYSTEM = {
+    "MAX_WORKERS": 8,  # Instruments analyzed at the same time
+    "CYCLE_HISTORY": 100,  # Analysis cycle times kept for get_stats
+}
+
+SCHEDULER = {
+    "DELAY": 0.3,  # Seconds after a candle close before its jobs fire, so the closed candle is available
+    "MAX_WORKERS": 4,  # Jobs that can run at the same time
+    # Candle closes each TradeBot state acts on; RED and YELLOW used to poll every 180s and 30s
+    "STATE_GRANULARITIES": {
+        "RED": 'M5',
+        "GREEN": AUTO_TRADING["TRADING_GRANULARITY"],
+        "YELLOW": 'M1',
+    },
+}
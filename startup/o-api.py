@@ -2,11 +2,11 @@
 import requests
 import json
 import pandas as pd
-from dateutil.parser import parse
 import defs
 import utils
 import time
 from datetime import datetime, timedelta, timezone
+from backend.utils.candle_decoder import decode_candles
 
 class OandaAPI:
 # Connection and Initialization
@@ -124,23 +124,9 @@ class OandaAPI:
 # Class methods
     @classmethod
     def candles_to_df(cls, json_data):
-        prices = ['mid', 'bid', 'ask']
-        ohlc = ['o', 'h', 'l', 'c']
-
-        our_data = []
-        for candle in json_data:
-            if not candle['complete']:
-                continue
-            new_dict = {
-                'time': candle['time'],
-                'volume': candle['volume']
-            }
-            for price in prices:
-                for oh in ohlc:
-                    new_dict[f"{price}_{oh}"] = float(candle[price][oh])
-            our_data.append(new_dict)
-        df = pd.DataFrame.from_dict(our_data)
-        df["time"] = [parse(x) for x in df.time]
+        columns = decode_candles(json_data, prices=['mid', 'bid', 'ask'], complete_only=True)
+        df = pd.DataFrame(columns).drop(columns='complete')
+        df["time"] = pd.to_datetime(df["time"], unit='s', utc=True)
         return df
 
 # Trades methods